@@ -1,13 +1,58 @@
 import streamlit as st
 import pandas as pd
-import re
 from datetime import datetime
 import io
-import PyPDF2
-import pdfplumber
-import sqlite3
 import hashlib
+import math
 import os
+import time
+import uuid
+import zipfile
+
+from asic_batch.aba import (
+    DEFAULT_ACCOUNT,
+    DEFAULT_ACCOUNT_NAME,
+    DEFAULT_APCA_NUMBER,
+    DEFAULT_BSB,
+    aba_shard_filename,
+    batch_manifest_json,
+    plan_aba_shards,
+    write_aba_shards,
+)
+from asic_batch.aba_validator import ABAValidationError
+from asic_batch.analytics import EXPORT_FORMATS, export_statements, parquet_available, payment_summary, payment_totals
+from asic_batch.archive import is_zip_name, list_pdf_members, read_member
+from asic_batch.dedup import check_duplicate_statements
+from asic_batch.extraction import EXTRACTOR_VERSION, iter_extract_batch, missing_fields
+from asic_batch.instrumentation import (
+    Metrics,
+    batch_totals,
+    configure_logging,
+    get_profile_path,
+    log_batch_metrics,
+    log_metrics,
+    profiled,
+)
+from asic_batch.jobs import BackgroundJob
+from asic_batch.memo import BoundedMemo
+from asic_batch.money import cents_to_amount
+from asic_batch.reconcile import RECONCILE_WINDOW_DAYS, reconcile_bank_csv
+from asic_batch.spool import SpooledFile, UploadSpool, get_file_hash
+from asic_batch.storage import (
+    RESERVATION_LEASE_SECONDS,
+    commit_batch,
+    get_statement_history,
+    init_database,
+    new_batch_id,
+    release_reservations,
+    reserve_statements,
+)
+
+# Uploaded files whose extraction results a session keeps between reruns
+EXTRACTION_MEMO_MAX_FILES = int(os.getenv("ASIC_EXTRACTION_MEMO_MAX_FILES", "2000"))
+
+# Seconds between page refreshes while a background extraction is running
+EXTRACTION_POLL_SECONDS = 0.5
 
 # Authentication function
 def check_password():
@@ -56,275 +101,729 @@ def check_password():
         # Password correct
         return True
 
-# Database functions
-def init_database():
-    """Initialize SQLite database for tracking processed statements"""
-    conn = sqlite3.connect('asic_statements.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS processed_statements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            company_name TEXT NOT NULL,
-            acn TEXT NOT NULL,
-            asic_reference TEXT NOT NULL,
-            bpay_reference TEXT NOT NULL,
-            amount REAL NOT NULL,
-            file_hash TEXT NOT NULL UNIQUE,
-            processed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            aba_filename TEXT,
-            batch_id TEXT
+def list_upload_entries(uploaded_files):
+    """Split Streamlit uploads into the statements they contain - returns (entries, skipped)
+    
+    A PDF upload is one entry; a ZIP upload is one entry per PDF member, listed
+    from the archive's central directory without decompressing anything.
+    Each entry is a dict of 'key' (file_id, member name or None), 'filename',
+    'data' (the upload's bytes) and 'member'. skipped lists messages for ZIP
+    members that will not be extracted and archives that could not be opened.
+    """
+    entries = []
+    skipped = []
+    for uploaded_file in uploaded_files:
+        # getvalue() leaves the upload's position alone and shares its buffer
+        data = uploaded_file.getvalue()
+        if not is_zip_name(uploaded_file.name):
+            entries.append({
+                'key': (uploaded_file.file_id, None),
+                'filename': uploaded_file.name,
+                'data': data,
+                'member': None
+            })
+            continue
+        
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                members, member_skips = list_pdf_members(archive)
+        except zipfile.BadZipFile as e:
+            skipped.append(f"{uploaded_file.name}: not a readable ZIP archive ({e})")
+            continue
+        
+        skipped.extend(f"{uploaded_file.name}/{name}: {reason}" for name, reason in member_skips)
+        entries.extend(
+            {
+                'key': (uploaded_file.file_id, info.filename),
+                'filename': f"{uploaded_file.name}/{info.filename}",
+                'data': data,
+                'member': info.filename
+            }
+            for info in members
         )
-    ''')
     
-    conn.commit()
-    conn.close()
+    return entries, skipped
 
-def get_file_hash(file_content):
-    """Generate SHA-256 hash of file content"""
-    return hashlib.sha256(file_content).hexdigest()
+def _memoize_extraction(memo, entry_key, result):
+    """Remember an extraction result for an upload entry (a copy - callers annotate asic_data)"""
+    key = ('extraction', result['file_hash'], EXTRACTOR_VERSION)
+    memo.set(('file', entry_key), result['file_hash'])
+    if key not in memo:
+        asic_data = dict(result['asic_data']) if result['asic_data'] is not None else None
+        memo.set(key, (asic_data, result['backend'], result['error'], result['cached'], result['metrics'].as_dict()))
 
-def check_duplicate_statement(file_hash, asic_reference, bpay_reference):
-    """Check if statement has already been processed"""
-    conn = sqlite3.connect('asic_statements.db')
-    cursor = conn.cursor()
-    
-    # Check by file hash first (exact same file)
-    cursor.execute('''
-        SELECT company_name, processed_date, aba_filename 
-        FROM processed_statements 
-        WHERE file_hash = ?
-    ''', (file_hash,))
-    
-    file_duplicate = cursor.fetchone()
-    
-    # Check by ASIC reference and BPay reference (same payment)
-    cursor.execute('''
-        SELECT company_name, processed_date, aba_filename 
-        FROM processed_statements 
-        WHERE asic_reference = ? AND bpay_reference = ?
-    ''', (asic_reference, bpay_reference))
-    
-    payment_duplicate = cursor.fetchone()
-    
-    conn.close()
+def _memoized_result(memo, entry):
+    """Result for an upload entry extracted earlier in this session, or None"""
+    file_hash = memo.get(('file', entry['key']))
+    extraction = memo.get(('extraction', file_hash, EXTRACTOR_VERSION)) if file_hash else None
+    if extraction is None:
+        return None
     
+    asic_data, backend, error, cached, metrics = extraction
     return {
-        'file_duplicate': file_duplicate,
-        'payment_duplicate': payment_duplicate
+        'filename': entry['filename'],
+        'file_hash': file_hash,
+        'asic_data': dict(asic_data) if asic_data is not None else None,
+        'backend': backend,
+        'error': error,
+        'cached': cached,
+        'metrics': Metrics.from_dict(metrics)
     }
 
-def save_processed_statement(asic_data, file_hash, aba_filename, batch_id):
-    """Save processed statement to database"""
-    conn = sqlite3.connect('asic_statements.db')
-    cursor = conn.cursor()
+def _read_entries(entries, spool):
+    """Yield (index, upload, read_seconds, error) for each entry, streaming ZIP members
     
+    Members of one archive are read from a single open ZipFile and hashed as
+    they are decompressed into spool, so they are never re-read and only
+    written to disk once the batch's memory budget is used up.
+    """
+    archives = {}
     try:
-        cursor.execute('''
-            INSERT INTO processed_statements 
-            (company_name, acn, asic_reference, bpay_reference, amount, file_hash, aba_filename, batch_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            asic_data['company_name'],
-            asic_data['acn'],
-            asic_data['asic_reference'],
-            asic_data['bpay_reference'],
-            float(asic_data['amount']),
-            file_hash,
-            aba_filename,
-            batch_id
-        ))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
+        for index, entry in enumerate(entries):
+            started = time.perf_counter()
+            if entry['member'] is None:
+                yield index, (entry['filename'], entry['data']), time.perf_counter() - started, None
+                continue
+            
+            upload_id = entry['key'][0]
+            try:
+                if upload_id not in archives:
+                    archives[upload_id] = zipfile.ZipFile(io.BytesIO(entry['data']))
+                file_content, file_hash = read_member(archives[upload_id], entry['member'], spool)
+            except (zipfile.BadZipFile, ValueError, NotImplementedError, EOFError) as e:
+                # Keyed by name so the error is remembered like any other result
+                error_hash = get_file_hash(f"unreadable:{entry['filename']}:{e}".encode())
+                yield index, (entry['filename'], b"", error_hash), time.perf_counter() - started, f"Could not read from ZIP: {e}"
+                continue
+            yield index, (entry['filename'], file_content, file_hash), time.perf_counter() - started, None
     finally:
-        conn.close()
+        for archive in archives.values():
+            archive.close()
 
-def get_processed_statements():
-    """Get all processed statements from database"""
-    conn = sqlite3.connect('asic_statements.db')
-    cursor = conn.cursor()
+def _start_extraction_job(entries):
+    """Extract upload entries in a background job the page can poll"""
+    metrics = Metrics()
+    profile_path = get_profile_path("batch")
     
-    cursor.execute('''
-        SELECT company_name, acn, asic_reference, amount, processed_date, aba_filename
-        FROM processed_statements 
-        ORDER BY processed_date DESC
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
+    def produce(cancel_event):
+        # Read and profiled here because cProfile only sees the thread that enables it
+        with profiled(profile_path), UploadSpool() as spool:
+            uploads = []
+            upload_indexes = []
+            read_seconds = {}
+            for index, upload, seconds, error in _read_entries(entries, spool):
+                if error is None:
+                    uploads.append(upload)
+                    upload_indexes.append(index)
+                    read_seconds[index] = seconds
+                    continue
+                
+                unreadable = Metrics()
+                unreadable.add_time('read', seconds)
+                yield index, {
+                    'filename': upload[0],
+                    'file_hash': upload[2],
+                    'asic_data': None,
+                    'backend': None,
+                    'error': error,
+                    'cached': False,
+                    'metrics': unreadable
+                }
+            # Plain PDFs are held in uploads from here on - the job keeps no other copy
+            entries.clear()
+            
+            for upload_index, result in iter_extract_batch(uploads, metrics=metrics, cancel_event=cancel_event):
+                file_content = uploads[upload_index][1]
+                if isinstance(file_content, SpooledFile):
+                    spool.release(file_content)
+                index = upload_indexes[upload_index]
+                result['metrics'].add_time('read', read_seconds[index])
+                yield index, result
     
-    return results
+    job = BackgroundJob([entry['key'] for entry in entries], produce)
+    return {'job': job.start(), 'metrics': metrics, 'logged': False}
 
-def extract_asic_data(pdf_file):
-    """Extract relevant data from ASIC statement PDF"""
-    text = ""
+def extract_uploads(uploaded_files):
+    """Extract Streamlit uploads in the background, reusing this session's earlier results
     
-    # Try pdfplumber first for better text extraction
-    try:
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                text += page.extract_text() + "\n"
-    except:
-        # Fallback to PyPDF2
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-    
-    # Extract company details - look for pattern "FOR [COMPANY NAME]" after ACN
-    company_name_match = re.search(r'FOR\s+([A-Z][A-Z0-9\s&]+(?:PTY\s+LTD|LIMITED|LTD))', text)
-    if company_name_match:
-        company_name = company_name_match.group(1).strip()
-    else:
-        company_name = "Unknown Company"
+    PDF uploads are one statement each and ZIP uploads contribute every PDF
+    they contain (see list_upload_entries).
     
-    # Extract ACN
-    acn_match = re.search(r'ACN\s+(\d{3}\s+\d{3}\s+\d{3})', text)
-    acn = acn_match.group(1).replace(' ', '') if acn_match else ""
+    Every widget change reruns the whole script. Statements already extracted
+    in this session are answered from a memo in session state - keyed by
+    (file_id, member) -> file hash and (file hash, EXTRACTOR_VERSION) -> result
+    - so they are not re-read, re-hashed or re-parsed. New uploads are
+    extracted by a background job kept in session state; each rerun picks up
+    whatever it has finished since the last one.
     
-    # Extract payment amount
-    amount_match = re.search(r'Annual Review.*?\$(\d+\.\d{2})', text)
-    amount = amount_match.group(1) if amount_match else "0.00"
+    Returns (results, extraction, skipped) - results in upload order with None
+    for statements not extracted yet, the job's session state entry (or None),
+    and messages for ZIP contents that were skipped.
+    """
+    memo = st.session_state.get('extraction_memo')
+    if memo is None:
+        # Two entries per file: its hash and its extraction result
+        memo = st.session_state.extraction_memo = BoundedMemo(EXTRACTION_MEMO_MAX_FILES * 2)
+    extraction = st.session_state.get('extraction_job')
     
-    # Extract ASIC reference
-    ref_match = re.search(r'Annual Review.*?([A-Z0-9]{13}\s+[A-Z])', text)
-    asic_reference = ref_match.group(1).replace(' ', '') if ref_match else ""
+    def collect():
+        job = extraction['job']
+        finished = job.results()
+        for index, result in finished.items():
+            _memoize_extraction(memo, job.keys[index], result)
+        
+        if job.done and not extraction['logged']:
+            extraction['logged'] = True
+            log_batch_metrics([finished[index] for index in sorted(finished)], extraction['metrics'])
     
-    # Extract BPay reference - look for 13-digit number that appears after "Ref:" line
-    # First try to find the standalone 13-digit number
-    bpay_ref_match = re.search(r'^\s*(\d{13})\s*$', text, re.MULTILINE)
-    if bpay_ref_match:
-        bpay_ref = bpay_ref_match.group(1)
-    else:
-        # Fallback: look for the number in the barcode-like line with asterisks
-        barcode_match = re.search(r'\*\d+\s+(\d{13})\s+\d+\s+\*', text)
-        if barcode_match:
-            bpay_ref = barcode_match.group(1)
-        else:
-            # Final fallback to the spaced pattern
-            bpay_fallback = re.search(r'Ref:\s+(\d{4}\s+\d{4}\s+\d{4}\s+\d{3})', text)
-            bpay_ref = bpay_fallback.group(1).replace(' ', '') if bpay_fallback else ""
+    if extraction is not None:
+        collect()
     
-    return {
-        'company_name': company_name,
-        'acn': acn,
-        'amount': amount,
-        'asic_reference': asic_reference,
-        'bpay_reference': bpay_ref
+    entries, skipped = list_upload_entries(uploaded_files)
+    results = [_memoized_result(memo, entry) for entry in entries]
+    missing = [entry for entry, result in zip(entries, results) if result is None]
+    if not missing:
+        return results, extraction, skipped
+    
+    # A cancelled or failed job waits for the user to resume it; a new job is
+    # only started when files were added that no job has seen
+    job = extraction['job'] if extraction is not None else None
+    if job is None or not {entry['key'] for entry in missing} <= set(job.keys):
+        if job is not None:
+            job.cancel()
+        extraction = st.session_state.extraction_job = _start_extraction_job(missing)
+        job = extraction['job']
+    
+    # Small uploads usually finish within one poll, saving a rerun
+    if not job.done:
+        job.wait(EXTRACTION_POLL_SECONDS)
+    collect()
+    
+    results = [result or _memoized_result(memo, entry) for result, entry in zip(results, entries)]
+    return results, extraction, skipped
+
+def reservation_session_id():
+    """This browser session's owner id for statement reservations"""
+    if 'reservation_session_id' not in st.session_state:
+        st.session_state.reservation_session_id = f"app-{uuid.uuid4().hex[:12]}"
+    return st.session_state.reservation_session_id
+
+def reserve_staged_statements(statements):
+    """Reserve the statements staged in this session - returns the holder of each, None if ours
+    
+    Reruns from widget changes don't each take the database's write lock:
+    the reservation is only rewritten when the staged statements change, when
+    a third of the lease has passed, or while another session holds some of
+    them (to notice as soon as it lets go).
+    """
+    claims = tuple(
+        (asic_data['file_hash'], asic_data['asic_reference'], asic_data['bpay_reference'])
+        for asic_data in statements
+    )
+    reservation = st.session_state.get('reservation')
+    if (
+        reservation is not None and reservation['claims'] == claims
+        and not any(reservation['holders']) and time.time() < reservation['renew_at']
+    ):
+        return reservation['holders']
+    
+    holders = reserve_statements(reservation_session_id(), claims)
+    st.session_state.reservation = {
+        'claims': claims,
+        'holders': holders,
+        'renew_at': time.time() + RESERVATION_LEASE_SECONDS / 3
     }
+    return holders
 
-def format_aba_amount(amount_str):
-    """Convert amount string to ABA format (cents, 10 digits, zero-padded)"""
-    try:
-        amount = float(amount_str)
-        cents = int(amount * 100)
-        return f"{cents:010d}"
-    except:
-        return "0000000000"
+def release_staged_statements():
+    """Let other sessions have the statements this session had staged"""
+    if st.session_state.pop('reservation', None) is not None:
+        release_reservations(reservation_session_id())
+
+STAGE_LABELS = {
+    'read': "Read uploads",
+    'hash': "Hash files",
+    'cache_lookup': "Extraction cache lookup",
+    'pypdf2': "PyPDF2",
+    'pdfplumber': "pdfplumber",
+    'regex': "Field regexes",
+    'extract_wall': "Extraction (wall clock)",
+    'cache_save': "Extraction cache save",
+    'duplicate_check': "Duplicate check",
+    'reservation': "Reserve staged statements",
+}
+
+def render_metrics_panel(extraction_results, batch_metrics):
+    """Expander showing where the time went for the current upload"""
+    totals = batch_totals((result['metrics'] for result in extraction_results), batch_metrics)
+    
+    with st.expander("⏱️ Processing metrics"):
+        st.caption(
+            "PyPDF2, pdfplumber and regex times are summed across worker processes, "
+            "so they can exceed the wall-clock extraction time."
+        )
+        stage_rows = [
+            {"Stage": STAGE_LABELS.get(stage, stage), "Time (ms)": round(seconds * 1000, 1)}
+            for stage, seconds in totals.as_dict()['timings'].items()
+        ]
+        st.dataframe(pd.DataFrame(stage_rows), hide_index=True, use_container_width=True)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Pages parsed", totals.counters['pages_parsed'])
+        col2.metric("Backend fallbacks", totals.counters['backend_fallbacks'])
+        col3.metric("MB hashed", f"{totals.counters['bytes_hashed'] / 1e6:.1f}")
+        col4.metric("DB round-trips", totals.counters['db_round_trips'])
+        
+        file_rows = []
+        for result in extraction_results:
+            metrics = result['metrics']
+            file_rows.append({
+                "File": result['filename'],
+                "Cached": result['cached'],
+                "Backend": result['backend'] or "-",
+                "Pages": metrics.counters['pages_parsed'],
+                **{
+                    f"{STAGE_LABELS[stage]} (ms)": round(metrics.timings[stage] * 1000, 1)
+                    for stage in ('read', 'hash', 'pypdf2', 'pdfplumber', 'regex')
+                }
+            })
+        st.dataframe(pd.DataFrame(file_rows), hide_index=True, use_container_width=True)
+
+# Rows per page of the uploaded statements table
+STATEMENT_TABLE_PAGE_SIZE = 100
+
+# ABA records shown in the preview at first, and per "show more"
+ABA_PREVIEW_LINES = 20
+ABA_PREVIEW_MORE_LINES = 500
+
+STATUS_LABELS = {
+    'new': "✅ New",
+    'duplicate': "⚠️ Duplicate",
+    'reserved': "🔒 Other session",
+    'incomplete': "📝 Incomplete",
+}
 
-def generate_aba_file(asic_data_list, user_bsb, user_account, user_name, processing_date, apca_number="301500"):
-    """Generate ABA file content for multiple ASIC payments following CEMTEX standard"""
+FIELD_LABELS = {
+    'company_name': "Company",
+    'acn': "ACN",
+    'amount': "Amount",
+    'asic_reference': "ASIC Reference",
+    'bpay_reference': "BPay Reference",
+}
+
+# Columns the statements table can be searched on
+SEARCH_COLUMNS = ("Company", "ACN", "ASIC Reference", "BPay Reference", "File")
+
+def statement_status(asic_data):
+    """'duplicate', 'reserved' (staged in another session), 'incomplete' (missing fields, not paid) or 'new'"""
+    if asic_data['is_duplicate']:
+        return 'duplicate'
+    if asic_data.get('reserved_by') is not None:
+        return 'reserved'
+    if missing_fields(asic_data):
+        return 'incomplete'
+    return 'new'
+
+def statement_flags(asic_data, asic_data_list):
+    """Why a statement needs a look - duplicates, another session, missing fields"""
+    flags = []
+    duplicate_info = asic_data['duplicate_info']
+    if duplicate_info['file_duplicate']:
+        flags.append(f"same file processed {duplicate_info['file_duplicate'][1][:10]}")
+    if duplicate_info['payment_duplicate']:
+        flags.append(f"same payment processed {duplicate_info['payment_duplicate'][1][:10]}")
+    if duplicate_info['upload_duplicate'] is not None:
+        flags.append(f"same as {asic_data_list[duplicate_info['upload_duplicate']]['filename']}")
+    if asic_data.get('reserved_by') is not None:
+        until = datetime.fromtimestamp(asic_data['reserved_by']['expires_at']).strftime('%H:%M')
+        flags.append(f"staged in another session until {until}")
+    missing = missing_fields(asic_data)
+    if missing:
+        flags.append("missing " + ", ".join(FIELD_LABELS[field] for field in missing))
+    return "; ".join(flags)
+
+def statements_frame(asic_data_list):
+    """One row per uploaded statement, in upload order, for the statements table
     
-    # Handle single item case (backward compatibility)
-    if not isinstance(asic_data_list, list):
-        asic_data_list = [asic_data_list]
+    '#' is the statement's position in asic_data_list (from 1), so a row can be
+    traced back after the table is filtered or sorted.
+    """
+    return pd.DataFrame({
+        "#": range(1, len(asic_data_list) + 1),
+        "Status": [STATUS_LABELS[statement_status(asic_data)] for asic_data in asic_data_list],
+        "Company": [asic_data['company_name'] for asic_data in asic_data_list],
+        "ACN": [asic_data['acn'] for asic_data in asic_data_list],
+        "Amount": [float(asic_data['amount']) for asic_data in asic_data_list],
+        "ASIC Reference": [asic_data['asic_reference'] for asic_data in asic_data_list],
+        "BPay Reference": [asic_data['bpay_reference'] for asic_data in asic_data_list],
+        "File": [asic_data['filename'] for asic_data in asic_data_list],
+        "Flags": [statement_flags(asic_data, asic_data_list) for asic_data in asic_data_list],
+    })
+
+def filter_statements_frame(frame, statuses=None, search="", flagged_only=False, sort_by="#", descending=False):
+    """Rows of statements_frame matching the table's filters, sorted
     
-    # RBA bank details (destination)
-    rba_bsb = "093-003"
-    rba_account = "317118"
+    statuses are STATUS_LABELS values to keep (None keeps all); search is
+    matched case-insensitively against SEARCH_COLUMNS.
+    """
+    mask = pd.Series(True, index=frame.index)
+    if statuses is not None:
+        mask &= frame["Status"].isin(statuses)
+    if flagged_only:
+        mask &= frame["Flags"] != ""
+    if search:
+        found = pd.Series(False, index=frame.index)
+        for column in SEARCH_COLUMNS:
+            found |= frame[column].str.contains(search, case=False, regex=False)
+        mask &= found
+    return frame[mask].sort_values([sort_by, "#"], ascending=[not descending, True], kind="stable")
+
+def render_statement_details(asic_data, asic_data_list):
+    """Everything known about one statement, for the row selected in the table"""
+    with st.container(border=True):
+        st.markdown(f"**{asic_data['filename']}** - {STATUS_LABELS[statement_status(asic_data)]}")
+        columns = st.columns(len(FIELD_LABELS))
+        for column, (field, label) in zip(columns, FIELD_LABELS.items()):
+            column.metric(label, f"${asic_data[field]}" if field == 'amount' else (asic_data[field] or "-"))
+        
+        duplicate_info = asic_data['duplicate_info']
+        if duplicate_info['file_duplicate']:
+            st.write("**Exact same file processed on:**", duplicate_info['file_duplicate'][1][:19])
+            st.write("**Original ABA file:**", duplicate_info['file_duplicate'][2])
+        if duplicate_info['payment_duplicate']:
+            st.write("**Same payment processed on:**", duplicate_info['payment_duplicate'][1][:19])
+            st.write("**Original ABA file:**", duplicate_info['payment_duplicate'][2])
+        if duplicate_info['upload_duplicate'] is not None:
+            st.write("**Same statement earlier in this upload:**", asic_data_list[duplicate_info['upload_duplicate']]['filename'])
+        if asic_data.get('reserved_by') is not None:
+            until = datetime.fromtimestamp(asic_data['reserved_by']['expires_at']).strftime('%H:%M')
+            st.write(f"**Staged in another session** until {until}, or until that session generates its batch or logs out")
+        missing = missing_fields(asic_data)
+        if missing:
+            st.write("**Not found in the PDF:**", ", ".join(FIELD_LABELS[field] for field in missing))
+
+@st.fragment
+def render_statements_table(asic_data_list):
+    """Filterable, sortable, paged table of the uploaded statements with drill-down
     
-    # Format processing date as DDMMYY
-    date_str = processing_date.strftime("%d%m%y")
+    One dataframe replaces a widget per statement, and only the current page
+    is sent to the browser. As a fragment, filtering, sorting, paging and
+    selecting a row rerun only the table, not the extraction and duplicate
+    checks above it.
+    """
+    frame = statements_frame(asic_data_list)
+    present = [label for label in STATUS_LABELS.values() if label in set(frame["Status"])]
     
-    # Clean BSB format
-    user_bsb_clean = user_bsb.replace("-", "").replace(" ", "")
+    col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
+    with col1:
+        statuses = st.multiselect("Status", present, default=present, key="statements_status")
+    with col2:
+        search = st.text_input("Search", placeholder="Company, ACN, reference or file", key="statements_search")
+    with col3:
+        sort_by = st.selectbox("Sort by", ["#", "Company", "Amount", "Status", "ACN", "File"], key="statements_sort")
+    with col4:
+        descending = st.checkbox("Descending", key="statements_descending")
+        flagged_only = st.checkbox("Flagged only", key="statements_flagged")
     
-    # Ensure BSB has hyphen for trace record
-    if "-" not in user_bsb:
-        user_bsb_with_hyphen = f"{user_bsb_clean[:3]}-{user_bsb_clean[3:6]}"
-    else:
-        user_bsb_with_hyphen = user_bsb
-    
-    # Calculate total amount for all payments
-    total_amount = sum(float(asic_data['amount']) for asic_data in asic_data_list)
-    total_amount_aba = format_aba_amount(str(total_amount))
-    
-    # Descriptive Record (Type 0) - exactly 120 chars per CEMTEX standard
-    header = (
-        "0"                                      # Pos 1: Record type (1)
-        + " " * 17                               # Pos 2-18: Blank (17)
-        + "01"                                   # Pos 19-20: Reel sequence (2)
-        + "CBA"                                  # Pos 21-23: Financial institution (3)
-        + " " * 7                                # Pos 24-30: Blank (7)
-        + f"{user_name[:26]:<26}"               # Pos 31-56: User name (26)
-        + apca_number                            # Pos 57-62: User ID/APCA number (6)
-        + f"{'ASIC':<12}"                       # Pos 63-74: Entry description (12)
-        + date_str                               # Pos 75-80: Processing date DDMMYY (6)
-        + " " * 40                               # Pos 81-120: Blank (40)
+    view = filter_statements_frame(frame, statuses, search, flagged_only, sort_by, descending)
+    page_count = max(1, math.ceil(len(view) / STATEMENT_TABLE_PAGE_SIZE))
+    
+    # Back to the first page whenever the filters change
+    filters = (tuple(statuses), search, flagged_only, sort_by, descending, len(asic_data_list))
+    if st.session_state.get('statements_filters') != filters:
+        st.session_state.statements_filters = filters
+        st.session_state.statements_page = 1
+    page = 1
+    if page_count > 1:
+        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, key="statements_page")
+    rows = view.iloc[(page - 1) * STATEMENT_TABLE_PAGE_SIZE:page * STATEMENT_TABLE_PAGE_SIZE]
+    
+    event = st.dataframe(
+        rows,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "#": st.column_config.NumberColumn(width="small"),
+            "Amount": st.column_config.NumberColumn(format="$%.2f"),
+        },
+        on_select="rerun",
+        selection_mode="single-row",
+        key="statements_table"
+    )
+    st.caption(
+        f"Showing {len(rows)} of {len(view)} matching statement(s), {len(frame)} uploaded. "
+        "Select a row for its details."
     )
     
-    # Generate credit detail records for each ASIC payment
-    credit_details = []
-    for asic_data in asic_data_list:
-        amount_aba = format_aba_amount(asic_data['amount'])
-        
-        credit_detail = (
-            "1"                                                      # Pos 1: Record type (1)
-            + rba_bsb                                                # Pos 2-8: BSB with hyphen (7)
-            + f"{rba_account:>9}"                                   # Pos 9-17: Account number (9)
-            + "N"                                                    # Pos 18: Indicator (1)
-            + "53"                                                   # Pos 19-20: Transaction code 53 for pay (2)
-            + amount_aba                                             # Pos 21-30: Amount in cents (10)
-            + f"{'ASIC':<32}"                                       # Pos 31-62: Account title - always ASIC (32)
-            + f"{asic_data['bpay_reference'][:18]:<18}"            # Pos 63-80: Lodgement reference - BPay ref (18)
-            + user_bsb_with_hyphen                                   # Pos 81-87: Trace BSB (7)
-            + f"{user_account[:9]:>9}"                              # Pos 88-96: Trace account (9)
-            + f"{user_name[:16]:<16}"                               # Pos 97-112: Remitter name (16)
-            + "00000000"                                             # Pos 113-120: Withholding tax (8)
+    selected = [position for position in event.selection.rows if position < len(rows)]
+    if selected:
+        render_statement_details(asic_data_list[rows.iloc[selected[0]]["#"] - 1], asic_data_list)
+
+def aba_preview(aba_content, line_count):
+    """The first line_count records of an ABA file - returns (text, records not shown)"""
+    lines = aba_content.splitlines()
+    return "\n".join(lines[:line_count]), max(0, len(lines) - line_count)
+
+def _show_more_aba_records(preview_key, line_count):
+    st.session_state.aba_preview = (preview_key, line_count)
+
+@st.fragment
+def render_aba_preview(aba_content, title):
+    """ABA file preview - the first records, more only when asked for
+    
+    A fragment, so showing more doesn't rerun the script and drop the
+    generated batch from the page.
+    """
+    st.subheader(title)
+    preview_key = hashlib.sha256(aba_content.encode("ascii")).hexdigest()
+    if st.session_state.get('aba_preview', (None,))[0] != preview_key:
+        st.session_state.aba_preview = (preview_key, ABA_PREVIEW_LINES)
+    line_count = st.session_state.aba_preview[1]
+    
+    text, remaining = aba_preview(aba_content, line_count)
+    st.code(text, language="text")
+    if remaining:
+        st.caption(f"{remaining} more record(s) not shown - the download has the whole file.")
+        st.button(
+            f"Show {min(remaining, ABA_PREVIEW_MORE_LINES)} more",
+            key="aba_preview_more",
+            on_click=_show_more_aba_records,
+            args=(preview_key, line_count + ABA_PREVIEW_MORE_LINES)
         )
-        credit_details.append(credit_detail)
-    
-    # Single balancing debit record for the total amount
-    debit_detail = (
-        "1"                                                      # Pos 1: Record type (1)
-        + user_bsb_with_hyphen                                   # Pos 2-8: User's BSB with hyphen (7)
-        + f"{user_account[:9]:>9}"                              # Pos 9-17: User's account number (9)
-        + " "                                                    # Pos 18: Space (1)
-        + "13"                                                   # Pos 19-20: Transaction code 13 for debit (2)
-        + total_amount_aba                                       # Pos 21-30: Total amount in cents (10)
-        + f"{'Business':<32}"                                   # Pos 31-62: Description (32)
-        + f"{date_str[:2]}{processing_date.strftime('%B')[:4]}{date_str[4:6]}"[:18].ljust(18)  # Pos 63-80: Reference (18)
-        + user_bsb_with_hyphen                                   # Pos 81-87: Trace BSB (7)
-        + f"{user_account[:9]:>9}"                              # Pos 88-96: Trace account (9)
-        + f"{user_name[:16]:<16}"                               # Pos 97-112: Remitter name (16)
-        + "00000000"                                             # Pos 113-120: Withholding tax (8)
+
+HISTORY_PAGE_SIZE = 10
+
+def render_statement_history():
+    """Sidebar history view - searchable and paged without loading every row"""
+    with st.expander("🔍 Search", expanded=False):
+        company_name = st.text_input("Company name", key="history_company")
+        acn = st.text_input("ACN", key="history_acn")
+        asic_reference = st.text_input("ASIC reference", key="history_asic_reference")
+        batch_id = st.text_input("Batch ID", key="history_batch_id")
+        date_range = st.date_input("Processed between", value=(), key="history_dates")
+    
+    date_from = date_range[0] if len(date_range) > 0 else None
+    date_to = date_range[1] if len(date_range) > 1 else date_from
+    filters = (company_name, acn, asic_reference, batch_id, date_from, date_to)
+    
+    # Start of each page visited so far; reset whenever the search changes
+    if st.session_state.get('history_filters') != filters:
+        st.session_state.history_filters = filters
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+    
+    statements, next_cursor = get_statement_history(
+        limit=HISTORY_PAGE_SIZE,
+        cursor=cursors[-1],
+        company_name=company_name,
+        acn=acn,
+        asic_reference=asic_reference,
+        batch_id=batch_id,
+        date_from=date_from,
+        date_to=date_to
     )
     
-    # Calculate record count (credit records + 1 debit record)
-    record_count = len(asic_data_list) + 1
-    
-    # File Total Record (Type 7) - exactly 120 chars per CEMTEX standard
-    trailer = (
-        "7"                           # Pos 1: Record type (1)
-        + "999-999"                   # Pos 2-8: BSB filler (7)
-        + " " * 12                    # Pos 9-20: Blank (12)
-        + "0" * 10                    # Pos 21-30: Net total (10)
-        + total_amount_aba            # Pos 31-40: Credit total (10)
-        + total_amount_aba            # Pos 41-50: Debit total (10)
-        + " " * 24                    # Pos 51-74: Blank (24)
-        + f"{record_count:06d}"       # Pos 75-80: Record count (6)
-        + " " * 40                    # Pos 81-120: Blank (40)
+    if not statements:
+        st.text("No matching statements" if any(filters) else "No statements processed yet")
+        return
+    
+    st.subheader(f"Page {len(cursors)}")
+    for stmt in statements:
+        st.text(f"• {stmt['company_name']} - ${stmt['amount']:.2f}")
+        st.caption(f"  {stmt['asic_reference']} | {stmt['processed_date'][:10]} | {stmt['batch_id'] or ''}")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("◀ Newer", disabled=len(cursors) == 1, key="history_newer"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Older ▶", disabled=next_cursor is None, key="history_older"):
+            cursors.append(next_cursor)
+            st.rerun()
+
+MATCH_TYPE_LABELS = {
+    'batch_id': "batch ID",
+    'reference': "BPay reference",
+    'batch_total': "ABA file total",
+    'amount': "amount alone",
+}
+
+def render_reconciliation():
+    """Match a bank CSV export's debits against processed statements and list what is left over"""
+    st.header("🏦 Bank Reconciliation")
+    st.caption(
+        "Upload the bank account's transaction CSV export after the ABA file has been processed. "
+        "Each debit is matched to the ABA file or statement it paid, and the match is saved."
+    )
+    bank_csv = st.file_uploader("Bank transaction CSV", type=['csv'], key="reconciliation_csv")
+    window_days = st.number_input(
+        "Days a debit may follow its statements' processing",
+        min_value=0, max_value=90, value=RECONCILE_WINDOW_DAYS, key="reconciliation_window"
     )
     
-    # Build the complete ABA file
-    aba_content = header + "\r\n"
-    for credit_detail in credit_details:
-        aba_content += credit_detail + "\r\n"
-    aba_content += debit_detail + "\r\n"
-    aba_content += trailer + "\r\n"
+    if bank_csv is not None and st.button("Reconcile", type="primary", key="reconcile"):
+        try:
+            st.session_state.reconciliation = reconcile_bank_csv(io.BytesIO(bank_csv.getvalue()), window_days=window_days)
+        except ValueError as e:
+            st.error(f"❌ Could not read {bank_csv.name} - {e}")
+            return
+    
+    summary = st.session_state.get('reconciliation')
+    if summary is None:
+        return
     
-    return aba_content
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Debits", summary['debits'])
+    col2.metric("Matched", sum(summary['matched'].values()) + summary['already_matched'])
+    col3.metric("Unmatched debits", len(summary['unmatched_debits']))
+    col4.metric("Unmatched statements", len(summary['unmatched_statements']))
+    matched = ", ".join(
+        f"{count} by {MATCH_TYPE_LABELS[match_type]}"
+        for match_type, count in summary['matched'].items() if count
+    )
+    st.caption(
+        f"{summary['matched_statements']} statement(s) reconciled by this import ({matched or 'no new matches'}); "
+        f"{summary['already_matched']} debit(s) were matched by an earlier import."
+    )
+    
+    if summary['unmatched_debits']:
+        st.subheader("Debits with no matching statement")
+        st.dataframe(pd.DataFrame([
+            {
+                "Date": debit['date'].strftime("%d/%m/%Y"),
+                "Amount": f"${cents_to_amount(-debit['amount_cents'])}",
+                "Description": debit['description'],
+                "CSV row": debit['row']
+            }
+            for debit in summary['unmatched_debits']
+        ]), hide_index=True, use_container_width=True)
+    if summary['unmatched_statements']:
+        st.subheader("Statements with no matching debit")
+        st.dataframe(pd.DataFrame([
+            {
+                "Processed": statement['processed_date'][:10],
+                "Company": statement['company_name'],
+                "Amount": f"${statement['amount']:.2f}",
+                "BPay Ref": statement['bpay_reference'],
+                "Batch": statement['batch_id'] or "",
+                "ABA file": statement['aba_filename'] or ""
+            }
+            for statement in summary['unmatched_statements']
+        ]), hide_index=True, use_container_width=True)
+    if summary['skipped']:
+        st.warning(f"⚠️ {len(summary['skipped'])} CSV row(s) could not be read: " + "; ".join(
+            f"row {row_number} ({reason})" for row_number, reason in summary['skipped'][:5]
+        ))
+
+# Rows shown in the company and batch analytics tables
+ANALYTICS_TOP_COMPANIES = 50
+ANALYTICS_RECENT_BATCHES = 50
+
+EXPORT_MIME_TYPES = {'csv': "text/csv", 'parquet': "application/vnd.apache.parquet"}
+
+@st.fragment
+def render_analytics():
+    """Payment totals by month, company, batch and fee, with an export of the statements behind them
+    
+    Every figure comes from a cached aggregate query, so the page costs the
+    same however many statements have been processed.
+    """
+    st.header("📊 Payment Analytics")
+    date_range = st.date_input("Processed between", value=(), key="analytics_dates")
+    date_from = date_range[0] if len(date_range) > 0 else None
+    date_to = date_range[1] if len(date_range) > 1 else date_from
+    
+    totals = payment_totals(date_from, date_to)
+    if not totals['statement_count']:
+        st.info("No statements processed in this period" if date_from else "No statements processed yet")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Statements", f"{totals['statement_count']:,}")
+    col2.metric("Total paid", f"${cents_to_amount(totals['total_cents'])}")
+    col3.metric("Companies", f"{totals['company_count']:,}")
+    col4.metric("Batches", f"{totals['batch_count']:,}")
+    st.caption(f"Processed {totals['first_processed'][:10]} to {totals['last_processed'][:10]}")
+    
+    dollars = st.column_config.NumberColumn(format="$%.2f")
+    month_tab, company_tab, batch_tab, fee_tab = st.tabs(["By month", "By company", "Batches", "Fees"])
+    with month_tab:
+        months = pd.DataFrame([
+            {"Month": row['month'], "Statements": row['statement_count'], "Total": row['total_cents'] / 100}
+            for row in payment_summary('month', date_from, date_to)
+        ])
+        st.bar_chart(months, x="Month", y="Total")
+        st.dataframe(months, hide_index=True, use_container_width=True, column_config={"Total": dollars})
+    with company_tab:
+        st.caption(f"Top {min(ANALYTICS_TOP_COMPANIES, totals['company_count'])} of {totals['company_count']:,} companies by total paid")
+        st.dataframe(pd.DataFrame([
+            {
+                "Company": row['company_name'],
+                "ACN": row['acn'],
+                "Statements": row['statement_count'],
+                "Total": row['total_cents'] / 100,
+                "Last paid": row['last_processed'][:10]
+            }
+            for row in payment_summary('company', date_from, date_to, limit=ANALYTICS_TOP_COMPANIES)
+        ]), hide_index=True, use_container_width=True, column_config={"Total": dollars})
+    with batch_tab:
+        batches = payment_summary('batch', date_from, date_to, limit=ANALYTICS_RECENT_BATCHES)
+        if batches:
+            st.caption(f"Latest {len(batches)} of {totals['batch_count']:,} batches")
+            st.dataframe(pd.DataFrame([
+                {
+                    "Batch": row['batch_id'],
+                    "Processed": row['processed_date'][:10],
+                    "Statements": row['statement_count'],
+                    "ABA files": row['file_count'],
+                    "Total": row['total_cents'] / 100
+                }
+                for row in batches
+            ]), hide_index=True, use_container_width=True, column_config={"Total": dollars})
+        else:
+            st.text("No batches in this period")
+    with fee_tab:
+        st.dataframe(pd.DataFrame([
+            {
+                "Fee": row['amount_cents'] / 100,
+                "Statements": row['statement_count'],
+                "Total": row['total_cents'] / 100
+            }
+            for row in payment_summary('fee', date_from, date_to)
+        ]), hide_index=True, use_container_width=True, column_config={"Fee": dollars, "Total": dollars})
+    
+    st.subheader("Export")
+    export_format = st.radio("Format", EXPORT_FORMATS, format_func=str.upper, horizontal=True, key="analytics_export_format")
+    if export_format == 'parquet' and not parquet_available():
+        st.caption("Parquet export needs pyarrow - install it with: pip install pyarrow")
+        return
+    
+    export_key = (export_format, date_from, date_to)
+    if st.button(f"Prepare {export_format.upper()} export", key="analytics_prepare_export"):
+        output = io.BytesIO()
+        try:
+            row_count = export_statements(output, export_format, date_from, date_to)
+        except RuntimeError as e:
+            st.error(f"❌ {e}")
+            return
+        period = f"{date_from:%Y%m%d}-{date_to:%Y%m%d}" if date_from else "all"
+        st.session_state.analytics_export = {
+            'key': export_key,
+            'data': output.getvalue(),
+            'filename': f"ASIC_Statements_{period}.{export_format}",
+            'row_count': row_count
+        }
+    
+    prepared = st.session_state.get('analytics_export')
+    if prepared and prepared['key'] == export_key:
+        st.download_button(
+            label=f"📥 Download {prepared['row_count']:,} statements",
+            data=prepared['data'],
+            file_name=prepared['filename'],
+            mime=EXPORT_MIME_TYPES[export_format],
+            key="analytics_download"
+        )
 
 def main():
     st.set_page_config(page_title="ASIC ABA File Generator", page_icon="🏦")
@@ -342,11 +841,15 @@ def main():
     
     # Initialize database after authentication
     init_database()
+    configure_logging()
     
     # Add sidebar for processed statements
     with st.sidebar:
         st.header("👤 User Menu")
         if st.button("🔓 Logout"):
+            if 'extraction_job' in st.session_state:
+                st.session_state.extraction_job['job'].cancel()
+            release_staged_statements()
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
             st.rerun()
@@ -357,129 +860,184 @@ def main():
             st.session_state.show_processed = True
         
         if st.session_state.get('show_processed', False):
-            processed = get_processed_statements()
-            if processed:
-                st.subheader("Recently Processed")
-                for stmt in processed[:10]:  # Show last 10
-                    st.text(f"• {stmt[0]} - ${stmt[3]:.2f}")
-                    st.caption(f"  {stmt[2]} | {stmt[4][:10]}")
-            else:
-                st.text("No statements processed yet")
+            render_statement_history()
+        
+        st.divider()
+        st.header("🏦 Bank Reconciliation")
+        if st.button("Reconcile Bank Statement"):
+            st.session_state.show_reconciliation = not st.session_state.get('show_reconciliation', False)
+        
+        st.divider()
+        st.header("📊 Payment Analytics")
+        if st.button("View Payment Analytics"):
+            st.session_state.show_analytics = not st.session_state.get('show_analytics', False)
+    
+    if st.session_state.get('show_analytics', False):
+        render_analytics()
+        st.divider()
+    
+    if st.session_state.get('show_reconciliation', False):
+        render_reconciliation()
+        st.divider()
     
     # User bank details input
     st.header("Your Bank Details")
     col1, col2 = st.columns(2)
     
     with col1:
-        user_bsb = st.text_input("BSB", value="063245", help="Your bank BSB number")
-        user_account = st.text_input("Account Number", value="10758330", help="Your bank account number")
-        apca_number = st.text_input("APCA Number", value="301500", help="Your APCA User ID (6 digits)")
+        user_bsb = st.text_input("BSB", value=DEFAULT_BSB, help="Your bank BSB number")
+        user_account = st.text_input("Account Number", value=DEFAULT_ACCOUNT, help="Your bank account number")
+        apca_number = st.text_input("APCA Number", value=DEFAULT_APCA_NUMBER, help="Your APCA User ID (6 digits)")
     
     with col2:
-        user_name = st.text_input("Account Name", value="TT Accountancy Pty Ltd", help="Your account name")
+        user_name = st.text_input("Account Name", value=DEFAULT_ACCOUNT_NAME, help="Your account name")
         processing_date = st.date_input("Processing Date", datetime.now())
     
     # File upload
     st.header("Upload ASIC Statements")
     uploaded_files = st.file_uploader(
-        "Choose ASIC PDF files", 
-        type=['pdf'], 
+        "Choose ASIC PDF files or ZIP archives of them", 
+        type=['pdf', 'zip'], 
         accept_multiple_files=True,
-        help="You can upload multiple ASIC statements to create a batch payment"
+        help="You can upload multiple ASIC statements to create a batch payment - PDFs inside a ZIP are read straight from the archive"
     )
     
     if uploaded_files:
         # Process all PDFs with duplicate checking
         asic_data_list = []
         duplicates_found = []
+        incomplete = []
         total_amount = 0
         
-        with st.spinner(f"Extracting data from {len(uploaded_files)} PDF(s)..."):
-            for i, uploaded_file in enumerate(uploaded_files):
-                try:
-                    # Get file content for hashing
-                    file_content = uploaded_file.read()
-                    uploaded_file.seek(0)  # Reset file pointer
-                    file_hash = get_file_hash(file_content)
-                    
-                    # Extract ASIC data
-                    asic_data = extract_asic_data(uploaded_file)
-                    
-                    # Check for duplicates
-                    duplicate_check = check_duplicate_statement(
-                        file_hash, 
-                        asic_data['asic_reference'], 
-                        asic_data['bpay_reference']
-                    )
-                    
-                    # Add duplicate status to data
-                    asic_data['is_duplicate'] = duplicate_check['file_duplicate'] is not None or duplicate_check['payment_duplicate'] is not None
-                    asic_data['duplicate_info'] = duplicate_check
-                    asic_data['file_hash'] = file_hash
-                    asic_data['filename'] = uploaded_file.name
-                    
-                    asic_data_list.append(asic_data)
-                    
-                    if asic_data['is_duplicate']:
-                        duplicates_found.append(asic_data)
-                    else:
-                        total_amount += float(asic_data['amount'])
-                        
-                except Exception as e:
-                    st.error(f"Error processing {uploaded_file.name}: {str(e)}")
+        # Unchanged uploads come from the session memo, so widget changes stay
+        # cheap; new ones are extracted in the background while the page polls
+        extraction_results, extraction, skipped = extract_uploads(uploaded_files)
+        finished_results = [result for result in extraction_results if result is not None]
+        unfinished = len(extraction_results) - len(finished_results)
+        extraction_running = unfinished > 0 and not extraction['job'].done
+        
+        if skipped:
+            with st.expander(f"📦 {len(skipped)} item(s) in ZIP uploads skipped"):
+                for message in skipped:
+                    st.write(f"• {message}")
+        
+        batch_metrics = Metrics()
+        if extraction is not None and extraction['job'].done:
+            batch_metrics.merge(extraction['metrics'])
+        
+        if extraction_running:
+            job = extraction['job']
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.progress(
+                    len(finished_results) / len(extraction_results),
+                    text=f"Extracting data from {len(extraction_results)} PDF(s)... {len(finished_results)} done"
+                )
+            with col2:
+                if st.button("✖ Cancel", key="cancel_extraction"):
+                    job.cancel()
+                    st.rerun()
+        elif unfinished:
+            job = extraction['job']
+            if job.error:
+                st.error(f"❌ Extraction stopped: {job.error}")
+            else:
+                st.warning(f"⏹️ Extraction cancelled - {unfinished} of {len(extraction_results)} file(s) not processed")
+            if st.button("▶ Resume extraction", key="resume_extraction"):
+                del st.session_state.extraction_job
+                st.rerun()
+        
+        with st.spinner("Checking for duplicates..."):
+            extracted = []
+            for result in finished_results:
+                if result['error']:
+                    st.error(f"Error processing {result['filename']}: {result['error']}")
+                else:
+                    extracted.append(result)
+            
+            # Check the whole upload for duplicates at once - refreshed on every
+            # rerun so statements saved by another session show up immediately
+            # (the in-memory index, if ASIC_DUPLICATE_INDEX enables it, loads
+            # them by id watermark)
+            with batch_metrics.stage('duplicate_check'):
+                duplicate_checks = check_duplicate_statements([
+                    (result['file_hash'], result['asic_data']['asic_reference'], result['asic_data']['bpay_reference'])
+                    for result in extracted
+                ])
+            
+            for result, duplicate_check in zip(extracted, duplicate_checks):
+                asic_data = result['asic_data']
+                
+                # Add duplicate status to data
+                asic_data['is_duplicate'] = (
+                    duplicate_check['file_duplicate'] is not None
+                    or duplicate_check['payment_duplicate'] is not None
+                    or duplicate_check['upload_duplicate'] is not None
+                )
+                asic_data['duplicate_info'] = duplicate_check
+                asic_data['reserved_by'] = None
+                asic_data['file_hash'] = result['file_hash']
+                asic_data['filename'] = result['filename']
+                
+                asic_data_list.append(asic_data)
+                
+                if asic_data['is_duplicate']:
+                    duplicates_found.append(asic_data)
+                elif missing_fields(asic_data):
+                    # A statement without its references would fail ABA validation
+                    # and hold up the whole batch, so it is left out as the CLI does
+                    incomplete.append(asic_data)
+                else:
+                    total_amount += float(asic_data['amount'])
+            
+            # Claim the new statements for this session, so a colleague who
+            # uploads the same ones (or another scan of them) before this
+            # batch is generated sees them as taken
+            reserved_elsewhere = []
+            if not extraction_running:
+                new_statements = [
+                    data for data in asic_data_list
+                    if not data['is_duplicate'] and not missing_fields(data)
+                ]
+                with batch_metrics.stage('reservation'):
+                    holders = reserve_staged_statements(new_statements)
+                for asic_data, holder in zip(new_statements, holders):
+                    asic_data['reserved_by'] = holder
+                    if holder is not None:
+                        reserved_elsewhere.append(asic_data)
+                        total_amount -= float(asic_data['amount'])
         
         if asic_data_list:
             # Display summary
-            valid_statements = [data for data in asic_data_list if not data['is_duplicate']]
+            valid_statements = [
+                data for data in asic_data_list
+                if not data['is_duplicate'] and data['reserved_by'] is None and not missing_fields(data)
+            ]
             
-            if duplicates_found:
-                st.warning(f"⚠️ Found {len(duplicates_found)} duplicate statement(s)")
+            if duplicates_found or reserved_elsewhere or incomplete:
+                if duplicates_found:
+                    st.warning(f"⚠️ Found {len(duplicates_found)} duplicate statement(s)")
+                if incomplete:
+                    st.warning(
+                        f"📝 {len(incomplete)} statement(s) are missing fields and will not be paid: "
+                        + ", ".join(asic_data['filename'] for asic_data in incomplete)
+                    )
+                if reserved_elsewhere:
+                    st.warning(f"🔒 {len(reserved_elsewhere)} statement(s) are being processed in another session")
                 st.success(f"✅ {len(valid_statements)} new statement(s) ready for processing")
             else:
                 st.success(f"✅ Data extracted from {len(asic_data_list)} statement(s)!")
             
-            # Show duplicate warnings first
-            if duplicates_found:
-                st.subheader("🚨 Duplicate Statements Detected")
-                for dup_data in duplicates_found:
-                    with st.expander(f"⚠️ DUPLICATE: {dup_data['company_name']} - ${dup_data['amount']}", expanded=True):
-                        st.error("This statement has already been processed!")
-                        
-                        if dup_data['duplicate_info']['file_duplicate']:
-                            st.write("**Exact same file processed on:**", dup_data['duplicate_info']['file_duplicate'][1][:19])
-                            st.write("**Original ABA file:**", dup_data['duplicate_info']['file_duplicate'][2])
-                        
-                        if dup_data['duplicate_info']['payment_duplicate']:
-                            st.write("**Same payment processed on:**", dup_data['duplicate_info']['payment_duplicate'][1][:19])
-                            st.write("**Original ABA file:**", dup_data['duplicate_info']['payment_duplicate'][2])
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Company", dup_data['company_name'])
-                            st.metric("ACN", dup_data['acn'])
-                            st.metric("Amount", f"${dup_data['amount']}")
-                        with col2:
-                            st.metric("ASIC Reference", dup_data['asic_reference'])
-                            st.metric("BPay Reference", dup_data['bpay_reference'])
-            
             # Total amount summary (excluding duplicates)
             if valid_statements:
-                st.metric("Total Batch Amount", f"${total_amount:.2f}", help="Total amount for new ASIC payments (excluding duplicates)")
-                
-                # Display each new statement
-                st.subheader("New ASIC Statements")
-                for i, asic_data in enumerate(valid_statements):
-                    status_icon = "✅"
-                    with st.expander(f"{status_icon} Statement {i+1}: {asic_data['company_name']} - ${asic_data['amount']}"):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.metric("Company", asic_data['company_name'])
-                            st.metric("ACN", asic_data['acn'])
-                            st.metric("Amount", f"${asic_data['amount']}")
-                        with col2:
-                            st.metric("ASIC Reference", asic_data['asic_reference'])
-                            st.metric("BPay Reference", asic_data['bpay_reference'])
-        
+                st.metric("Total Batch Amount", f"${total_amount:.2f}", help="Total amount for new ASIC payments (excluding duplicates and incomplete statements)")
+            
+            # Every statement in one table, duplicates and missing fields flagged inline
+            st.subheader("Uploaded Statements")
+            render_statements_table(asic_data_list)
+            
+            render_metrics_panel(finished_results, batch_metrics)
+            
             # Bank details reminder
             st.info("""
             **Batch payments will be made to:**
@@ -489,61 +1047,146 @@ def main():
             - Name: ASIC, Official Administered Receipts Account
             """)
             
-            # Generate ABA file (only for non-duplicate statements)
-            if valid_statements and st.button("Generate Batch ABA File", type="primary", disabled=len(valid_statements)==0):
+            # Generate ABA file (only for new, complete statements)
+            if valid_statements and unfinished:
+                st.caption("Generating is available once every uploaded file has been extracted.")
+            
+            if valid_statements and st.button("Generate Batch ABA File", type="primary", disabled=unfinished > 0):
                 if user_bsb and user_account and user_name and apca_number:
-                    # Generate ABA content for valid statements only
-                    aba_content = generate_aba_file(
-                        valid_statements, 
-                        user_bsb, 
-                        user_account, 
-                        user_name,
-                        processing_date,
-                        apca_number
-                    )
+                    generate_metrics = Metrics()
+                    
+                    # Generate ABA content for valid statements only, split
+                    # into several files if the batch is over the per-file limits
+                    try:
+                        shards = plan_aba_shards(valid_statements)
+                    except ValueError as e:
+                        st.error(f"❌ No ABA file produced - {e}")
+                        st.stop()
+                    # Every file is validated as it is written, so nothing
+                    # is recorded or offered for download that the bank would reject
+                    try:
+                        with generate_metrics.stage('aba_generation'):
+                            written = write_aba_shards(
+                                shards,
+                                user_bsb, 
+                                user_account, 
+                                user_name,
+                                processing_date,
+                                apca_number
+                            )
+                    except ABAValidationError as e:
+                        st.error("❌ No ABA file produced - the generated file failed validation. Check your bank details:")
+                        for issue in e.report.errors[:10]:
+                            st.write(f"• {issue}")
+                        st.stop()
                     
                     # Create filename with date and company count
                     filename = f"ASIC_Batch_{len(valid_statements)}companies_{processing_date.strftime('%Y%m%d')}.ABA"
-                    batch_id = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    
-                    # Save processed statements to database
-                    saved_count = 0
-                    for asic_data in valid_statements:
-                        if save_processed_statement(asic_data, asic_data['file_hash'], filename, batch_id):
-                            saved_count += 1
+                    filenames = [aba_shard_filename(filename, number, len(shards)) for number in range(1, len(shards) + 1)]
+                    batch_filename = filename if len(shards) == 1 else f"{os.path.splitext(filename)[0]}_manifest.json"
+                    batch_id = new_batch_id()
                     
-                    st.download_button(
-                        label="📥 Download Batch ABA File",
-                        data=aba_content,
-                        file_name=filename,
-                        mime="text/plain"
+                    # Save the whole batch in one transaction before offering the download
+                    with generate_metrics.stage('commit'):
+                        commit = commit_batch(batch_id, batch_filename, valid_statements, shards=[
+                            {
+                                'aba_filename': shard_filename,
+                                'statements': shard,
+                                'record_count': stats['record_count'],
+                                'sha256': stats['sha256']
+                            }
+                            for shard_filename, shard, stats in zip(filenames, shards, written)
+                        ], session_id=reservation_session_id())
+                    log_metrics(
+                        "generate_metrics", generate_metrics,
+                        batch_id=batch_id, committed=commit['committed'], aba_files=len(shards)
                     )
                     
-                    # Show batch summary
-                    st.success(f"✅ ABA file generated for {len(valid_statements)} companies with total amount ${total_amount:.2f}")
-                    st.info(f"💾 {saved_count} statements saved to database to prevent future duplicates")
-                    
-                    # Show preview
-                    st.subheader("ABA File Preview")
-                    st.code(aba_content, language="text")
+                    if commit['error']:
+                        st.error(f"❌ Batch not saved and no ABA file produced - {commit['error']}. Please generate it again.")
+                    elif not commit['committed']:
+                        st.error("❌ Batch not saved and no ABA file produced - these statements were recorded by another batch, or reserved by another session, after they were uploaded:")
+                        for asic_data in commit['conflicts']:
+                            st.write(f"• {asic_data['filename']} - {asic_data['company_name']} (${asic_data['amount']})")
+                        st.info("Re-upload the statements to refresh their duplicate status.")
+                    elif len(shards) == 1:
+                        aba_content = written[0]['content'].decode("ascii")
+                        st.download_button(
+                            label="📥 Download Batch ABA File",
+                            data=aba_content,
+                            file_name=filename,
+                            mime="text/plain"
+                        )
+                    else:
+                        # One download holding every ABA file and the manifest tying them to the batch
+                        archive_buffer = io.BytesIO()
+                        with zipfile.ZipFile(archive_buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                            for shard_filename, stats in zip(filenames, written):
+                                archive.writestr(shard_filename, stats['content'])
+                            archive.writestr(batch_filename, batch_manifest_json(batch_id))
+                        st.download_button(
+                            label=f"📥 Download {len(shards)} ABA Files (ZIP)",
+                            data=archive_buffer.getvalue(),
+                            file_name=f"{os.path.splitext(filename)[0]}.zip",
+                            mime="application/zip"
+                        )
+                        st.warning(
+                            f"⚠️ Batch split into {len(shards)} ABA files to stay within the per-file limits - "
+                            "upload each file to the bank separately."
+                        )
+                        st.dataframe(pd.DataFrame([
+                            {
+                                "ABA file": shard_filename,
+                                "Payments": stats['credit_count'],
+                                "Total": f"${cents_to_amount(stats['total_cents'])}",
+                                "SHA-256": stats['sha256'][:16]
+                            }
+                            for shard_filename, stats in zip(filenames, written)
+                        ]), hide_index=True, use_container_width=True)
+                        aba_content = written[0]['content'].decode("ascii")
                     
-                    # Show batch details
-                    st.subheader("Batch Payment Summary")
-                    batch_df = []
-                    for i, asic_data in enumerate(valid_statements):
-                        batch_df.append({
-                            "Company": asic_data['company_name'],
-                            "ACN": asic_data['acn'],
-                            "Amount": f"${asic_data['amount']}",
-                            "BPay Ref": asic_data['bpay_reference'],
-                            "Status": "✅ Processed"
-                        })
-                    st.dataframe(batch_df, use_container_width=True)
+                    if commit['committed']:
+                        # Show batch summary
+                        generated = "ABA file" if len(shards) == 1 else f"{len(shards)} ABA files"
+                        st.success(f"✅ {generated} generated for {len(valid_statements)} companies with total amount ${total_amount:.2f}")
+                        st.info(f"💾 {commit['saved_count']} statements saved to database to prevent future duplicates")
+                        st.caption(
+                            f"⏱️ ABA file generated and validated in {generate_metrics.timings['aba_generation'] * 1000:.1f} ms, "
+                            f"batch saved in {generate_metrics.timings['commit'] * 1000:.1f} ms "
+                            f"({generate_metrics.counters['db_round_trips']} SQL statements)"
+                        )
+                        
+                        # Show preview
+                        render_aba_preview(aba_content, "ABA File Preview" if len(shards) == 1 else f"ABA File Preview ({filenames[0]})")
+                        
+                        # Show batch details
+                        st.subheader("Batch Payment Summary")
+                        batch_frame = statements_frame(valid_statements)[["Company", "ACN", "Amount", "BPay Reference"]]
+                        st.dataframe(
+                            batch_frame.assign(Status="✅ Processed"),
+                            hide_index=True,
+                            use_container_width=True,
+                            column_config={"Amount": st.column_config.NumberColumn(format="$%.2f")}
+                        )
                 else:
                     st.error("Please fill in all your bank details including APCA number")
             
-            elif not valid_statements:
-                st.warning("No new statements to process. All uploaded statements are duplicates.")
+            elif not valid_statements and not unfinished:
+                left_out = [
+                    f"{count} {reason}" for count, reason in (
+                        (len(duplicates_found), "duplicate"),
+                        (len(incomplete), "incomplete"),
+                        (len(reserved_elsewhere), "staged in another session"),
+                    ) if count
+                ]
+                st.warning(f"No new statements to process: {', '.join(left_out)}.")
+        
+        # Poll the background extraction - finished files render on the next run
+        if extraction_running:
+            time.sleep(EXTRACTION_POLL_SECONDS)
+            st.rerun()
+    else:
+        release_staged_statements()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1 @@
+"""Core library behind the ASIC ABA File Generator"""
@@ -0,0 +1,290 @@
+"""ABA (CEMTEX) files for batches of ASIC payments
+
+write_aba_file streams one file's records as they are built. A batch over
+the per-file record, total or size limits is split by plan_aba_shards and
+written as several balanced files by write_aba_shards, in worker processes
+when there are several. Every file is checked with asic_batch.aba_validator
+before it is handed back.
+"""
+
+import io
+import json
+import os
+
+from asic_batch.aba_validator import check_aba
+from asic_batch.money import amount_to_cents, cents_to_amount
+from asic_batch.spool import get_file_hash, hash_path
+from asic_batch.storage import get_batch_manifest
+from asic_batch.workers import get_worker_count, process_pool
+
+# Bank details pre-filled for TT Accountancy Pty Ltd (UI and command line)
+DEFAULT_BSB = "063245"
+DEFAULT_ACCOUNT = "10758330"
+DEFAULT_APCA_NUMBER = "301500"
+DEFAULT_ACCOUNT_NAME = "TT Accountancy Pty Ltd"
+
+# Fixed-width ABA field limits (10-digit amounts, 6-digit record count)
+ABA_MAX_AMOUNT_CENTS = 9999999999
+ABA_MAX_RECORD_COUNT = 999999
+
+# Bytes per ABA record - 120 characters plus CRLF
+ABA_RECORD_BYTES = 122
+
+def max_total_cents_from_env(name="ASIC_ABA_MAX_TOTAL", default="99999999.99"):
+    """Per-file total limit in cents from an environment variable, capped at what the ABA total field holds"""
+    configured = os.getenv(name, default)
+    try:
+        cents = amount_to_cents(configured)
+    except ValueError:
+        raise ValueError(f"{name} must be a dollar amount such as 50000.00, got {configured!r}")
+    if cents <= 0:
+        raise ValueError(f"{name} must be above zero, got {configured!r}")
+    return min(cents, ABA_MAX_AMOUNT_CENTS)
+
+# Limits per ABA file - larger batches are split into several balanced files.
+# The record count includes the balancing debit; 0 turns the byte limit off.
+ABA_FILE_MAX_RECORDS = min(int(os.getenv("ASIC_ABA_MAX_RECORDS", str(ABA_MAX_RECORD_COUNT))), ABA_MAX_RECORD_COUNT)
+ABA_FILE_MAX_TOTAL_CENTS = max_total_cents_from_env()
+ABA_FILE_MAX_BYTES = int(os.getenv("ASIC_ABA_MAX_FILE_KB", "0")) * 1024
+
+def format_aba_amount(amount_str):
+    """Convert amount string to ABA format (cents, 10 digits, zero-padded)"""
+    try:
+        cents = amount_to_cents(amount_str)
+        return f"{cents:010d}"
+    except ValueError:
+        return "0000000000"
+
+def write_aba_file(payments, output, user_bsb, user_account, user_name, processing_date, apca_number="301500"):
+    """Stream an ABA file for ASIC payments to a binary file-like object, following CEMTEX standard
+    
+    payments can be any iterable of asic_data dicts - it is consumed once and
+    each 120-character record is written as soon as it is built, so memory use
+    does not grow with the batch. Amounts are totalled in integer cents.
+    
+    Returns a dict with 'credit_count', 'record_count' and 'total_cents'.
+    """
+    # RBA bank details (destination)
+    rba_bsb = "093-003"
+    rba_account = "317118"
+    
+    # Format processing date as DDMMYY
+    date_str = processing_date.strftime("%d%m%y")
+    
+    # Clean BSB format
+    user_bsb_clean = user_bsb.replace("-", "").replace(" ", "")
+    
+    # Ensure BSB has hyphen for trace record
+    if "-" not in user_bsb:
+        user_bsb_with_hyphen = f"{user_bsb_clean[:3]}-{user_bsb_clean[3:6]}"
+    else:
+        user_bsb_with_hyphen = user_bsb
+    
+    def write_record(record):
+        output.write(record.encode("ascii", "replace") + b"\r\n")
+    
+    # Descriptive Record (Type 0) - exactly 120 chars per CEMTEX standard
+    write_record(
+        "0"                                      # Pos 1: Record type (1)
+        + " " * 17                               # Pos 2-18: Blank (17)
+        + "01"                                   # Pos 19-20: Reel sequence (2)
+        + "CBA"                                  # Pos 21-23: Financial institution (3)
+        + " " * 7                                # Pos 24-30: Blank (7)
+        + f"{user_name[:26]:<26}"               # Pos 31-56: User name (26)
+        + apca_number                            # Pos 57-62: User ID/APCA number (6)
+        + f"{'ASIC':<12}"                       # Pos 63-74: Entry description (12)
+        + date_str                               # Pos 75-80: Processing date DDMMYY (6)
+        + " " * 40                               # Pos 81-120: Blank (40)
+    )
+    
+    # Credit detail record for each ASIC payment, totalled in cents as we go
+    credit_count = 0
+    total_cents = 0
+    for asic_data in payments:
+        cents = amount_to_cents(asic_data['amount'])
+        if not 0 <= cents <= ABA_MAX_AMOUNT_CENTS:
+            raise ValueError(f"Amount {asic_data['amount']} does not fit the 10-digit ABA amount field")
+        
+        write_record(
+            "1"                                                      # Pos 1: Record type (1)
+            + rba_bsb                                                # Pos 2-8: BSB with hyphen (7)
+            + f"{rba_account:>9}"                                   # Pos 9-17: Account number (9)
+            + "N"                                                    # Pos 18: Indicator (1)
+            + "53"                                                   # Pos 19-20: Transaction code 53 for pay (2)
+            + f"{cents:010d}"                                        # Pos 21-30: Amount in cents (10)
+            + f"{'ASIC':<32}"                                       # Pos 31-62: Account title - always ASIC (32)
+            + f"{asic_data['bpay_reference'][:18]:<18}"            # Pos 63-80: Lodgement reference - BPay ref (18)
+            + user_bsb_with_hyphen                                   # Pos 81-87: Trace BSB (7)
+            + f"{user_account[:9]:>9}"                              # Pos 88-96: Trace account (9)
+            + f"{user_name[:16]:<16}"                               # Pos 97-112: Remitter name (16)
+            + "00000000"                                             # Pos 113-120: Withholding tax (8)
+        )
+        credit_count += 1
+        total_cents += cents
+    
+    # Record count (credit records + 1 debit record)
+    record_count = credit_count + 1
+    if total_cents > ABA_MAX_AMOUNT_CENTS or record_count > ABA_MAX_RECORD_COUNT:
+        raise ValueError(
+            f"Batch of {credit_count} payments totalling {cents_to_amount(total_cents)} "
+            "does not fit the fixed-width ABA trailer fields"
+        )
+    total_amount_aba = f"{total_cents:010d}"
+    
+    # Single balancing debit record for the total amount
+    write_record(
+        "1"                                                      # Pos 1: Record type (1)
+        + user_bsb_with_hyphen                                   # Pos 2-8: User's BSB with hyphen (7)
+        + f"{user_account[:9]:>9}"                              # Pos 9-17: User's account number (9)
+        + " "                                                    # Pos 18: Space (1)
+        + "13"                                                   # Pos 19-20: Transaction code 13 for debit (2)
+        + total_amount_aba                                       # Pos 21-30: Total amount in cents (10)
+        + f"{'Business':<32}"                                   # Pos 31-62: Description (32)
+        + f"{date_str[:2]}{processing_date.strftime('%B')[:4]}{date_str[4:6]}"[:18].ljust(18)  # Pos 63-80: Reference (18)
+        + user_bsb_with_hyphen                                   # Pos 81-87: Trace BSB (7)
+        + f"{user_account[:9]:>9}"                              # Pos 88-96: Trace account (9)
+        + f"{user_name[:16]:<16}"                               # Pos 97-112: Remitter name (16)
+        + "00000000"                                             # Pos 113-120: Withholding tax (8)
+    )
+    
+    # File Total Record (Type 7) - exactly 120 chars per CEMTEX standard
+    write_record(
+        "7"                           # Pos 1: Record type (1)
+        + "999-999"                   # Pos 2-8: BSB filler (7)
+        + " " * 12                    # Pos 9-20: Blank (12)
+        + "0" * 10                    # Pos 21-30: Net total (10)
+        + total_amount_aba            # Pos 31-40: Credit total (10)
+        + total_amount_aba            # Pos 41-50: Debit total (10)
+        + " " * 24                    # Pos 51-74: Blank (24)
+        + f"{record_count:06d}"       # Pos 75-80: Record count (6)
+        + " " * 40                    # Pos 81-120: Blank (40)
+    )
+    
+    return {
+        'credit_count': credit_count,
+        'record_count': record_count,
+        'total_cents': total_cents
+    }
+
+def generate_aba_file(asic_data_list, user_bsb, user_account, user_name, processing_date, apca_number="301500"):
+    """Generate ABA file content for multiple ASIC payments following CEMTEX standard
+    
+    The file is validated before it is returned; raises ABAValidationError if
+    the bank details give records the bank would reject.
+    """
+    
+    # Handle single item case (backward compatibility)
+    if not isinstance(asic_data_list, list):
+        asic_data_list = [asic_data_list]
+    
+    output = io.BytesIO()
+    write_aba_file(asic_data_list, output, user_bsb, user_account, user_name, processing_date, apca_number)
+    output.seek(0)
+    check_aba(output)
+    
+    return output.getvalue().decode("ascii")
+
+def plan_aba_shards(payments, max_records=None, max_total_cents=None, max_bytes=None):
+    """Split payments into consecutive groups that each fit in one ABA file
+    
+    A group closes once another payment would take its record count (credits
+    plus the balancing debit), total or file size past the limits, which
+    default to ABA_FILE_MAX_RECORDS, ABA_FILE_MAX_TOTAL_CENTS and
+    ABA_FILE_MAX_BYTES. Payment order is kept. Raises ValueError for a payment
+    that could not fit in any file on its own.
+    """
+    max_records = ABA_FILE_MAX_RECORDS if max_records is None else max_records
+    max_total_cents = ABA_FILE_MAX_TOTAL_CENTS if max_total_cents is None else max_total_cents
+    max_bytes = ABA_FILE_MAX_BYTES if max_bytes is None else max_bytes
+    
+    # Header, debit and trailer records in every file
+    max_credits = max_records - 1
+    if max_bytes:
+        max_credits = min(max_credits, max_bytes // ABA_RECORD_BYTES - 3)
+    if max_credits < 1:
+        raise ValueError("ABA file limits leave no room for a payment")
+    
+    shards = []
+    shard = []
+    shard_cents = 0
+    for asic_data in payments:
+        cents = amount_to_cents(asic_data['amount'])
+        if cents > max_total_cents:
+            raise ValueError(f"Amount {asic_data['amount']} is over the {cents_to_amount(max_total_cents)} limit for one ABA file")
+        if shard and (len(shard) == max_credits or shard_cents + cents > max_total_cents):
+            shards.append(shard)
+            shard = []
+            shard_cents = 0
+        shard.append(asic_data)
+        shard_cents += cents
+    if shard:
+        shards.append(shard)
+    
+    return shards
+
+def aba_shard_filename(filename, shard_number, shard_count):
+    """ABA_Batch.ABA -> ABA_Batch_part02of03.ABA (unchanged for a single file)"""
+    if shard_count == 1:
+        return filename
+    stem, extension = os.path.splitext(filename)
+    width = max(2, len(str(shard_count)))
+    return f"{stem}_part{shard_number:0{width}d}of{shard_count:0{width}d}{extension}"
+
+def batch_manifest_json(batch_id):
+    """A committed batch's manifest (see get_batch_manifest) as JSON, with dollar totals alongside the cents"""
+    manifest = get_batch_manifest(batch_id)
+    manifest['total_amount'] = cents_to_amount(manifest['total_cents'])
+    for shard in manifest['shards']:
+        shard['total_amount'] = cents_to_amount(shard['total_cents'])
+    return json.dumps(manifest, indent=2)
+
+def _write_aba_shard(task):
+    """Write one shard's ABA file - runs in a worker process
+    
+    task is (payments, path, bank details...). The file is written to path, or
+    returned as 'content' bytes when path is None, and validated once written.
+    Returns write_aba_file's counts plus the file's 'sha256'; raises
+    ABAValidationError for a file that fails validation.
+    """
+    payments, path, user_bsb, user_account, user_name, processing_date, apca_number = task
+    output = io.BytesIO() if path is None else open(path, "wb")
+    with output:
+        stats = write_aba_file(payments, output, user_bsb, user_account, user_name, processing_date, apca_number)
+        if path is None:
+            stats['content'] = output.getvalue()
+            stats['sha256'] = get_file_hash(stats['content'])
+            output.seek(0)
+            check_aba(output)
+    if path is not None:
+        stats['sha256'] = hash_path(path)[0]
+        with open(path, "rb") as f:
+            check_aba(f)
+    return stats
+
+def write_aba_shards(shards, user_bsb, user_account, user_name, processing_date, apca_number="301500", paths=None, max_workers=None):
+    """Write one balanced ABA file per shard, in parallel when there are several
+    
+    Each file gets its own descriptive record, balancing debit and trailer.
+    paths gives a file path per shard; without it each result carries the
+    file's 'content' bytes. Returns a list of _write_aba_shard results in
+    shard order; raises ABAValidationError if any file fails validation.
+    """
+    if paths is None:
+        paths = [None] * len(shards)
+    tasks = [
+        # Only the fields the ABA records use are sent to the workers
+        (
+            [{'amount': asic_data['amount'], 'bpay_reference': asic_data['bpay_reference']} for asic_data in shard],
+            path, user_bsb, user_account, user_name, processing_date, apca_number
+        )
+        for shard, path in zip(shards, paths)
+    ]
+    
+    if max_workers is None:
+        max_workers = get_worker_count()
+    max_workers = min(max_workers, len(tasks))
+    if max_workers <= 1:
+        return [_write_aba_shard(task) for task in tasks]
+    
+    with process_pool(max_workers) as executor:
+        return list(executor.map(_write_aba_shard, tasks))
@@ -0,0 +1,375 @@
+"""Streaming parser and validator for ABA (CEMTEX) direct entry files
+
+Reads a file one 120-character record at a time, so memory use does not grow
+with the file, and checks it the way the bank will: record order, the layout
+of every field, BSB format, transaction codes, and the type 7 trailer's
+totals and record count against the detail records. Each problem is reported
+with its line and column (both from 1).
+
+Every record is first matched against one regular expression built from its
+field layout; only records that fail it are checked field by field to find
+the column, so large valid files are validated quickly.
+"""
+
+import re
+from datetime import datetime
+
+RECORD_LENGTH = 120
+
+# Transaction codes for detail records: 13 debits, 50-57 credits
+DEBIT_TRANSACTION_CODES = frozenset({b"13"})
+CREDIT_TRANSACTION_CODES = frozenset(b"%d" % code for code in range(50, 58))
+
+# Errors kept on a report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Field layouts: (first column, last column, kind, label, key). Columns are
+# 1-based and inclusive, as in the CEMTEX specification; key names the field
+# in parse_record's result (None for blank filler).
+DESCRIPTIVE_FIELDS = [
+    (2, 18, 'blank', "blank", None),
+    (19, 20, 'digits', "reel sequence number", 'reel_sequence'),
+    (21, 23, 'text', "financial institution", 'financial_institution'),
+    (24, 30, 'blank', "blank", None),
+    (31, 56, 'text', "user name", 'user_name'),
+    (57, 62, 'digits', "APCA user ID", 'apca_number'),
+    (63, 74, 'text', "entry description", 'description'),
+    (75, 80, 'date', "processing date", 'processing_date'),
+    (81, 120, 'blank', "blank", None),
+]
+DETAIL_FIELDS = [
+    (2, 8, 'bsb', "BSB", 'bsb'),
+    (9, 17, 'account', "account number", 'account_number'),
+    (18, 18, 'indicator', "indicator", 'indicator'),
+    (19, 20, 'transaction_code', "transaction code", 'transaction_code'),
+    (21, 30, 'digits', "amount", 'amount_cents'),
+    (31, 62, 'text', "account title", 'account_title'),
+    (63, 80, 'text', "lodgement reference", 'lodgement_reference'),
+    (81, 87, 'bsb', "trace BSB", 'trace_bsb'),
+    (88, 96, 'account', "trace account number", 'trace_account_number'),
+    (97, 112, 'text', "remitter name", 'remitter_name'),
+    (113, 120, 'digits', "withholding tax amount", 'withholding_cents'),
+]
+TOTAL_FIELDS = [
+    (2, 8, 'filler', "BSB filler", 'bsb_filler'),
+    (9, 20, 'blank', "blank", None),
+    (21, 30, 'digits', "net total", 'net_total_cents'),
+    (31, 40, 'digits', "credit total", 'credit_total_cents'),
+    (41, 50, 'digits', "debit total", 'debit_total_cents'),
+    (51, 74, 'blank', "blank", None),
+    (75, 80, 'digits', "record count", 'record_count'),
+    (81, 120, 'blank', "blank", None),
+]
+
+def _field_pattern(kind, width):
+    if kind == 'blank':
+        return b" {%d}" % width
+    if kind in ('digits', 'date'):
+        return rb"\d{%d}" % width
+    if kind == 'text':
+        return rb"(?! {%d})[ -~]{%d}" % (width, width)
+    if kind == 'bsb':
+        return rb"\d{3}-\d{3}"
+    if kind == 'account':
+        return rb"(?! {%d})[\d\- ]{%d}[\d\-]" % (width, width - 1)
+    if kind == 'indicator':
+        return rb"[ NWXY]"
+    if kind == 'transaction_code':
+        return rb"(?:13|5[0-7])"
+    if kind == 'filler':
+        return rb"999-999"
+    raise ValueError(f"Unknown ABA field kind {kind!r}")
+
+def _record_pattern(record_type, fields):
+    return re.compile(
+        re.escape(record_type) + b"".join(_field_pattern(kind, last - first + 1) for first, last, kind, _, _ in fields)
+    )
+
+RECORD_LAYOUTS = {
+    b"0": (DESCRIPTIVE_FIELDS, _record_pattern(b"0", DESCRIPTIVE_FIELDS)),
+    b"1": (DETAIL_FIELDS, _record_pattern(b"1", DETAIL_FIELDS)),
+    b"7": (TOTAL_FIELDS, _record_pattern(b"7", TOTAL_FIELDS)),
+}
+
+def _digits(value):
+    return int(value) if value.isdigit() else None
+
+def parse_record(record):
+    """Split one record (bytes or str, without its line ending) into a dict of its fields
+    
+    The dict has 'record_type' plus the key of every field in the record's
+    layout. Amounts, totals and the record count are ints (None if not
+    numeric); everything else is a string with the padding stripped. Raises
+    ValueError for an unknown record type.
+    """
+    if isinstance(record, str):
+        record = record.encode("ascii", "replace")
+    record_type = record[:1]
+    if record_type not in RECORD_LAYOUTS:
+        raise ValueError(f"Unknown ABA record type {record_type.decode('latin-1')!r}")
+    
+    fields = {'record_type': record_type.decode("ascii")}
+    for first, last, kind, _, key in RECORD_LAYOUTS[record_type][0]:
+        if key is None:
+            continue
+        value = record[first - 1:last]
+        if key.endswith("_cents") or key == 'record_count':
+            fields[key] = _digits(value)
+        elif kind in ('account', 'text'):
+            fields[key] = value.decode("ascii", "replace").strip()
+        else:
+            fields[key] = value.decode("ascii", "replace")
+    return fields
+
+def iter_aba_records(stream):
+    """Yield (line number, parse_record fields) for each record of an ABA file read from a binary stream
+    
+    Records are not checked - use validate_aba for that. Lines with an
+    unknown record type are yielded as {'record_type': <first character>}.
+    """
+    for line_number, line in enumerate(stream, 1):
+        record = line[:-2] if line.endswith(b"\r\n") else line.rstrip(b"\n")
+        try:
+            yield line_number, parse_record(record)
+        except ValueError:
+            yield line_number, {'record_type': record[:1].decode("latin-1")}
+
+class ABAIssue:
+    """One problem in an ABA file, at a 1-based line and column"""
+    
+    __slots__ = ('line', 'column', 'message')
+    
+    def __init__(self, line, column, message):
+        self.line = line
+        self.column = column
+        self.message = message
+    
+    def __eq__(self, other):
+        return isinstance(other, ABAIssue) and (self.line, self.column, self.message) == (other.line, other.column, other.message)
+    
+    def __repr__(self):
+        return f"ABAIssue({self.line}, {self.column}, {self.message!r})"
+    
+    def __str__(self):
+        return f"line {self.line}, column {self.column}: {self.message}"
+
+class ABAReport:
+    """What validate_aba found: the errors plus the file's header and totals"""
+    
+    def __init__(self, max_errors=MAX_REPORTED_ERRORS):
+        self.max_errors = max_errors
+        self.errors = []
+        self.error_count = 0
+        self.line_count = 0
+        self.credit_count = 0
+        self.debit_count = 0
+        self.credit_total_cents = 0
+        self.debit_total_cents = 0
+        self.descriptive = None
+        self.totals = None
+    
+    def add_error(self, line, column, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(ABAIssue(line, column, message))
+    
+    @property
+    def valid(self):
+        return self.error_count == 0
+    
+    @property
+    def balanced(self):
+        """True when the debits offset the credits, as in a file with its own balancing debit"""
+        return self.credit_total_cents == self.debit_total_cents
+    
+    def as_dict(self):
+        return {
+            'valid': self.valid,
+            'error_count': self.error_count,
+            'errors': [str(issue) for issue in self.errors],
+            'line_count': self.line_count,
+            'credit_count': self.credit_count,
+            'debit_count': self.debit_count,
+            'credit_total_cents': self.credit_total_cents,
+            'debit_total_cents': self.debit_total_cents,
+            'descriptive': self.descriptive,
+        }
+
+class ABAValidationError(ValueError):
+    """Raised by check_aba for a file that failed validation; report holds the details"""
+    
+    def __init__(self, report):
+        super().__init__(report)
+        self.report = report
+    
+    def __str__(self):
+        report = self.report
+        shown = "; ".join(str(issue) for issue in report.errors[:3])
+        more = f" (and {report.error_count - 3} more)" if report.error_count > 3 else ""
+        return f"ABA file failed validation with {report.error_count} error(s): {shown}{more}"
+
+def _check_field(report, line_number, record, first, last, kind, label):
+    value = record[first - 1:last]
+    width = last - first + 1
+    if kind == 'blank':
+        if value.strip(b" "):
+            offset = len(value) - len(value.lstrip(b" "))
+            report.add_error(line_number, first + offset, f"expected blanks in columns {first}-{last}")
+    elif kind in ('digits', 'date'):
+        if not value.isdigit():
+            offset = next((i for i, byte in enumerate(value) if not 0x30 <= byte <= 0x39), 0)
+            report.add_error(line_number, first + offset, f"{label} must be {width} digits, got {value.decode('latin-1')!r}")
+    elif kind == 'text':
+        offset = next((i for i, byte in enumerate(value) if not 0x20 <= byte <= 0x7e), None)
+        if offset is not None:
+            report.add_error(line_number, first + offset, f"{label} contains a character that is not printable ASCII")
+        elif not value.strip(b" "):
+            report.add_error(line_number, first, f"{label} is blank")
+    elif kind == 'bsb':
+        if not re.fullmatch(rb"\d{3}-\d{3}", value):
+            report.add_error(line_number, first, f"{label} must be in the format 000-000, got {value.decode('latin-1')!r}")
+    elif kind == 'account':
+        offset = next((i for i, byte in enumerate(value) if byte not in b"0123456789- "), None)
+        if offset is not None:
+            report.add_error(line_number, first + offset, f"{label} may only contain digits, hyphens and blanks")
+        elif not value.strip(b" "):
+            report.add_error(line_number, first, f"{label} is blank")
+        elif value.endswith(b" "):
+            report.add_error(line_number, first, f"{label} must be right-justified, got {value.decode('ascii')!r}")
+    elif kind == 'indicator':
+        if value not in (b" ", b"N", b"W", b"X", b"Y"):
+            report.add_error(line_number, first, f"{label} must be blank, N, W, X or Y, got {value.decode('latin-1')!r}")
+    elif kind == 'transaction_code':
+        if value not in DEBIT_TRANSACTION_CODES and value not in CREDIT_TRANSACTION_CODES:
+            report.add_error(line_number, first, f"unknown {label} {value.decode('latin-1')!r} (expected 13 or 50-57)")
+    elif kind == 'filler':
+        if value != b"999-999":
+            report.add_error(line_number, first, f"{label} must be 999-999, got {value.decode('latin-1')!r}")
+
+def _check_record(report, line_number, record, fields):
+    for first, last, kind, label, _ in fields:
+        _check_field(report, line_number, record, first, last, kind, label)
+
+def _read_descriptive(report, line_number, record):
+    report.descriptive = parse_record(record)
+    try:
+        date = datetime.strptime(record[74:80].decode("ascii"), "%d%m%y")
+    except ValueError:
+        # A non-numeric date has already been reported by the layout check
+        if record[74:80].isdigit():
+            report.add_error(line_number, 75, f"processing date {record[74:80].decode('ascii')!r} is not a valid DDMMYY date")
+        report.descriptive['processing_date'] = None
+    else:
+        report.descriptive['processing_date'] = date.strftime("%Y-%m-%d")
+
+def _check_totals(report, line_number, record):
+    net_total = _digits(record[20:30])
+    credit_total = _digits(record[30:40])
+    debit_total = _digits(record[40:50])
+    record_count = _digits(record[74:80])
+    report.totals = {
+        'net_total_cents': net_total,
+        'credit_total_cents': credit_total,
+        'debit_total_cents': debit_total,
+        'record_count': record_count,
+    }
+    
+    if credit_total is not None and credit_total != report.credit_total_cents:
+        report.add_error(line_number, 31, f"credit total {credit_total} does not match the detail records' {report.credit_total_cents}")
+    if debit_total is not None and debit_total != report.debit_total_cents:
+        report.add_error(line_number, 41, f"debit total {debit_total} does not match the detail records' {report.debit_total_cents}")
+    if net_total is not None and credit_total is not None and debit_total is not None and net_total != abs(credit_total - debit_total):
+        report.add_error(line_number, 21, f"net total {net_total} is not the difference between the credit and debit totals")
+    detail_count = report.credit_count + report.debit_count
+    if record_count is not None and record_count != detail_count:
+        report.add_error(line_number, 75, f"record count {record_count} does not match the {detail_count} detail records")
+
+def validate_aba(stream, require_balanced=False, max_errors=MAX_REPORTED_ERRORS):
+    """Parse and check an ABA file from a binary stream - returns an ABAReport
+    
+    Records may end in CRLF or LF. Only the errors found are returned, never
+    raised; use check_aba to reject a bad file. With require_balanced the
+    debits must also equal the credits, as in the files write_aba_file writes.
+    """
+    report = ABAReport(max_errors)
+    layouts = RECORD_LAYOUTS
+    detail_fields, detail_pattern = layouts[b"1"]
+    state = None  # None before the descriptive record, b"1" after it, b"7" after the trailer
+    line_number = 0
+    
+    for line_number, line in enumerate(stream, 1):
+        record = line[:-2] if line.endswith(b"\r\n") else line.rstrip(b"\n")
+        record_type = record[:1]
+        
+        if len(record) != RECORD_LENGTH:
+            column = RECORD_LENGTH + 1 if len(record) > RECORD_LENGTH else len(record) + 1
+            report.add_error(line_number, column, f"record is {len(record)} characters long, expected {RECORD_LENGTH}")
+        
+        # Detail records are by far the most common, so they are handled first
+        if record_type == b"1":
+            if state != b"1":
+                report.add_error(
+                    line_number, 1,
+                    "detail record before the descriptive record" if state is None else "detail record after the file total record"
+                )
+            if detail_pattern.fullmatch(record) is None and len(record) == RECORD_LENGTH:
+                _check_record(report, line_number, record, detail_fields)
+            cents = _digits(record[20:30])
+            if cents is None:
+                continue
+            transaction_code = record[18:20]
+            if transaction_code in DEBIT_TRANSACTION_CODES:
+                report.debit_count += 1
+                report.debit_total_cents += cents
+            elif transaction_code in CREDIT_TRANSACTION_CODES:
+                report.credit_count += 1
+                report.credit_total_cents += cents
+            continue
+        
+        if record_type not in layouts:
+            report.add_error(line_number, 1, f"unknown record type {record_type.decode('latin-1')!r} (expected 0, 1 or 7)")
+            continue
+        
+        fields, pattern = layouts[record_type]
+        if pattern.fullmatch(record) is None and len(record) == RECORD_LENGTH:
+            _check_record(report, line_number, record, fields)
+        
+        if record_type == b"0":
+            if state is not None:
+                report.add_error(line_number, 1, "descriptive record must be the first record and appear only once")
+            else:
+                _read_descriptive(report, line_number, record)
+                state = b"1"
+        else:
+            if state is None:
+                report.add_error(line_number, 1, "file total record before the descriptive record")
+            elif state == b"7":
+                report.add_error(line_number, 1, "file total record appears more than once")
+            else:
+                _check_totals(report, line_number, record)
+            state = b"7"
+    
+    report.line_count = line_number
+    if line_number == 0:
+        report.add_error(1, 1, "file is empty")
+    elif state != b"7":
+        report.add_error(line_number + 1, 1, "file has no file total (type 7) record")
+    if require_balanced and report.valid and not report.balanced:
+        report.add_error(
+            line_number, 31,
+            f"credits ({report.credit_total_cents}) are not balanced by debits ({report.debit_total_cents})"
+        )
+    
+    return report
+
+def validate_aba_file(path, require_balanced=False, max_errors=MAX_REPORTED_ERRORS):
+    """validate_aba for a file on disk"""
+    with open(path, "rb") as f:
+        return validate_aba(f, require_balanced, max_errors)
+
+def check_aba(stream, require_balanced=True):
+    """Validate an ABA file about to be released - returns the ABAReport or raises ABAValidationError"""
+    report = validate_aba(stream, require_balanced)
+    if not report.valid:
+        raise ABAValidationError(report)
+    return report
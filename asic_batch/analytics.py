@@ -0,0 +1,133 @@
+"""Payment analytics over processed statements, and streaming exports
+
+Summaries by month, company, batch and fee amount come from the aggregate
+queries in storage, which GROUP BY over covering indexes, so statement rows
+never reach Python. Results are cached process-wide, shared by every session,
+and keyed by the newest statement id: committing a batch adds statements and
+so invalidates every cached summary, including commits made by another
+process such as the CLI.
+
+Exports read the statements in keyset-paged chunks and write each chunk as
+it arrives, to CSV or, when pyarrow is installed, to Parquet with one row
+group per chunk, so memory stays flat however long the history is.
+"""
+
+import csv
+import importlib.util
+import io
+import os
+import threading
+
+from asic_batch.memo import BoundedMemo
+from asic_batch.storage import (
+    HISTORY_COLUMNS,
+    get_payment_summary,
+    get_payment_totals,
+    get_statements_version,
+    iter_statement_rows,
+)
+
+# Summaries kept between commits, across all sessions
+ANALYTICS_CACHE_MAX_ENTRIES = 64
+
+# Statements read and written per chunk when exporting
+EXPORT_CHUNK_ROWS = int(os.getenv("ASIC_EXPORT_CHUNK_ROWS", "10000"))
+
+EXPORT_FORMATS = ('csv', 'parquet')
+
+_cache = BoundedMemo(ANALYTICS_CACHE_MAX_ENTRIES)
+_cache_lock = threading.Lock()
+_cache_version = None
+
+def _cached(key, compute):
+    """compute() once per statements version - the cache empties when a batch is committed"""
+    global _cache_version
+    version = get_statements_version()
+    with _cache_lock:
+        if version != _cache_version:
+            _cache.clear()
+            _cache_version = version
+        if key in _cache:
+            return _cache.get(key)
+    
+    value = compute()
+    with _cache_lock:
+        # A commit while computing means the result may already be stale
+        if version == _cache_version:
+            _cache.set(key, value)
+    return value
+
+def clear_analytics_cache():
+    """Drop every cached summary"""
+    global _cache_version
+    with _cache_lock:
+        _cache.clear()
+        _cache_version = None
+
+def payment_summary(group_by, date_from=None, date_to=None, limit=None):
+    """Cached get_payment_summary - the rows are shared between sessions, so don't modify them"""
+    return _cached(
+        ('summary', group_by, date_from, date_to, limit),
+        lambda: get_payment_summary(group_by, date_from, date_to, limit)
+    )
+
+def payment_totals(date_from=None, date_to=None):
+    """Cached get_payment_totals"""
+    return _cached(('totals', date_from, date_to), lambda: get_payment_totals(date_from, date_to))
+
+def parquet_available():
+    """Whether pyarrow is installed for Parquet exports"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+def write_statements_csv(output, date_from=None, date_to=None, chunk_size=None):
+    """Stream processed statements to a text file as CSV - returns the number of rows written"""
+    writer = csv.writer(output)
+    writer.writerow(HISTORY_COLUMNS)
+    row_count = 0
+    for rows in iter_statement_rows(date_from, date_to, chunk_size or EXPORT_CHUNK_ROWS):
+        writer.writerows(rows)
+        row_count += len(rows)
+    return row_count
+
+def write_statements_parquet(output, date_from=None, date_to=None, chunk_size=None):
+    """Stream processed statements to a Parquet file (path or binary file) - returns the number of rows written
+    
+    Amounts are written as decimal(12, 2) and processed dates as timestamps.
+    Raises RuntimeError when pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow - install it with: pip install pyarrow") from None
+    
+    types = {'id': pa.int64(), 'amount': pa.decimal128(12, 2), 'processed_date': pa.timestamp('s')}
+    schema = pa.schema([(column, types.get(column, pa.string())) for column in HISTORY_COLUMNS])
+    row_count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        for rows in iter_statement_rows(date_from, date_to, chunk_size or EXPORT_CHUNK_ROWS):
+            # Amounts and dates arrive as text and are cast column by column
+            arrays = [
+                pa.array(values, type=pa.int64() if field.name == 'id' else pa.string()).cast(field.type)
+                for field, values in zip(schema, zip(*rows))
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            row_count += len(rows)
+    return row_count
+
+def export_statements(output, export_format, date_from=None, date_to=None, chunk_size=None):
+    """Write processed statements to a binary file or path as 'csv' or 'parquet' - returns the number of rows written"""
+    if export_format == 'parquet':
+        return write_statements_parquet(output, date_from, date_to, chunk_size)
+    if export_format != 'csv':
+        raise ValueError(f"Unknown export format: {export_format!r}")
+    
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            return write_statements_csv(f, date_from, date_to, chunk_size)
+    text = io.TextIOWrapper(output, newline="", encoding="utf-8", write_through=True)
+    try:
+        return write_statements_csv(text, date_from, date_to, chunk_size)
+    finally:
+        # Leave the caller's file open
+        text.detach()
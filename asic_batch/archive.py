@@ -0,0 +1,75 @@
+"""Reading ASIC statement PDFs straight out of ZIP archives
+
+Members are decompressed in chunks into an UploadSpool and hashed as they
+stream, so each PDF is read exactly once and only spills to a temp file when
+the batch's memory budget is used up. Directory entries, non-PDF
+members, macOS metadata, encrypted members and anything implausibly large are
+skipped; PDFs inside folders within the archive are included.
+"""
+
+import os
+import posixpath
+import zipfile
+
+# Uncompressed size above which a member is skipped rather than read into memory
+ZIP_MAX_MEMBER_BYTES = int(os.getenv("ASIC_ZIP_MAX_MEMBER_MB", "50")) * 1024 * 1024
+
+def is_zip_name(name):
+    return name.lower().endswith(".zip")
+
+def list_pdf_members(archive):
+    """Split a ZipFile's entries into PDF members to extract and (name, reason) skips
+    
+    Only the central directory is read. Directory entries carry no data and are
+    dropped silently; everything else that is not extracted is reported.
+    """
+    members = []
+    skipped = []
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        
+        name = info.filename
+        basename = posixpath.basename(name)
+        if name.startswith("__MACOSX/") or basename.startswith("."):
+            skipped.append((name, "hidden or metadata file"))
+        elif not basename.lower().endswith(".pdf"):
+            skipped.append((name, "not a PDF"))
+        elif info.flag_bits & 0x1:
+            skipped.append((name, "encrypted"))
+        elif info.file_size > ZIP_MAX_MEMBER_BYTES:
+            skipped.append((name, f"larger than {ZIP_MAX_MEMBER_BYTES // (1024 * 1024)} MB"))
+        else:
+            members.append(info)
+    
+    return members, skipped
+
+def read_member(archive, info, spool):
+    """Decompress one member into spool, hashing as it streams - returns (SpooledFile, sha256 hex)
+    
+    Raises zipfile.BadZipFile for a corrupt member, and ValueError if it inflates
+    past ZIP_MAX_MEMBER_BYTES whatever its header claims.
+    """
+    with archive.open(info) as member:
+        return spool.add_stream(member, max_size=ZIP_MAX_MEMBER_BYTES)
+
+def iter_zip_pdfs(zip_file, spool, skipped=None):
+    """Yield (member_name, SpooledFile, file_hash) for each PDF in a ZIP archive, in archive order
+    
+    zip_file is a path or a seekable binary file object. Members that are not
+    extracted - including ones that turn out to be corrupt - are appended to
+    skipped as (member_name, reason) when a list is given.
+    """
+    with zipfile.ZipFile(zip_file) as archive:
+        members, member_skips = list_pdf_members(archive)
+        if skipped is not None:
+            skipped.extend(member_skips)
+        
+        for info in members:
+            try:
+                content, file_hash = read_member(archive, info, spool)
+            except (zipfile.BadZipFile, ValueError, NotImplementedError, EOFError) as e:
+                if skipped is not None:
+                    skipped.append((info.filename, f"unreadable ({e})"))
+                continue
+            yield info.filename, content, file_hash
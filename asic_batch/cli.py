@@ -0,0 +1,572 @@
+"""Headless command line for batch ABA generation
+
+Runs the same pipeline as the Streamlit app without a browser, e.g. nightly
+from cron over an inbox directory:
+
+    python -m asic_batch process /srv/asic/inbox --output-dir /srv/asic/aba
+
+ZIP archives are read in place: every PDF inside them, including in folders,
+is treated as a statement of its own. A batch over the per-file record, total
+or size limits is written as several balanced ABA files plus a manifest
+listing the statements paid in each. Every ABA file is validated before it
+is published, and existing files can be checked on their own:
+
+    python -m asic_batch validate ASIC_Batch_12companies_20250728.ABA
+
+Exit status is 0 when every statement was processed, 1 when any file failed
+extraction, was incomplete, was a duplicate, was over the per-file total on
+its own or was reserved by another session (the ABA file still covers the
+new statements unless --strict is given), an ABA file could not be written
+or failed validation, or the batch could not be recorded, and 2 for usage
+errors.
+Non-PDF files inside ZIP archives are listed as skipped without affecting
+the status. validate exits 1 when any file has errors.
+
+    python -m asic_batch reconcile bank_export.csv
+
+matches a bank CSV export's debits against the processed statements and
+exits 1 when statements in its date range have no matching debit.
+
+    python -m asic_batch export statements.parquet --from 2025-01-01
+
+streams the processed statements to a CSV or Parquet file.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import socket
+import sys
+import time
+import zipfile
+from datetime import datetime
+
+from asic_batch.aba import (
+    DEFAULT_ACCOUNT,
+    DEFAULT_ACCOUNT_NAME,
+    DEFAULT_APCA_NUMBER,
+    DEFAULT_BSB,
+    ABA_FILE_MAX_TOTAL_CENTS,
+    ABA_MAX_AMOUNT_CENTS,
+    aba_shard_filename,
+    batch_manifest_json,
+    plan_aba_shards,
+    write_aba_shards,
+)
+from asic_batch.aba_validator import MAX_REPORTED_ERRORS, ABAValidationError, validate_aba_file
+from asic_batch.analytics import EXPORT_FORMATS, export_statements
+from asic_batch.archive import is_zip_name, iter_zip_pdfs
+from asic_batch.dedup import DUPLICATE_INDEX, DUPLICATE_INDEX_MODES, check_duplicate_statements
+from asic_batch.extraction import extract_batch, missing_fields
+from asic_batch.instrumentation import (
+    Metrics,
+    batch_totals,
+    configure_logging,
+    log_batch_metrics,
+    profiled,
+)
+from asic_batch.money import amount_to_cents, cents_to_amount
+from asic_batch.reconcile import RECONCILE_WINDOW_DAYS, reconcile_bank_csv
+from asic_batch.spool import SpooledFile, UploadSpool, hash_path
+from asic_batch.storage import (
+    EXTRACTED_FIELDS,
+    commit_batch,
+    init_database,
+    new_batch_id,
+    release_reservations,
+    reserve_statements,
+    set_database_path,
+)
+
+EXIT_OK = 0
+EXIT_ATTENTION = 1
+EXIT_USAGE = 2
+
+# Columns written to the CSV summary, one row per input file
+SUMMARY_COLUMNS = [
+    'filename', 'status', 'company_name', 'acn', 'amount',
+    'asic_reference', 'bpay_reference', 'file_hash', 'backend', 'detail'
+]
+
+def find_statement_files(inputs, recursive=False):
+    """Expand directories, glob patterns and file paths into a sorted list of PDF and ZIP paths"""
+    paths = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            pattern = os.path.join(entry, "**", "*") if recursive else os.path.join(entry, "*")
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(entry, recursive=recursive) or [entry]
+        
+        paths.extend(
+            path for path in candidates
+            if os.path.isfile(path) and (path.lower().endswith(".pdf") or is_zip_name(path))
+        )
+    
+    return sorted(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+def read_statement_files(paths, spool):
+    """Hash PDFs in place and stream PDF members out of ZIP archives into spool
+    
+    PDFs on disk are hashed in chunks and passed on by path, so no statement is
+    held in memory beyond spool's budget.
+    
+    Returns (uploads, upload_paths, read_seconds, skipped) - hashed uploads ready
+    for extract_batch, the file each came from,
+    how long each took to read, and (path, name, status, reason) for ZIP contents
+    that were not extracted: "failed" for corrupt archives and members, "skipped"
+    for non-PDF or metadata files, which do not need attention.
+    """
+    uploads = []
+    upload_paths = []
+    read_seconds = []
+    skipped = []
+    
+    for path in paths:
+        started = time.perf_counter()
+        if not is_zip_name(path):
+            file_hash, _ = hash_path(path)
+            uploads.append((os.path.basename(path), SpooledFile.from_path(path), file_hash))
+            upload_paths.append(path)
+            read_seconds.append(time.perf_counter() - started)
+            continue
+        
+        archive_name = os.path.basename(path)
+        member_skips = []
+        try:
+            for member_name, file_content, file_hash in iter_zip_pdfs(path, spool, member_skips):
+                uploads.append((f"{archive_name}/{member_name}", file_content, file_hash))
+                upload_paths.append(path)
+                read_seconds.append(time.perf_counter() - started)
+                started = time.perf_counter()
+        except zipfile.BadZipFile as e:
+            member_skips.append(("", f"unreadable ZIP archive ({e})"))
+        
+        skipped.extend(
+            (
+                path,
+                f"{archive_name}/{member_name}" if member_name else archive_name,
+                "failed" if reason.startswith("unreadable") else "skipped",
+                reason
+            )
+            for member_name, reason in member_skips
+        )
+    
+    return uploads, upload_paths, read_seconds, skipped
+
+def write_summary(summary, path):
+    """Write the run summary as JSON, or as CSV (one row per file) for a .csv path"""
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(summary['statements'])
+    else:
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+def process_inbox(args):
+    """Extract, de-duplicate, generate and record one batch - returns the exit status"""
+    # The run's statements are reserved under its own session id until it ends
+    session_id = f"cli-{socket.gethostname()}-{os.getpid()}"
+    with profiled(args.profile):
+        try:
+            return _process_inbox(args, session_id)
+        finally:
+            if not args.dry_run:
+                release_reservations(session_id)
+
+def _process_inbox(args, session_id):
+    if args.db:
+        set_database_path(args.db)
+    init_database()
+    
+    paths = find_statement_files(args.inputs, recursive=args.recursive)
+    if not paths:
+        print("No PDF statements or ZIP archives found", file=sys.stderr)
+        return EXIT_ATTENTION
+    
+    processing_date = args.date or datetime.now()
+    
+    batch_metrics = Metrics()
+    with UploadSpool() as spool:
+        uploads, upload_paths, read_seconds, skipped = read_statement_files(paths, spool)
+        print(f"Extracting {len(uploads)} statement(s)...")
+        results = extract_batch(uploads, max_workers=args.workers, metrics=batch_metrics)
+    for result, seconds in zip(results, read_seconds):
+        result['metrics'].add_time('read', seconds)
+    
+    rows = [
+        {
+            'filename': name,
+            'path': path,
+            'file_hash': "",
+            'backend': "",
+            **{field: "" for field in EXTRACTED_FIELDS},
+            'status': status,
+            'detail': reason
+        }
+        for path, name, status, reason in skipped
+    ]
+    candidates = []
+    for path, result in zip(upload_paths, results):
+        asic_data = result['asic_data'] or {}
+        row = {
+            'filename': result['filename'],
+            'path': path,
+            'file_hash': result['file_hash'],
+            'backend': result['backend'] or "",
+            **{field: asic_data.get(field, "") for field in EXTRACTED_FIELDS},
+            'status': "new",
+            'detail': ""
+        }
+        rows.append(row)
+        
+        if result['error']:
+            row['status'] = "failed"
+            row['detail'] = result['error']
+        elif missing_fields(asic_data):
+            row['status'] = "incomplete"
+            row['detail'] = "missing " + ", ".join(missing_fields(asic_data))
+        else:
+            candidates.append(row)
+    
+    with batch_metrics.stage('duplicate_check'):
+        duplicate_checks = check_duplicate_statements(
+            [(row['file_hash'], row['asic_reference'], row['bpay_reference']) for row in candidates],
+            args.duplicate_index
+        )
+    for row, duplicate_check in zip(candidates, duplicate_checks):
+        if duplicate_check['file_duplicate']:
+            row['status'] = "duplicate"
+            row['detail'] = f"same file processed {duplicate_check['file_duplicate'][1]} in {duplicate_check['file_duplicate'][2]}"
+        elif duplicate_check['payment_duplicate']:
+            row['status'] = "duplicate"
+            row['detail'] = f"same payment processed {duplicate_check['payment_duplicate'][1]} in {duplicate_check['payment_duplicate'][2]}"
+        elif duplicate_check['upload_duplicate'] is not None:
+            row['status'] = "duplicate"
+            row['detail'] = f"same statement as {candidates[duplicate_check['upload_duplicate']]['filename']}"
+    
+    # A payment larger than one ABA file may total can't be paid in any file
+    max_total_cents = ABA_FILE_MAX_TOTAL_CENTS if args.max_total is None else args.max_total
+    for row in candidates:
+        if row['status'] == "new" and amount_to_cents(row['amount']) > max_total_cents:
+            row['status'] = "over_limit"
+            row['detail'] = f"amount {row['amount']} is over the {cents_to_amount(max_total_cents)} limit for one ABA file"
+    
+    # Claim the new statements so an app session or another run can't pay
+    # them while this run generates its batch
+    if not args.dry_run:
+        new_rows = [row for row in candidates if row['status'] == "new"]
+        with batch_metrics.stage('reservation'):
+            holders = reserve_statements(
+                session_id, [(row['file_hash'], row['asic_reference'], row['bpay_reference']) for row in new_rows]
+            )
+        for row, holder in zip(new_rows, holders):
+            if holder is not None:
+                row['status'] = "reserved"
+                row['detail'] = (
+                    f"staged in session {holder['session_id']} until "
+                    f"{datetime.fromtimestamp(holder['expires_at']).strftime('%Y-%m-%d %H:%M:%S')}"
+                )
+    
+    valid_rows = [row for row in rows if row['status'] == "new"]
+    problems = [row for row in rows if row['status'] not in ("new", "skipped")]
+    
+    summary = {
+        'processing_date': processing_date.strftime("%Y-%m-%d"),
+        'batch_id': None,
+        'aba_file': None,
+        'aba_files': [],
+        'manifest': None,
+        'aba_errors': [],
+        'commit_error': None,
+        'statement_count': len(valid_rows),
+        'total_amount': cents_to_amount(sum(amount_to_cents(row['amount']) for row in valid_rows)),
+        'statements': rows
+    }
+    
+    shards = []
+    if valid_rows:
+        try:
+            shards = plan_aba_shards(
+                valid_rows, args.max_records, max_total_cents,
+                args.max_file_kb * 1024 if args.max_file_kb is not None else None
+            )
+        except ValueError as e:
+            summary['aba_errors'] = [str(e)]
+    
+    if valid_rows and args.strict and problems:
+        print(f"--strict: not generating an ABA file because {len(problems)} file(s) need attention", file=sys.stderr)
+    elif summary['aba_errors']:
+        print(f"No ABA file written - {summary['aba_errors'][0]}", file=sys.stderr)
+    elif valid_rows and args.dry_run:
+        print(f"Dry run: {len(valid_rows)} statement(s) would be paid, total ${summary['total_amount']}")
+    elif valid_rows:
+        filename = f"ASIC_Batch_{len(valid_rows)}companies_{processing_date.strftime('%Y%m%d')}.ABA"
+        batch_id = new_batch_id()
+        aba_paths = [
+            os.path.join(args.output_dir, aba_shard_filename(filename, shard_number, len(shards)))
+            for shard_number in range(1, len(shards) + 1)
+        ]
+        temp_paths = [aba_path + ".partial" for aba_path in aba_paths]
+        
+        # Every file is validated as it is written; none is published if any fails
+        try:
+            os.makedirs(args.output_dir, exist_ok=True)
+            with batch_metrics.stage('aba_generation'):
+                written = write_aba_shards(
+                    shards, args.bsb, args.account, args.name, processing_date, args.apca,
+                    paths=temp_paths, max_workers=args.workers
+                )
+        except (ABAValidationError, OSError, ValueError) as e:
+            # A full disk, a permissions error or a batch the ABA format cannot hold
+            for temp_path in temp_paths:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            if isinstance(e, ABAValidationError):
+                summary['aba_errors'] = [str(issue) for issue in e.report.errors]
+            else:
+                summary['aba_errors'] = [str(e)]
+            summary['statement_count'] = 0
+            release_reservations(session_id)
+            print(f"No ABA file written - {e}", file=sys.stderr)
+        else:
+            # A split batch is recorded under its manifest's name
+            manifest_path = os.path.join(args.output_dir, os.path.splitext(filename)[0] + "_manifest.json")
+            batch_filename = os.path.basename(manifest_path) if len(shards) > 1 else filename
+            
+            # Only publish the ABA files once their statements are recorded
+            with batch_metrics.stage('commit'):
+                commit = commit_batch(batch_id, batch_filename, valid_rows, shards=[
+                    {
+                        'aba_filename': os.path.basename(aba_path),
+                        'statements': shard,
+                        'record_count': stats['record_count'],
+                        'sha256': stats['sha256']
+                    }
+                    for aba_path, shard, stats in zip(aba_paths, shards, written)
+                ], session_id=session_id)
+            if commit['committed']:
+                for temp_path, aba_path in zip(temp_paths, aba_paths):
+                    os.replace(temp_path, aba_path)
+                summary['batch_id'] = batch_id
+                summary['aba_file'] = aba_paths[0] if len(shards) == 1 else None
+                summary['aba_files'] = aba_paths
+                for row in valid_rows:
+                    row['status'] = "processed"
+                
+                if len(shards) > 1:
+                    with open(manifest_path, "w") as f:
+                        f.write(batch_manifest_json(batch_id))
+                    summary['manifest'] = manifest_path
+                    print(f"Batch split into {len(shards)} ABA files to stay within the per-file limits - see {manifest_path}")
+                for aba_path, stats in zip(aba_paths, written):
+                    print(f"Wrote {aba_path}: {stats['credit_count']} payment(s), total ${cents_to_amount(stats['total_cents'])}")
+            elif commit['error']:
+                for temp_path in temp_paths:
+                    os.remove(temp_path)
+                summary['commit_error'] = commit['error']
+                summary['statement_count'] = 0
+                print(f"No ABA file written - {commit['error']}", file=sys.stderr)
+            else:
+                for temp_path in temp_paths:
+                    os.remove(temp_path)
+                for row in commit['conflicts']:
+                    row['status'] = "duplicate"
+                    row['detail'] = "recorded by another batch or reserved by another session during this run"
+                summary['statement_count'] = 0
+                print("Batch not recorded - statements were committed or reserved elsewhere; no ABA file written", file=sys.stderr)
+    
+    log_batch_metrics(results, batch_metrics, summary['batch_id'])
+    summary['metrics'] = batch_totals((result['metrics'] for result in results), batch_metrics).as_dict()
+    
+    for row in rows:
+        if row['status'] not in ("new", "processed"):
+            print(f"  {row['status'].upper():<10} {row['filename']}: {row['detail']}", file=sys.stderr)
+    
+    summary_path = args.summary or os.path.join(
+        args.output_dir, f"ASIC_Batch_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+    write_summary(summary, summary_path)
+    print(f"Summary written to {summary_path}")
+    
+    if summary['aba_errors'] or summary['commit_error'] or any(row['status'] not in ("new", "processed", "skipped") for row in rows):
+        return EXIT_ATTENTION
+    return EXIT_OK
+
+def validate_files(args):
+    """Validate existing ABA files - returns 0 when every file is valid"""
+    status = EXIT_OK
+    for path in args.files:
+        try:
+            report = validate_aba_file(path, require_balanced=args.balanced, max_errors=args.max_errors)
+        except OSError as e:
+            print(f"{path}: cannot read ({e.strerror})", file=sys.stderr)
+            status = EXIT_ATTENTION
+            continue
+        
+        if args.json:
+            print(json.dumps({'file': path, **report.as_dict()}))
+        elif report.valid:
+            print(
+                f"{path}: valid - {report.line_count} records, {report.credit_count} credit(s) totalling "
+                f"${cents_to_amount(report.credit_total_cents)}, {report.debit_count} debit(s) totalling "
+                f"${cents_to_amount(report.debit_total_cents)}"
+            )
+        else:
+            print(f"{path}: {report.error_count} error(s)")
+            for issue in report.errors:
+                print(f"  {issue}")
+            if report.error_count > len(report.errors):
+                print(f"  ... {report.error_count - len(report.errors)} more not shown")
+        
+        if not report.valid:
+            status = EXIT_ATTENTION
+    return status
+
+def reconcile_statements(args):
+    """Match a bank CSV's debits against processed statements - returns 1 when any statement is still unmatched"""
+    if args.db:
+        set_database_path(args.db)
+    init_database()
+    
+    try:
+        with open(args.csv, "rb") as f:
+            summary = reconcile_bank_csv(f, window_days=args.window_days)
+    except (OSError, ValueError) as e:
+        print(f"Cannot reconcile {args.csv}: {e}", file=sys.stderr)
+        return EXIT_ATTENTION
+    
+    matched = ", ".join(f"{count} by {match_type.replace('_', ' ')}" for match_type, count in summary['matched'].items() if count)
+    print(
+        f"Read {summary['transactions']} transaction(s), {summary['debits']} debit(s): "
+        f"{sum(summary['matched'].values())} matched ({matched or 'none'}) covering {summary['matched_statements']} statement(s), "
+        f"{summary['already_matched']} matched by an earlier import"
+    )
+    for debit in summary['unmatched_debits']:
+        print(f"  UNMATCHED DEBIT      {debit['date']}  ${cents_to_amount(-debit['amount_cents']):>10}  {debit['description']}")
+    for statement in summary['unmatched_statements']:
+        print(
+            f"  UNMATCHED STATEMENT  {statement['processed_date'][:10]}  ${cents_to_amount(statement['cents']):>10}  "
+            f"{statement['company_name']} ({statement['bpay_reference']}, {statement['batch_id'] or 'no batch'})"
+        )
+    for row_number, reason in summary['skipped']:
+        print(f"  SKIPPED ROW {row_number}: {reason}", file=sys.stderr)
+    
+    if args.summary:
+        os.makedirs(os.path.dirname(os.path.abspath(args.summary)), exist_ok=True)
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+        print(f"Summary written to {args.summary}")
+    
+    return EXIT_ATTENTION if summary['unmatched_statements'] else EXIT_OK
+
+def export_history(args):
+    """Stream processed statements to a CSV or Parquet file"""
+    if args.db:
+        set_database_path(args.db)
+    init_database()
+    
+    export_format = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+    if export_format not in EXPORT_FORMATS:
+        print(f"Cannot tell the format of {args.output}: use a .csv or .parquet name or --format", file=sys.stderr)
+        return EXIT_USAGE
+    
+    directory = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(directory, exist_ok=True)
+    try:
+        row_count = export_statements(args.output, export_format, args.date_from, args.date_to)
+    except (OSError, RuntimeError) as e:
+        print(f"Cannot export to {args.output}: {e}", file=sys.stderr)
+        return EXIT_ATTENTION
+    
+    print(f"Exported {row_count} statement(s) to {args.output}")
+    return EXIT_OK
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+def parse_max_total(value):
+    """--max-total in dollars, as integer cents"""
+    try:
+        cents = amount_to_cents(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a dollar amount, got {value!r}")
+    if not 0 < cents <= ABA_MAX_AMOUNT_CENTS:
+        raise argparse.ArgumentTypeError(f"expected an amount from 0.01 to {cents_to_amount(ABA_MAX_AMOUNT_CENTS)}, got {value!r}")
+    return cents
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m asic_batch",
+        description="Generate ASIC batch ABA files without the Streamlit UI"
+    )
+    parser.add_argument(
+        "--log-level", default=os.getenv("ASIC_LOG_LEVEL", "WARNING"),
+        help="INFO logs per-file and per-batch stage timings as JSON lines (default: ASIC_LOG_LEVEL or WARNING)"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    process = subparsers.add_parser("process", help="Extract statements and generate a batch ABA file")
+    process.add_argument("inputs", nargs="+", help="PDF or ZIP files, directories or glob patterns")
+    process.add_argument("--output-dir", default=".", help="Where the ABA file and summary are written")
+    process.add_argument("--summary", help="Summary path (.json or .csv, default: JSON in --output-dir)")
+    process.add_argument("--bsb", default=DEFAULT_BSB, help="Your bank BSB number")
+    process.add_argument("--account", default=DEFAULT_ACCOUNT, help="Your bank account number")
+    process.add_argument("--apca", default=DEFAULT_APCA_NUMBER, help="Your APCA User ID (6 digits)")
+    process.add_argument("--name", default=DEFAULT_ACCOUNT_NAME, help="Your account name")
+    process.add_argument("--date", type=parse_date, help="Processing date YYYY-MM-DD (default: today)")
+    process.add_argument("--workers", type=int, help="Extraction worker processes (default: CPU count)")
+    process.add_argument("--db", help="SQLite database path (default: ASIC_DB_PATH or asic_statements.db)")
+    process.add_argument(
+        "--duplicate-index", choices=DUPLICATE_INDEX_MODES, default=DUPLICATE_INDEX,
+        help="Check duplicates in SQLite, or against the processed statements loaded into memory "
+             "as hash sets or Bloom filters (default: ASIC_DUPLICATE_INDEX or sqlite)"
+    )
+    process.add_argument("--recursive", action="store_true", help="Search directories recursively")
+    process.add_argument("--strict", action="store_true", help="Write no ABA file if any file needs attention")
+    process.add_argument("--dry-run", action="store_true", help="Report what would be paid without writing or recording")
+    process.add_argument("--max-records", type=int, help="Most records (credits plus debit) per ABA file (default: ASIC_ABA_MAX_RECORDS or 999999)")
+    process.add_argument("--max-total", type=parse_max_total, help="Largest total per ABA file in dollars (default: ASIC_ABA_MAX_TOTAL or the field limit)")
+    process.add_argument("--max-file-kb", type=int, help="Largest ABA file in KB, 0 for no limit (default: ASIC_ABA_MAX_FILE_KB or 0)")
+    process.add_argument("--profile", help="Write a cProfile dump of the run to this path (use with --workers 1)")
+    process.set_defaults(handler=process_inbox)
+    
+    validate = subparsers.add_parser("validate", help="Check existing ABA files and report errors by line and column")
+    validate.add_argument("files", nargs="+", help="ABA files to check")
+    validate.add_argument("--balanced", action="store_true", help="Also require the debits to equal the credits")
+    validate.add_argument("--max-errors", type=int, default=MAX_REPORTED_ERRORS, help="Most errors listed per file (default: 100)")
+    validate.add_argument("--json", action="store_true", help="Print one JSON report per file")
+    validate.set_defaults(handler=validate_files)
+    
+    reconcile = subparsers.add_parser("reconcile", help="Match a bank CSV export's debits against processed statements")
+    reconcile.add_argument("csv", help="Bank transaction CSV export")
+    reconcile.add_argument(
+        "--window-days", type=int, default=RECONCILE_WINDOW_DAYS,
+        help=f"Days a debit may follow its statements' processing (default: ASIC_RECONCILE_WINDOW_DAYS or {RECONCILE_WINDOW_DAYS})"
+    )
+    reconcile.add_argument("--db", help="SQLite database path (default: ASIC_DB_PATH or asic_statements.db)")
+    reconcile.add_argument("--summary", help="Write the matches and unmatched items as JSON to this path")
+    reconcile.set_defaults(handler=reconcile_statements)
+    
+    export = subparsers.add_parser("export", help="Stream processed statements to a CSV or Parquet file")
+    export.add_argument("output", help="Output path (.csv or .parquet)")
+    export.add_argument("--format", choices=EXPORT_FORMATS, help="Output format (default: from the file extension)")
+    export.add_argument("--from", dest="date_from", type=parse_date, help="First processing date YYYY-MM-DD")
+    export.add_argument("--to", dest="date_to", type=parse_date, help="Last processing date YYYY-MM-DD")
+    export.add_argument("--db", help="SQLite database path (default: ASIC_DB_PATH or asic_statements.db)")
+    export.set_defaults(handler=export_history)
+    
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging(args.log_level)
+    return args.handler(args)
@@ -0,0 +1,173 @@
+"""In-process duplicate index over processed statements
+
+Every statement ever paid is loaded once into memory, keyed by file hash and
+by (ASIC reference, BPay reference), and checking an upload against it costs
+one set lookup per key instead of a round trip to SQLite. Only a hit goes to
+the database, through storage.check_duplicate_statements, to confirm it and
+fetch the earlier statement's details; a statement the index has never seen
+is new without touching the database.
+
+The index keeps the id of the newest statement it has loaded and, before
+each check, loads only the statements committed since - by this process or
+any other - so it stays current without reloading the history.
+
+Keys are stored as their 64-bit hash() values rather than as strings, or
+with bloom=True in a Bloom filter of about 10 bits per key for very large
+histories. Both can report a statement that was never paid (a hash
+collision or Bloom false positive), never the reverse, and every hit is
+confirmed in SQLite, so results are exactly those of the SQL check. String
+hashes are randomised per interpreter, so an index is never saved or shared
+between processes - each loads its own.
+"""
+
+import math
+import os
+import sys
+import threading
+
+from asic_batch import storage
+
+# 'sqlite' (no index), 'memory' (sets of key hashes) or 'bloom' (Bloom filters)
+DUPLICATE_INDEX = os.getenv("ASIC_DUPLICATE_INDEX", "sqlite")
+DUPLICATE_INDEX_MODES = ('sqlite', 'memory', 'bloom')
+
+# Share of unpaid statements a Bloom filter sends to SQLite for confirmation
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+
+# Bloom filters are sized for twice the statements already paid, and rebuilt
+# larger once the history outgrows them
+BLOOM_MIN_CAPACITY = 100_000
+
+# Statements read per query while loading the index
+INDEX_LOAD_CHUNK_ROWS = 50_000
+
+_MASK_32 = (1 << 32) - 1
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit key hashes"""
+    
+    def __init__(self, capacity, false_positive_rate=BLOOM_FALSE_POSITIVE_RATE):
+        self.capacity = capacity
+        self.bit_count = max(64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self._bits = bytearray((self.bit_count + 7) // 8)
+    
+    def update(self, keys):
+        bits, bit_count, hashes = self._bits, self.bit_count, range(self.hash_count)
+        for key in keys:
+            # Double hashing: the hash's two 32-bit halves stand in for k hash functions
+            position, step = (key & _MASK_32) % bit_count, ((key >> 32) & _MASK_32) | 1
+            for _ in hashes:
+                bits[position >> 3] |= 1 << (position & 7)
+                position = (position + step) % bit_count
+    
+    def __contains__(self, key):
+        bits, bit_count = self._bits, self.bit_count
+        position, step = (key & _MASK_32) % bit_count, ((key >> 32) & _MASK_32) | 1
+        for _ in range(self.hash_count):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+            position = (position + step) % bit_count
+        return True
+    
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+class DuplicateIndex:
+    """File hashes and payment references of every processed statement, refreshed by id watermark"""
+    
+    def __init__(self, bloom=False, false_positive_rate=BLOOM_FALSE_POSITIVE_RATE):
+        self.bloom = bloom
+        self.false_positive_rate = false_positive_rate
+        self._lock = threading.Lock()
+        self._reset(0)
+    
+    def _reset(self, newest_id):
+        self.watermark = 0
+        self.row_count = 0
+        if self.bloom:
+            capacity = max(BLOOM_MIN_CAPACITY, newest_id * 2)
+            self._file_hashes = BloomFilter(capacity, self.false_positive_rate)
+            self._payments = BloomFilter(capacity, self.false_positive_rate)
+        else:
+            self._file_hashes = set()
+            self._payments = set()
+    
+    def refresh(self):
+        """Load statements committed since the last refresh - returns how many were added"""
+        with self._lock:
+            newest_id = storage.get_statements_version()
+            # Reload when statements were deleted from the top of the history,
+            # or when the Bloom filters could fill past their false positive rate
+            if newest_id < self.watermark or (self.bloom and newest_id > self._file_hashes.capacity):
+                self._reset(newest_id)
+            if newest_id == self.watermark:
+                return 0
+            
+            added = 0
+            for rows in storage.iter_duplicate_keys(self.watermark, INDEX_LOAD_CHUNK_ROWS):
+                self._file_hashes.update(hash(row[1]) for row in rows)
+                self._payments.update(hash(row[2:]) for row in rows)
+                added += len(rows)
+                self.watermark = rows[-1][0]
+            self.row_count += added
+            return added
+    
+    def might_be_duplicate(self, file_hash, asic_reference, bpay_reference):
+        """Whether the file and the payment may have been processed - False is certain, True needs confirming"""
+        return (
+            hash(file_hash) in self._file_hashes,
+            hash((asic_reference, bpay_reference)) in self._payments
+        )
+    
+    def check_duplicate_statements(self, statements):
+        """storage.check_duplicate_statements, querying SQLite only for statements the index may have seen"""
+        statements = list(statements)
+        self.refresh()
+        results = [
+            {'file_duplicate': None, 'payment_duplicate': None, 'upload_duplicate': None}
+            for _ in statements
+        ]
+        hits = [position for position, statement in enumerate(statements) if any(self.might_be_duplicate(*statement))]
+        if hits:
+            confirmed = storage.check_duplicate_statements([statements[position] for position in hits])
+            for position, duplicate_check in zip(hits, confirmed):
+                results[position]['file_duplicate'] = duplicate_check['file_duplicate']
+                results[position]['payment_duplicate'] = duplicate_check['payment_duplicate']
+        
+        for result, earlier in zip(results, storage.find_upload_duplicates(statements)):
+            result['upload_duplicate'] = earlier
+        return results
+    
+    @property
+    def nbytes(self):
+        """Approximate memory held by the index"""
+        if self.bloom:
+            return self._file_hashes.nbytes + self._payments.nbytes
+        # Each set's table plus an int object per key hash
+        return sum(sys.getsizeof(keys) + len(keys) * sys.getsizeof(-1 << 62) for keys in (self._file_hashes, self._payments))
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_duplicate_index(mode=None):
+    """Duplicate index for the current database, shared by all sessions - None when mode is 'sqlite'"""
+    mode = mode or DUPLICATE_INDEX
+    if mode not in DUPLICATE_INDEX_MODES:
+        raise ValueError(f"Unknown duplicate index: {mode!r} (expected one of {', '.join(DUPLICATE_INDEX_MODES)})")
+    if mode == 'sqlite':
+        return None
+    
+    with _indexes_lock:
+        key = (storage.DB_PATH, mode)
+        if key not in _indexes:
+            _indexes[key] = DuplicateIndex(bloom=mode == 'bloom')
+        return _indexes[key]
+
+def check_duplicate_statements(statements, mode=None):
+    """Check an upload for duplicates through the shared index, or straight in SQLite when mode is 'sqlite'"""
+    index = get_duplicate_index(mode)
+    if index is None:
+        return storage.check_duplicate_statements(statements)
+    return index.check_duplicate_statements(statements)
@@ -0,0 +1,362 @@
+"""Field extraction from ASIC statement PDFs, one file or a whole batch
+
+extract_asic_data reads a statement's text through the backends in
+asic_batch.backends and picks out its fields in a single pass with
+FieldExtractor. iter_extract_batch spreads a batch over worker processes and
+answers files it has seen before from the extraction cache. Nothing here
+imports Streamlit, and the PDF libraries are only imported by the first
+extraction, so the CLI and worker processes start quickly.
+"""
+
+import io
+import math
+import re
+import time
+from concurrent.futures import as_completed
+from contextlib import closing
+
+from asic_batch.backends import get_backend_order
+from asic_batch.instrumentation import Metrics
+from asic_batch.spool import SpooledFile, get_file_hash
+from asic_batch.storage import (
+    EXTRACTED_FIELDS,
+    evict_extraction_cache,
+    get_cached_extractions,
+    save_cached_extractions,
+)
+from asic_batch.workers import get_worker_count, process_pool
+
+# Bump whenever extract_asic_data changes what it returns so cached results are re-extracted
+EXTRACTOR_VERSION = 4
+
+# Field extraction rules - each field lists (rule name, trigger, pattern) in
+# priority order. The trigger finds the lines a rule can match (a literal
+# keyword, or a compiled pattern for rules without one) and the pattern is
+# only run on those lines.
+FIELD_RULES = {
+    # Company details - look for pattern "FOR [COMPANY NAME]" after ACN
+    'company_name': (
+        ('for_company_name', 'FOR', re.compile(r'FOR\s+([A-Z][A-Z0-9\s&]+(?:PTY\s+LTD|LIMITED|LTD))')),
+    ),
+    'acn': (
+        ('acn', 'ACN', re.compile(r'ACN\s+(\d{3}\s+\d{3}\s+\d{3})')),
+    ),
+    'amount': (
+        ('annual_review_amount', 'Annual Review', re.compile(r'Annual Review.*?\$(\d+\.\d{2})')),
+    ),
+    'asic_reference': (
+        ('annual_review_reference', 'Annual Review', re.compile(r'Annual Review.*?([A-Z0-9]{13}\s+[A-Z])')),
+    ),
+    # BPay reference - the standalone 13-digit line, then the barcode-like line
+    # with asterisks, then the spaced "Ref:" pattern
+    'bpay_reference': (
+        ('bpay_standalone', re.compile(r'\n[^\S\n]*\d{13}[^\S\n]*$', re.MULTILINE), re.compile(r'^\s*(\d{13})\s*$')),
+        ('bpay_barcode', '*', re.compile(r'\*\d+\s+(\d{13})\s+\d+\s+\*')),
+        ('bpay_ref_spaced', 'Ref:', re.compile(r'Ref:\s+(\d{4}\s+\d{4}\s+\d{4}\s+\d{3})')),
+    ),
+}
+
+# Values reported for fields that were not found
+FIELD_DEFAULTS = {
+    'company_name': "Unknown Company",
+    'acn': "",
+    'amount': "0.00",
+    'asic_reference': "",
+    'bpay_reference': ""
+}
+
+class FieldExtractor:
+    """Single-pass extraction of ASIC statement fields, line by line
+    
+    Text is fed in document order. Each rule trigger scans forward from the
+    current line to its next candidate line, the nearest candidate line is
+    tested, and the text in between is never looked at in Python. A field
+    stops being searched for once its highest priority rule has matched.
+    matched_rules records the rule that produced each field.
+    """
+    
+    def __init__(self):
+        self.values = {}
+        self.matched_rules = {}
+        self._priorities = {}
+        self._pending_rules = [
+            (field, priority, name, trigger, pattern)
+            for field, rules in FIELD_RULES.items()
+            for priority, (name, trigger, pattern) in enumerate(rules)
+        ]
+    
+    @property
+    def resolved(self):
+        """True once every field has been found by any of its rules"""
+        return len(self.values) == len(FIELD_RULES)
+    
+    @property
+    def complete(self):
+        """True once no later text could change the result"""
+        return not self._pending_rules
+    
+    def feed(self, text):
+        """Scan the next chunk of text (e.g. one page)"""
+        # Leading newline lets line-start triggers match the first line
+        text = "\n" + text
+        next_hits = {}
+        position = 0
+        
+        while self._pending_rules:
+            candidate = math.inf
+            for rule in self._pending_rules:
+                trigger = rule[3]
+                hit = next_hits.get(trigger)
+                if hit is None or hit < position:
+                    hit = self._find_trigger(trigger, text, position)
+                    next_hits[trigger] = hit
+                candidate = min(candidate, hit)
+            
+            if candidate == math.inf:
+                break
+            
+            line_start = text.rfind("\n", 0, candidate) + 1
+            line_end = text.find("\n", candidate)
+            if line_end == -1:
+                line_end = len(text)
+            
+            self._scan_line(text[line_start:line_end])
+            position = line_end + 1
+    
+    @staticmethod
+    def _find_trigger(trigger, text, position):
+        """A position inside the next line the trigger matches, or infinity"""
+        if isinstance(trigger, str):
+            hit = text.find(trigger, position)
+            return hit if hit != -1 else math.inf
+        
+        # Line-start triggers begin with the newline before the line
+        match = trigger.search(text, max(0, position - 1))
+        return match.end() if match else math.inf
+    
+    def _scan_line(self, line):
+        matched = False
+        for field, priority, name, trigger, pattern in self._pending_rules:
+            if priority >= self._priorities.get(field, len(FIELD_RULES[field])):
+                continue
+            
+            match = pattern.search(line)
+            if match:
+                value = match.group(1)
+                self.values[field] = value.strip() if field == 'company_name' else value.replace(' ', '')
+                self.matched_rules[field] = name
+                self._priorities[field] = priority
+                matched = True
+        
+        if matched:
+            # Drop rules that can no longer beat what has been found
+            self._pending_rules = [
+                rule for rule in self._pending_rules
+                if rule[1] < self._priorities.get(rule[0], len(FIELD_RULES[rule[0]]))
+            ]
+    
+    def result(self):
+        """Extracted fields, with defaults for anything not found"""
+        return {field: self.values.get(field, FIELD_DEFAULTS[field]) for field in EXTRACTED_FIELDS}
+
+def missing_fields(asic_data):
+    """Names of the fields that were not found in a statement"""
+    return [field for field in EXTRACTED_FIELDS if asic_data[field] == FIELD_DEFAULTS[field]]
+
+def extract_fields(text):
+    """Extract ASIC statement fields from text in a single pass
+    
+    Returns (fields, matched_rules) where matched_rules maps each field to the
+    name of the rule that found it, or None if the default was used.
+    """
+    extractor = FieldExtractor()
+    extractor.feed(text)
+    matched_rules = {field: extractor.matched_rules.get(field) for field in EXTRACTED_FIELDS}
+    return extractor.result(), matched_rules
+
+def read_fields(pdf_file, backend, metrics):
+    """Feed one backend's page texts to a FieldExtractor, stopping once every field is found"""
+    extractor = FieldExtractor()
+    with closing(backend.iter_page_texts(pdf_file, metrics)) as pages:
+        for page_text in pages:
+            with metrics.stage('regex'):
+                extractor.feed(page_text)
+            if extractor.resolved:
+                break
+    return extractor
+
+def extract_asic_data_with_backend(pdf_file, metrics=None, backends=None):
+    """Extract ASIC data, returning (asic_data, name of the backend that produced it)
+    
+    Backends are tried fastest first and a slower one only runs when the one
+    before could not open the PDF or left fields missing. Pages are read one at
+    a time and reading stops at the end of the first page where every field has
+    been found, so attachments are never parsed. If no backend finds every
+    field, the result with the most fields is returned (the later, layout-aware
+    backend on a tie); if none can open the PDF the last error is raised.
+    """
+    if metrics is None:
+        metrics = Metrics()
+    if backends is None:
+        backends = get_backend_order()
+    
+    best = None
+    error = None
+    for attempt, backend in enumerate(backends):
+        if attempt:
+            metrics.count('backend_fallbacks')
+        pdf_file.seek(0)
+        try:
+            extractor = read_fields(pdf_file, backend, metrics)
+        except Exception as e:
+            error = e
+            continue
+        
+        if best is None or len(extractor.values) >= len(best[0].values):
+            best = (extractor, backend.name)
+        if extractor.resolved:
+            break
+    
+    if best is None:
+        raise error
+    return best[0].result(), best[1]
+
+def extract_asic_data(pdf_file, metrics=None):
+    """Extract relevant data from ASIC statement PDF"""
+    return extract_asic_data_with_backend(pdf_file, metrics)[0]
+
+# Batch extraction functions
+def _extract_upload(upload):
+    """Extract a single (filename, file_content) upload - runs in a worker process
+    
+    file_content is bytes or a SpooledFile, which is read from disk when it was
+    spooled there. Returns (asic_data, backend, error, metrics) with metrics as
+    a plain dict so it can be sent back from the worker.
+    """
+    filename, file_content = upload
+    metrics = Metrics()
+    
+    try:
+        pdf_file = file_content.open() if isinstance(file_content, SpooledFile) else io.BytesIO(file_content)
+        with pdf_file:
+            asic_data, backend = extract_asic_data_with_backend(pdf_file, metrics)
+        return asic_data, backend, None, metrics.as_dict()
+    except Exception as e:
+        return None, None, str(e), metrics.as_dict()
+
+def iter_extract_batch(uploads, max_workers=None, use_cache=True, metrics=None, cancel_event=None):
+    """Extract ASIC data from a list of (filename, file_content) uploads in parallel
+    
+    file_content is bytes or a SpooledFile. An upload may be (filename,
+    file_content, file_hash) when the content was already hashed as it was
+    read, e.g. while streaming it out of a ZIP.
+    
+    Yields (index, result) pairs as each file finishes - files found in the
+    extraction cache first, then parsed files in completion order, so a slow
+    PDF never holds up the others. Each result holds 'filename', 'file_hash',
+    'asic_data', 'backend' (the extraction backend that produced it), 'error',
+    'cached' and per-file 'metrics' - a file that fails to
+    parse sets 'error' instead of stopping the batch. use_cache needs
+    init_database() to have run. Batch-level stages are added to metrics.
+    
+    Once cancel_event is set no more files are started and the generator
+    stops; whatever finished is still saved to the extraction cache.
+    """
+    if metrics is None:
+        metrics = Metrics()
+    
+    # Hash up front so known files can be answered from the cache
+    results = []
+    for upload in uploads:
+        filename, file_content = upload[:2]
+        file_metrics = Metrics()
+        if len(upload) > 2:
+            file_hash = upload[2]
+        else:
+            with file_metrics.stage('hash'):
+                file_hash = get_file_hash(file_content)
+        file_metrics.count('bytes_hashed', len(file_content))
+        results.append({
+            'filename': filename,
+            'file_hash': file_hash,
+            'asic_data': None,
+            'backend': None,
+            'error': None,
+            'cached': False,
+            'metrics': file_metrics
+        })
+    
+    cached = {}
+    if use_cache and results:
+        with metrics.stage('cache_lookup'):
+            cached = get_cached_extractions((result['file_hash'] for result in results), EXTRACTOR_VERSION)
+    pending = []
+    for index, result in enumerate(results):
+        if result['file_hash'] in cached:
+            asic_data, backend = cached[result['file_hash']]
+            result['asic_data'] = dict(asic_data)
+            result['backend'] = backend
+            result['cached'] = True
+            result['metrics'].count('cache_hits')
+            yield index, result
+        else:
+            pending.append(index)
+    
+    if not pending:
+        return
+    
+    if max_workers is None:
+        max_workers = get_worker_count()
+    max_workers = min(max_workers, len(pending))
+    
+    def store(index, extracted):
+        asic_data, backend, error, file_metrics = extracted
+        results[index]['asic_data'] = asic_data
+        results[index]['backend'] = backend
+        results[index]['error'] = error
+        results[index]['metrics'].merge(Metrics.from_dict(file_metrics))
+        finished.append(index)
+        return index, results[index]
+    
+    finished = []
+    started = time.perf_counter()
+    try:
+        # Not worth starting a process pool for a single file or worker
+        if max_workers <= 1:
+            for index in pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                yield store(index, _extract_upload(uploads[index][:2]))
+        else:
+            # One task per file so results stream back as soon as each is ready
+            executor = process_pool(max_workers)
+            try:
+                futures = {executor.submit(_extract_upload, uploads[index][:2]): index for index in pending}
+                for future in as_completed(futures):
+                    yield store(futures[future], future.result())
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        metrics.add_time('extract_wall', time.perf_counter() - started)
+        metrics.count('workers', max_workers)
+        
+        if use_cache and finished:
+            with metrics.stage('cache_save'):
+                save_cached_extractions({
+                    results[index]['file_hash']: (results[index]['asic_data'], results[index]['backend'])
+                    for index in finished if results[index]['error'] is None
+                }, EXTRACTOR_VERSION)
+                evict_extraction_cache(EXTRACTOR_VERSION)
+
+def extract_batch(uploads, max_workers=None, use_cache=True, metrics=None):
+    """Extract ASIC data from a list of (filename, file_content) uploads in parallel
+    
+    Returns the iter_extract_batch results as a list in upload order.
+    """
+    uploads = list(uploads)
+    results = [None] * len(uploads)
+    for index, result in iter_extract_batch(uploads, max_workers, use_cache, metrics):
+        results[index] = result
+    return results
@@ -0,0 +1,148 @@
+"""Per-stage timings and counters for batch runs
+
+Each uploaded file gets a Metrics object that the extraction worker fills in
+(read, hash, PyPDF2, pdfplumber and regex time, pages parsed, backend
+fallbacks taken, bytes hashed) and sends back as a plain dict. Work done once
+per batch - cache lookups, duplicate checks, saving - goes in a batch-level
+Metrics. Both are logged as JSON lines on the "asic_batch.metrics" logger.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asic_batch.storage import get_db_round_trips
+
+logger = logging.getLogger("asic_batch.metrics")
+
+# Stages in the order they happen, for display
+STAGE_ORDER = (
+    'read', 'hash', 'cache_lookup', 'pypdf2', 'pdfplumber', 'regex',
+    'extract_wall', 'cache_save', 'duplicate_check', 'reservation', 'aba_generation', 'commit'
+)
+
+class Metrics:
+    """Seconds spent per named stage plus integer counters"""
+    
+    def __init__(self, timings=None, counters=None):
+        self.timings = defaultdict(float, timings or {})
+        self.counters = defaultdict(int, counters or {})
+    
+    @contextmanager
+    def stage(self, name):
+        """Time a with block, adding any SQL statements it ran to db_round_trips"""
+        started = time.perf_counter()
+        round_trips = get_db_round_trips()
+        try:
+            yield self
+        finally:
+            self.timings[name] += time.perf_counter() - started
+            round_trips = get_db_round_trips() - round_trips
+            if round_trips:
+                self.counters['db_round_trips'] += round_trips
+    
+    def add_time(self, name, seconds):
+        self.timings[name] += seconds
+    
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+    
+    def merge(self, other):
+        """Add another Metrics' timings and counters into this one"""
+        for name, seconds in other.timings.items():
+            self.timings[name] += seconds
+        for name, amount in other.counters.items():
+            self.counters[name] += amount
+        return self
+    
+    def as_dict(self):
+        """Plain dict (picklable, JSON-friendly) with stages in pipeline order"""
+        return {
+            'timings': {name: round(self.timings[name], 6) for name in sorted(self.timings, key=_stage_key)},
+            'counters': dict(sorted(self.counters.items()))
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('timings'), data.get('counters'))
+
+def _stage_key(name):
+    return (STAGE_ORDER.index(name) if name in STAGE_ORDER else len(STAGE_ORDER), name)
+
+def batch_totals(file_metrics, batch_metrics=None):
+    """Sum per-file metrics (and the batch-level metrics) into one Metrics"""
+    totals = Metrics()
+    for metrics in file_metrics:
+        totals.merge(metrics)
+    if batch_metrics is not None:
+        totals.merge(batch_metrics)
+    return totals
+
+def log_metrics(event, metrics, **fields):
+    """Write one structured (JSON) log line for a Metrics object"""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({'event': event, **fields, **metrics.as_dict()}))
+
+def log_batch_metrics(results, batch_metrics, batch_id=None):
+    """Write one structured log line per file and one for the batch totals"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    
+    for result in results:
+        log_metrics(
+            "file_metrics", result['metrics'],
+            batch_id=batch_id,
+            filename=result['filename'],
+            file_hash=result['file_hash'],
+            cached=result['cached'],
+            backend=result.get('backend'),
+            error=result['error']
+        )
+    
+    log_metrics(
+        "batch_metrics", batch_totals((result['metrics'] for result in results), batch_metrics),
+        batch_id=batch_id,
+        files=len(results)
+    )
+
+def configure_logging(level=None):
+    """Send asic_batch log lines to stderr (ASIC_LOG_LEVEL sets the level, default INFO)"""
+    package_logger = logging.getLogger("asic_batch")
+    package_logger.setLevel((level or os.getenv("ASIC_LOG_LEVEL", "INFO")).upper())
+    if not package_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        package_logger.addHandler(handler)
+        package_logger.propagate = False
+
+def get_profile_path(name):
+    """Where to dump a cProfile of a batch run - None unless ASIC_PROFILE_DIR is set"""
+    profile_dir = os.getenv("ASIC_PROFILE_DIR")
+    if not profile_dir:
+        return None
+    return os.path.join(profile_dir, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.prof")
+
+@contextmanager
+def profiled(path):
+    """Run a with block under cProfile and dump the stats to path (no-op when path is empty)
+    
+    Only this process is profiled - extraction running in worker processes shows
+    up as time waiting on the pool, so profile with one worker to see it.
+    """
+    if not path:
+        yield None
+        return
+    
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
+        logger.info(json.dumps({'event': "profile_written", 'path': path}))
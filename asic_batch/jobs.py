@@ -0,0 +1,65 @@
+"""Background jobs the Streamlit page can poll between reruns
+
+A job runs a producer of (index, result) pairs - such as iter_extract_batch -
+in a daemon thread and collects the results as they arrive. The page keeps
+the job in session state, renders whatever has finished on each rerun and
+can cancel it; the thread never touches Streamlit itself.
+"""
+
+import threading
+from contextlib import closing
+
+class BackgroundJob:
+    """Collect (index, result) pairs from produce(cancel_event) in a background thread"""
+    
+    def __init__(self, keys, produce):
+        self.keys = tuple(keys)
+        self.total = len(self.keys)
+        self.error = None
+        self._produce = produce
+        self._results = {}
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._done_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="asic-batch-job", daemon=True)
+    
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def _run(self):
+        try:
+            with closing(self._produce(self._cancel_event)) as produced:
+                for index, result in produced:
+                    with self._lock:
+                        self._results[index] = result
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self._done_event.set()
+    
+    def cancel(self):
+        """Ask the producer to stop - files already started still finish"""
+        self._cancel_event.set()
+    
+    def wait(self, timeout=None):
+        """Block until the job finishes or timeout seconds pass - returns done"""
+        return self._done_event.wait(timeout)
+    
+    @property
+    def done(self):
+        return self._done_event.is_set()
+    
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+    
+    @property
+    def completed(self):
+        with self._lock:
+            return len(self._results)
+    
+    def results(self):
+        """Snapshot of the results finished so far, as a dict of index -> result"""
+        with self._lock:
+            return dict(self._results)
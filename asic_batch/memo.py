@@ -0,0 +1,38 @@
+"""Bounded least-recently-used memo for per-session results"""
+
+from collections import OrderedDict
+
+class BoundedMemo:
+    """Dict-like LRU store holding at most max_entries items
+    
+    Used to keep extraction results in Streamlit session state between reruns
+    without letting a long session grow without limit.
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+    
+    def get(self, key, default=None):
+        """Return the value for key and mark it as recently used"""
+        try:
+            self._entries.move_to_end(key)
+        except KeyError:
+            return default
+        return self._entries[key]
+    
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries over the limit"""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def __contains__(self, key):
+        return key in self._entries
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def clear(self):
+        self._entries.clear()
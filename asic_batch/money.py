@@ -0,0 +1,21 @@
+"""Exact money handling - amounts are kept as integer cents, never floats"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+def amount_to_cents(amount):
+    """Convert an amount such as '1096.85' (str, int, float or Decimal) to integer cents"""
+    try:
+        # str() first so floats are taken at their printed value, not their binary one
+        value = Decimal(str(amount).strip().replace(",", "").lstrip("$"))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {amount!r}")
+    
+    if not value.is_finite():
+        raise ValueError(f"Invalid amount: {amount!r}")
+    
+    return int((value * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def cents_to_amount(cents):
+    """Format integer cents as a dollar amount string such as '1096.85'"""
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
@@ -0,0 +1,327 @@
+"""Reconcile bank CSV exports against processed statements
+
+After an ABA file has been uploaded, the bank account shows one debit per
+ABA file (its balancing debit), or one per payment when the bank itemises
+them. Each debit in the export is matched to the statements it paid:
+
+1. a batch ID in the description - the statements of that batch or of one of
+   its ABA files with the same total
+2. a BPay reference in the description - the statement with that reference
+   and amount
+3. the total of one ABA file of a batch
+4. the amount of a single statement
+
+Only statements processed within ASIC_RECONCILE_WINDOW_DAYS before the debit
+are candidates, and the earliest outstanding candidate wins. Candidates are
+read with one range query on the processed_date index and joined to the
+debits through in-memory hash indexes on amount, BPay reference and batch,
+so the work grows with the export and its date range, not with the history.
+Matches are recorded in the database, so a re-imported or overlapping export
+only matches what is still outstanding.
+"""
+
+import bisect
+import csv
+import hashlib
+import io
+import os
+import re
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+from asic_batch.money import amount_to_cents
+from asic_batch.storage import (
+    get_unreconciled_statements,
+    save_bank_transactions,
+    save_reconciliation_matches,
+)
+
+# Days a debit may appear on the bank statement after its statements were processed
+RECONCILE_WINDOW_DAYS = int(os.getenv("ASIC_RECONCILE_WINDOW_DAYS", "7"))
+
+# Strongest match first
+MATCH_TYPES = ('batch_id', 'reference', 'batch_total', 'amount')
+
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d/%m/%y", "%d-%m-%Y", "%d %b %Y", "%d %B %Y")
+
+# Header names recognised for each column (compared lower-case)
+COLUMN_ALIASES = {
+    'date': ("date", "transaction date", "posted date", "posting date", "value date"),
+    'amount': ("amount", "transaction amount", "amount (aud)", "value"),
+    'debit': ("debit", "debit amount", "debits", "withdrawal", "withdrawals"),
+    'credit': ("credit", "credit amount", "credits", "deposit", "deposits"),
+    'description': ("description", "narrative", "details", "transaction details", "memo", "particulars"),
+}
+
+# CommBank exports have no header: date, amount, description, balance
+HEADERLESS_COLUMNS = {'date': 0, 'amount': 1, 'description': 2}
+
+BATCH_ID_PATTERN = re.compile(r"batch_\d{8}_\d{6}", re.IGNORECASE)
+REFERENCE_PATTERN = re.compile(r"\d{6,}")
+
+def parse_bank_date(value):
+    """A bank export date in any of DATE_FORMATS"""
+    value = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Unrecognised date {value!r}")
+
+def parse_bank_amount(value):
+    """Signed cents from a bank export amount such as '-1,096.85', '(321.00)' or '321.00 DR'"""
+    value = value.strip().replace(" ", "")
+    negative = False
+    if value.startswith("(") and value.endswith(")"):
+        value, negative = value[1:-1], True
+    if value.upper().endswith(("DR", "CR")):
+        value, negative = value[:-2], value.upper().endswith("DR")
+    cents = amount_to_cents(value)
+    return -abs(cents) if negative else cents
+
+def _find_columns(header):
+    names = [name.strip().lower() for name in header]
+    columns = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        for position, name in enumerate(names):
+            if name in aliases:
+                columns[column] = position
+                break
+    if 'date' not in columns or not ('amount' in columns or 'debit' in columns):
+        raise ValueError(f"Bank CSV header needs a date and an amount or debit column, got {', '.join(header)}")
+    return columns
+
+def read_bank_csv(stream):
+    """Read a bank transaction CSV from a binary or text stream - returns (transactions, skipped)
+    
+    The header is matched against COLUMN_ALIASES, with either a signed amount
+    column or separate debit and credit columns; a file whose first row
+    already holds a date is read as a headerless CommBank export.
+    transactions are dicts with 'row' (the CSV line), 'date', 'amount_cents'
+    (negative for debits), 'description' and a 'row_hash' identifying the
+    transaction across imports. skipped lists (row, reason) for rows that
+    could not be read. Raises ValueError for an unrecognised header.
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(stream)
+    
+    transactions = []
+    skipped = []
+    occurrences = Counter()
+    columns = None
+    for row_number, row in enumerate(reader, 1):
+        if not any(cell.strip() for cell in row):
+            continue
+        if columns is None:
+            try:
+                parse_bank_date(row[0])
+                columns = HEADERLESS_COLUMNS
+            except ValueError:
+                columns = _find_columns(row)
+                continue
+        
+        try:
+            transaction_date = parse_bank_date(row[columns['date']])
+            if 'amount' in columns and row[columns['amount']].strip():
+                amount_cents = parse_bank_amount(row[columns['amount']])
+            else:
+                debit = row[columns['debit']].strip() if 'debit' in columns else ""
+                credit = row[columns['credit']].strip() if 'credit' in columns else ""
+                amount_cents = -abs(parse_bank_amount(debit)) if debit else abs(parse_bank_amount(credit or "0"))
+            description = row[columns['description']].strip() if 'description' in columns else ""
+        except (IndexError, ValueError) as e:
+            skipped.append((row_number, str(e) if isinstance(e, ValueError) else "missing columns"))
+            continue
+        
+        # Identical rows in one export are separate transactions
+        key = f"{transaction_date.isoformat()}|{amount_cents}|{description}"
+        occurrences[key] += 1
+        transactions.append({
+            'row': row_number,
+            'date': transaction_date,
+            'amount_cents': amount_cents,
+            'description': description,
+            'row_hash': hashlib.sha256(f"{key}|{occurrences[key]}".encode("utf-8")).hexdigest()
+        })
+    
+    return transactions, skipped
+
+def _processed_day(statement):
+    return date.fromisoformat(statement['processed_date'][:10])
+
+class _CandidateIndex:
+    """Candidates bucketed by key, each bucket sorted by date, for date-window lookups
+    
+    find must be called with dates that never decrease and availability that
+    is never regained: each bucket keeps a start position past the items that
+    have fallen out of the window or been taken, so a lookup does not rescan them.
+    """
+    
+    def __init__(self):
+        self._buckets = {}
+    
+    def add(self, key, day, item):
+        bucket = self._buckets.setdefault(key, [[], [], 0])
+        days, items, _ = bucket
+        position = bisect.bisect_right(days, day)
+        days.insert(position, day)
+        items.insert(position, item)
+    
+    def find(self, key, day, window_days, available):
+        """Earliest available item under key dated from day - window_days to day"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return None
+        days, items, start = bucket
+        start = bisect.bisect_left(days, day - timedelta(days=window_days), lo=start)
+        while start < len(days) and not available(items[start]):
+            start += 1
+        bucket[2] = start
+        if start < len(days) and days[start] <= day:
+            return items[start]
+        return None
+
+def match_transactions(debits, statements, window_days=None):
+    """Match debits to statements with hash lookups - returns [(debit, match_type, statements)]
+    
+    debits are read_bank_csv transactions (negative amounts); statements are
+    get_unreconciled_statements rows. Each statement is matched at most once.
+    Debits are taken in date order and unmatched debits are left out.
+    """
+    window_days = RECONCILE_WINDOW_DAYS if window_days is None else window_days
+    
+    by_reference = _CandidateIndex()
+    by_amount = _CandidateIndex()
+    by_file_total = _CandidateIndex()
+    files_by_batch = defaultdict(list)
+    files = defaultdict(list)
+    for statement in statements:
+        day = _processed_day(statement)
+        statement['cents'] = amount_to_cents(statement['amount'])
+        by_reference.add((statement['bpay_reference'], statement['cents']), day, statement)
+        by_amount.add(statement['cents'], day, statement)
+        files[(statement['batch_id'], statement['aba_filename'])].append(statement)
+    
+    # The statements paid by each ABA file, indexed by the file's total
+    for (batch_id, _), file_statements in files.items():
+        day = min(_processed_day(statement) for statement in file_statements)
+        total_cents = sum(statement['cents'] for statement in file_statements)
+        by_file_total.add(total_cents, day, file_statements)
+        if batch_id:
+            files_by_batch[batch_id.lower()].append((day, total_cents, file_statements))
+    
+    matched_ids = set()
+    
+    def statement_available(statement):
+        return statement['id'] not in matched_ids
+    
+    def file_available(file_statements):
+        return all(statement['id'] not in matched_ids for statement in file_statements)
+    
+    matches = []
+    for debit in sorted(debits, key=lambda transaction: (transaction['date'], transaction['row'])):
+        cents = -debit['amount_cents']
+        day = debit['date']
+        match = None
+        
+        for batch_id in BATCH_ID_PATTERN.findall(debit['description']):
+            batch_files = files_by_batch.get(batch_id.lower(), [])
+            if sum(total for _, total, _ in batch_files) == cents and all(file_available(f) for _, _, f in batch_files):
+                match = ('batch_id', [statement for _, _, f in batch_files for statement in f])
+            else:
+                match = next(
+                    (('batch_id', f) for _, total, f in batch_files if total == cents and file_available(f)),
+                    None
+                )
+            if match:
+                break
+        
+        if match is None:
+            for reference in REFERENCE_PATTERN.findall(debit['description']):
+                statement = by_reference.find((reference, cents), day, window_days, statement_available)
+                if statement is not None:
+                    match = ('reference', [statement])
+                    break
+        
+        if match is None:
+            file_statements = by_file_total.find(cents, day, window_days, file_available)
+            if file_statements is not None:
+                match = ('batch_total', file_statements)
+        
+        if match is None:
+            statement = by_amount.find(cents, day, window_days, statement_available)
+            if statement is not None:
+                match = ('amount', [statement])
+        
+        if match is not None:
+            matched_ids.update(statement['id'] for statement in match[1])
+            matches.append((debit, *match))
+    
+    return matches
+
+def reconcile_bank_csv(stream, window_days=None, import_id=None):
+    """Import a bank CSV, match its debits and record the matches - returns a summary dict
+    
+    The summary has 'import_id', 'transactions' (rows read), 'debits',
+    'already_matched' (debits matched by an earlier import), 'matched' (new
+    matches per match type), 'matched_statements', 'unmatched_debits' (the
+    transactions), 'unmatched_statements' (processed in the export's date
+    range, less the window, yet not matched) and 'skipped' CSV rows. Credits
+    are not imported. Raises ValueError for an unrecognised CSV header.
+    """
+    window_days = RECONCILE_WINDOW_DAYS if window_days is None else window_days
+    import_id = import_id or f"import_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    
+    transactions, skipped = read_bank_csv(stream)
+    debits = [transaction for transaction in transactions if transaction['amount_cents'] < 0]
+    summary = {
+        'import_id': import_id,
+        'transactions': len(transactions),
+        'debits': len(debits),
+        'already_matched': 0,
+        'matched': {match_type: 0 for match_type in MATCH_TYPES},
+        'matched_statements': 0,
+        'unmatched_debits': [],
+        'unmatched_statements': [],
+        'skipped': skipped
+    }
+    if not debits:
+        return summary
+    
+    stored = save_bank_transactions(import_id, debits)
+    outstanding = []
+    for debit in debits:
+        debit['id'], match_type = stored[debit['row_hash']]
+        if match_type is None:
+            outstanding.append(debit)
+        else:
+            summary['already_matched'] += 1
+    
+    first_day = min(debit['date'] for debit in debits)
+    last_day = max(debit['date'] for debit in debits)
+    statements = get_unreconciled_statements(first_day - timedelta(days=window_days), last_day + timedelta(days=1))
+    
+    matches = match_transactions(outstanding, statements, window_days)
+    save_reconciliation_matches([
+        (debit['id'], match_type, [statement['id'] for statement in matched])
+        for debit, match_type, matched in matches
+    ])
+    
+    matched_debits = set()
+    matched_statements = set()
+    for debit, match_type, matched in matches:
+        summary['matched'][match_type] += 1
+        matched_debits.add(debit['id'])
+        matched_statements.update(statement['id'] for statement in matched)
+    summary['matched_statements'] = len(matched_statements)
+    summary['unmatched_debits'] = [debit for debit in outstanding if debit['id'] not in matched_debits]
+    
+    # Statements from before the export's first day could have been paid before it starts
+    summary['unmatched_statements'] = [
+        statement for statement in statements
+        if statement['id'] not in matched_statements and _processed_day(statement) >= first_day
+    ]
+    
+    return summary
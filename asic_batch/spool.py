@@ -0,0 +1,159 @@
+"""Bounded-memory holding area for statements waiting to be extracted
+
+A batch's uploads are kept in memory until they reach a budget; anything past
+it is written to a temp file instead, so a large ZIP or inbox does not have to
+fit in RAM. Content is hashed in chunks as it is spooled, and files already on
+disk are referenced by path rather than read in. Spooled files are released as
+soon as their statement is extracted.
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+# Bytes of uploads a batch keeps in memory before spooling the rest to temp files
+SPOOL_MAX_MEMORY_BYTES = int(os.getenv("ASIC_SPOOL_MAX_MEMORY_MB", "64")) * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def hash_stream(stream, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 a binary stream from the start in chunks - returns (hexdigest, size)
+    
+    The stream position is restored afterwards.
+    """
+    position = stream.tell()
+    stream.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    finally:
+        stream.seek(position)
+    return digest.hexdigest(), size
+
+def hash_path(path, chunk_size=HASH_CHUNK_SIZE):
+    """SHA-256 a file on disk without reading it all into memory - returns (hexdigest, size)"""
+    with open(path, "rb") as f:
+        return hash_stream(f, chunk_size)
+
+class SpooledFile:
+    """One statement's content, held as bytes or in a file on disk
+    
+    Picklable: a worker process receives the bytes, or only the path for
+    content on disk. delete marks temp files the spool owns.
+    """
+    
+    def __init__(self, data=None, path=None, delete=False):
+        self.data = data
+        self.path = path
+        self.delete = delete
+        self.size = len(data) if data is not None else os.path.getsize(path)
+    
+    @classmethod
+    def from_path(cls, path):
+        """Reference an existing file without copying it"""
+        return cls(path=path)
+    
+    def open(self):
+        """A readable binary file object over the content"""
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return open(self.path, "rb")
+    
+    def __len__(self):
+        return self.size
+    
+    def close(self):
+        """Drop the in-memory copy, or remove the temp file"""
+        self.data = None
+        if self.delete and self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+def get_file_hash(file_content):
+    """Generate SHA-256 hash of file content (bytes, or a SpooledFile read in chunks)"""
+    if isinstance(file_content, SpooledFile):
+        with file_content.open() as f:
+            return hash_stream(f)[0]
+    return hashlib.sha256(file_content).hexdigest()
+
+class UploadSpool:
+    """Spools a batch's uploads, keeping at most max_memory_bytes of them in memory"""
+    
+    def __init__(self, max_memory_bytes=None, chunk_size=HASH_CHUNK_SIZE):
+        self.max_memory_bytes = SPOOL_MAX_MEMORY_BYTES if max_memory_bytes is None else max_memory_bytes
+        self.chunk_size = chunk_size
+        self.memory_bytes = 0
+        self.spooled_to_disk = 0
+        self._directory = None
+        self._files = []
+    
+    def add_stream(self, stream, max_size=None):
+        """Copy a binary stream into the spool, hashing it on the way - returns (SpooledFile, hexdigest)
+        
+        Raises ValueError once more than max_size bytes have been read.
+        """
+        digest = hashlib.sha256()
+        chunks = []
+        size = 0
+        temp_file = None
+        try:
+            for chunk in iter(lambda: stream.read(self.chunk_size), b""):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise ValueError(f"larger than {max_size // (1024 * 1024)} MB")
+                digest.update(chunk)
+                
+                if temp_file is None and self.memory_bytes + size > self.max_memory_bytes:
+                    temp_file = self._temp_file()
+                    temp_file.writelines(chunks)
+                    chunks = []
+                if temp_file is None:
+                    chunks.append(chunk)
+                else:
+                    temp_file.write(chunk)
+        except BaseException:
+            if temp_file is not None:
+                temp_file.close()
+                os.remove(temp_file.name)
+            raise
+        
+        if temp_file is None:
+            spooled = SpooledFile(data=b"".join(chunks))
+            self.memory_bytes += spooled.size
+        else:
+            temp_file.close()
+            spooled = SpooledFile(path=temp_file.name, delete=True)
+            self.spooled_to_disk += 1
+        self._files.append(spooled)
+        return spooled, digest.hexdigest()
+    
+    def _temp_file(self):
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="asic_spool_")
+        return tempfile.NamedTemporaryFile(dir=self._directory, suffix=".pdf", delete=False)
+    
+    def release(self, spooled):
+        """Free a spooled file once its statement has been extracted"""
+        if spooled.data is not None and not spooled.delete:
+            self.memory_bytes -= spooled.size
+        spooled.close()
+    
+    def close(self):
+        """Release everything still spooled and remove the temp directory"""
+        for spooled in self._files:
+            if spooled.data is not None or spooled.delete:
+                self.release(spooled)
+        self._files = []
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,1174 @@
+"""SQLite storage for processed statements and the extraction cache
+
+All access goes through a small pool of reusable WAL-mode connections, so a
+large batch or several Streamlit sessions don't open a new connection per
+query. The database file defaults to asic_statements.db next to app.py and
+can be moved with ASIC_DB_PATH or set_database_path().
+
+Statements a session has staged for payment are reserved under leases in
+statement_reservations, so two sessions can't both pay the same statement in
+the minutes between upload and commit.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from asic_batch.money import amount_to_cents
+
+# Statements database - ASIC_DB_PATH overrides the default file next to app.py
+DB_PATH = os.getenv(
+    "ASIC_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "asic_statements.db")
+)
+DB_BUSY_TIMEOUT_MS = int(os.getenv("ASIC_DB_BUSY_TIMEOUT_MS", "15000"))
+DB_POOL_SIZE = int(os.getenv("ASIC_DB_POOL_SIZE", "8"))
+DB_STATEMENT_CACHE_SIZE = 256
+
+# Extraction cache limits (size-based and age-based eviction)
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("ASIC_EXTRACTION_CACHE_MAX_ENTRIES", "20000"))
+EXTRACTION_CACHE_MAX_AGE_DAYS = int(os.getenv("ASIC_EXTRACTION_CACHE_MAX_AGE_DAYS", "400"))
+
+# Seconds a staged statement stays reserved for its session unless renewed
+RESERVATION_LEASE_SECONDS = int(os.getenv("ASIC_RESERVATION_LEASE_SECONDS", "900"))
+
+# Fields extracted from each statement, as stored in the extraction cache
+EXTRACTED_FIELDS = ('company_name', 'acn', 'amount', 'asic_reference', 'bpay_reference')
+
+# SQL statements executed per thread, for stage instrumentation
+_db_stats = threading.local()
+
+def _count_round_trip(statement):
+    _db_stats.round_trips = getattr(_db_stats, 'round_trips', 0) + 1
+
+def get_db_round_trips():
+    """Number of SQL statements this thread has executed (each executemany row counts)"""
+    return getattr(_db_stats, 'round_trips', 0)
+
+# Database connection pool
+class ConnectionPool:
+    """Small pool of reusable SQLite connections to one database file
+    
+    Connections use WAL journaling so readers don't block the writer, and a
+    busy timeout so concurrent sessions wait for a lock instead of failing
+    with 'database is locked'. Reusing connections also keeps each one's
+    prepared statement cache warm.
+    
+    Write transactions in this process take turns on write_lock: SQLite's
+    busy handler retries with growing sleeps, so many sessions contending
+    for the write lock in it leave it idle between retries.
+    """
+    
+    def __init__(self, path, size=DB_POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.write_lock = threading.Lock()
+    
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # a connection is only used by one thread at a time
+            cached_statements=DB_STATEMENT_CACHE_SIZE
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        conn.set_trace_callback(_count_round_trip)
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with block"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        
+        try:
+            yield conn
+        finally:
+            # Never hand the next caller an open transaction
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    @contextmanager
+    def write_connection(self):
+        """Check out a connection for a write transaction, once no other thread here is writing"""
+        with self.write_lock, self.connection() as conn:
+            yield conn
+    
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_connection_pools = {}
+_connection_pools_lock = threading.Lock()
+
+def get_connection_pool(db_path):
+    """Connection pool for a database file, shared by all sessions and reruns"""
+    with _connection_pools_lock:
+        if db_path not in _connection_pools:
+            _connection_pools[db_path] = ConnectionPool(db_path)
+        return _connection_pools[db_path]
+
+def db_connection():
+    """Pooled connection to the statements database (use as a context manager)"""
+    return get_connection_pool(DB_PATH).connection()
+
+def db_write_connection():
+    """Pooled connection for a BEGIN IMMEDIATE write transaction (use as a context manager)"""
+    return get_connection_pool(DB_PATH).write_connection()
+
+def set_database_path(db_path):
+    """Point all database functions at a different SQLite file"""
+    global DB_PATH
+    DB_PATH = db_path
+
+# Database functions
+def init_database():
+    """Initialize SQLite database for tracking processed statements"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS processed_statements (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                company_name TEXT NOT NULL,
+                acn TEXT NOT NULL,
+                asic_reference TEXT NOT NULL,
+                bpay_reference TEXT NOT NULL,
+                amount REAL NOT NULL,
+                file_hash TEXT NOT NULL UNIQUE,
+                processed_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                aba_filename TEXT,
+                batch_id TEXT
+            )
+        ''')
+        
+        # Extracted fields keyed by file hash so re-uploaded PDFs skip parsing
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS extraction_cache (
+                file_hash TEXT PRIMARY KEY,
+                extractor_version INTEGER NOT NULL,
+                company_name TEXT NOT NULL,
+                acn TEXT NOT NULL,
+                amount TEXT NOT NULL,
+                asic_reference TEXT NOT NULL,
+                bpay_reference TEXT NOT NULL,
+                cached_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                backend TEXT
+            )
+        ''')
+        
+        # Caches created before extraction backends were recorded
+        cache_columns = {row[1] for row in cursor.execute("PRAGMA table_info(extraction_cache)")}
+        if 'backend' not in cache_columns:
+            cursor.execute("ALTER TABLE extraction_cache ADD COLUMN backend TEXT")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used
+            ON extraction_cache (last_used_date)
+        ''')
+        
+        # One header row per committed batch / ABA file
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                aba_filename TEXT NOT NULL,
+                statement_count INTEGER NOT NULL,
+                total_cents INTEGER NOT NULL,
+                record_count INTEGER NOT NULL,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # One row per ABA file of a batch - large batches are split across several
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS batch_shards (
+                batch_id TEXT NOT NULL,
+                shard_number INTEGER NOT NULL,
+                aba_filename TEXT NOT NULL,
+                statement_count INTEGER NOT NULL,
+                total_cents INTEGER NOT NULL,
+                record_count INTEGER NOT NULL,
+                aba_sha256 TEXT,
+                PRIMARY KEY (batch_id, shard_number)
+            )
+        ''')
+        
+        # Payment duplicate lookups - also added to databases created before the index existed
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_processed_statements_payment
+            ON processed_statements (asic_reference, bpay_reference)
+        ''')
+        
+        # History paging (newest first)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_processed_statements_history
+            ON processed_statements (processed_date, id)
+        ''')
+        
+        # Covering indexes for the analytics summaries (month, company, batch
+        # and fee totals), so each GROUP BY reads one index and not the table.
+        # The company and batch indexes lead with acn and batch_id, so they also
+        # serve the history's exact-match filters and batch lookups, which had
+        # single-column indexes of their own in older databases
+        for redundant_index in ("idx_processed_statements_batch", "idx_processed_statements_acn"):
+            cursor.execute(f"DROP INDEX IF EXISTS {redundant_index}")
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_processed_statements_month
+            ON processed_statements (substr(processed_date, 1, 7), processed_date, amount)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_processed_statements_company
+            ON processed_statements (acn, company_name, amount, processed_date)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_processed_statements_batch_totals
+            ON processed_statements (batch_id, processed_date, amount)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_processed_statements_fee
+            ON processed_statements (amount, processed_date)
+        ''')
+        
+        # Debits imported from bank CSV exports for reconciliation; row_hash
+        # stops a re-imported export from adding the same transaction twice
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bank_transactions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                row_hash TEXT NOT NULL UNIQUE,
+                transaction_date DATE NOT NULL,
+                amount_cents INTEGER NOT NULL,
+                description TEXT NOT NULL,
+                import_id TEXT NOT NULL,
+                match_type TEXT,
+                imported_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_bank_transactions_date
+            ON bank_transactions (transaction_date)
+        ''')
+        
+        # The bank transaction each reconciled statement was paid by
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS statement_reconciliation (
+                statement_id INTEGER PRIMARY KEY,
+                transaction_id INTEGER NOT NULL,
+                match_type TEXT NOT NULL,
+                reconciled_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_statement_reconciliation_transaction
+            ON statement_reconciliation (transaction_id)
+        ''')
+        
+        # Leases on staged statements - one row per file hash and per
+        # payment, so a re-scan of a reserved statement is caught as well
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS statement_reservations (
+                claim_key TEXT PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                reserved_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_statement_reservations_session
+            ON statement_reservations (session_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_statement_reservations_expiry
+            ON statement_reservations (expires_at)
+        ''')
+        
+        conn.commit()
+
+def check_duplicate_statement(file_hash, asic_reference, bpay_reference):
+    """Check if statement has already been processed"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Check by file hash first (exact same file)
+        cursor.execute('''
+            SELECT company_name, processed_date, aba_filename
+            FROM processed_statements
+            WHERE file_hash = ?
+        ''', (file_hash,))
+        
+        file_duplicate = cursor.fetchone()
+        
+        # Check by ASIC reference and BPay reference (same payment)
+        cursor.execute('''
+            SELECT company_name, processed_date, aba_filename
+            FROM processed_statements
+            WHERE asic_reference = ? AND bpay_reference = ?
+        ''', (asic_reference, bpay_reference))
+        
+        payment_duplicate = cursor.fetchone()
+    
+    return {
+        'file_duplicate': file_duplicate,
+        'payment_duplicate': payment_duplicate
+    }
+
+def check_duplicate_statements(statements):
+    """Check a whole upload for duplicates with set-based queries
+    
+    statements is a list of (file_hash, asic_reference, bpay_reference) tuples.
+    Returns one dict per statement, in order, with 'file_duplicate' and
+    'payment_duplicate' as check_duplicate_statement does, plus
+    'upload_duplicate' - the index of an earlier statement in the same upload
+    with the same file or the same payment, or None.
+    """
+    statements = list(statements)
+    results = [
+        {'file_duplicate': None, 'payment_duplicate': None, 'upload_duplicate': None}
+        for _ in statements
+    ]
+    if not statements:
+        return results
+    
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Stage the upload in a temp table and join it against the history
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS upload_check (
+                position INTEGER PRIMARY KEY,
+                file_hash TEXT NOT NULL,
+                asic_reference TEXT NOT NULL,
+                bpay_reference TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('DELETE FROM upload_check')
+        cursor.executemany('''
+            INSERT INTO upload_check (position, file_hash, asic_reference, bpay_reference)
+            VALUES (?, ?, ?, ?)
+        ''', [(position, *statement) for position, statement in enumerate(statements)])
+        
+        # Exact same file (UNIQUE file_hash index)
+        cursor.execute('''
+            SELECT u.position, p.company_name, p.processed_date, p.aba_filename
+            FROM upload_check u
+            JOIN processed_statements p ON p.file_hash = u.file_hash
+        ''')
+        for position, *match in cursor.fetchall():
+            results[position]['file_duplicate'] = tuple(match)
+        
+        # Same payment (composite asic_reference, bpay_reference index)
+        cursor.execute('''
+            SELECT u.position, p.company_name, p.processed_date, p.aba_filename
+            FROM upload_check u
+            JOIN processed_statements p
+              ON p.asic_reference = u.asic_reference AND p.bpay_reference = u.bpay_reference
+            ORDER BY u.position, p.id
+        ''')
+        for position, *match in cursor.fetchall():
+            if results[position]['payment_duplicate'] is None:
+                results[position]['payment_duplicate'] = tuple(match)
+        
+        cursor.execute('DELETE FROM upload_check')
+        conn.commit()
+    
+    for result, earlier in zip(results, find_upload_duplicates(statements)):
+        result['upload_duplicate'] = earlier
+    
+    return results
+
+def find_upload_duplicates(statements):
+    """Index of an earlier statement in the same upload with the same file or payment, or None, per statement"""
+    first_by_hash = {}
+    first_by_payment = {}
+    earliest = []
+    for position, (file_hash, asic_reference, bpay_reference) in enumerate(statements):
+        earlier = first_by_hash.setdefault(file_hash, position)
+        if earlier == position and asic_reference and bpay_reference:
+            earlier = first_by_payment.setdefault((asic_reference, bpay_reference), position)
+        earliest.append(earlier if earlier != position else None)
+    return earliest
+
+def iter_duplicate_keys(after_id=0, chunk_size=50000):
+    """Yield (id, file_hash, asic_reference, bpay_reference) rows after an id, in id order, a chunk at a time"""
+    while True:
+        with db_connection() as conn:
+            rows = conn.execute('''
+                SELECT id, file_hash, asic_reference, bpay_reference
+                FROM processed_statements
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (after_id, chunk_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+def save_processed_statement(asic_data, file_hash, aba_filename, batch_id):
+    """Save processed statement to database"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT INTO processed_statements
+                (company_name, acn, asic_reference, bpay_reference, amount, file_hash, aba_filename, batch_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                asic_data['company_name'],
+                asic_data['acn'],
+                asic_data['asic_reference'],
+                asic_data['bpay_reference'],
+                float(asic_data['amount']),
+                file_hash,
+                aba_filename,
+                batch_id
+            ))
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+def _claim_keys(file_hash, asic_reference, bpay_reference):
+    """The statement_reservations keys a statement is claimed under"""
+    keys = [f"file:{file_hash}"]
+    if asic_reference and bpay_reference:
+        keys.append(f"payment:{asic_reference}|{bpay_reference}")
+    return keys
+
+def reserve_statements(session_id, statements, lease_seconds=None, now=None):
+    """Reserve the statements a session has staged for payment
+    
+    statements is a list of (file_hash, asic_reference, bpay_reference)
+    tuples, as for check_duplicate_statements. Each statement is claimed by
+    its file hash and by its payment in one write transaction, so of two
+    sessions staging the same statement - or two scans of it - only one gets
+    it. The session's leases are set to expire lease_seconds from now and
+    anything else it held is released, so calling this again with the
+    session's current statements renews them. Expired leases are cleared.
+    
+    Returns one entry per statement, in order: None when the session now
+    holds it, else a dict with the holding session's 'session_id' and
+    'expires_at' (Unix time). A statement is claimed whole or not at all.
+    """
+    lease_seconds = RESERVATION_LEASE_SECONDS if lease_seconds is None else lease_seconds
+    now = time.time() if now is None else now
+    statements = list(statements)
+    claims = [
+        (position, key)
+        for position, statement in enumerate(statements)
+        for key in _claim_keys(*statement)
+    ]
+    results = [None] * len(statements)
+    
+    with db_write_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS reservation_claims (
+                position INTEGER NOT NULL,
+                claim_key TEXT NOT NULL
+            )
+        ''')
+        
+        # One short write transaction per call, so many sessions can stage
+        # and renew at once without holding the write lock for long
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('DELETE FROM reservation_claims')
+            cursor.executemany('''
+                INSERT INTO reservation_claims (position, claim_key) VALUES (?, ?)
+            ''', claims)
+            
+            cursor.execute('DELETE FROM statement_reservations WHERE expires_at <= ?', (now,))
+            cursor.execute('''
+                DELETE FROM statement_reservations
+                WHERE session_id = ? AND claim_key NOT IN (SELECT claim_key FROM reservation_claims)
+            ''', (session_id,))
+            
+            # Claim free keys and renew the session's own; keys held by
+            # another session are left alone
+            cursor.execute('''
+                INSERT INTO statement_reservations (claim_key, session_id, expires_at)
+                SELECT DISTINCT claim_key, ?, ? FROM reservation_claims WHERE true
+                ON CONFLICT (claim_key) DO UPDATE SET expires_at = excluded.expires_at
+                WHERE session_id = excluded.session_id
+            ''', (session_id, now + lease_seconds))
+            
+            cursor.execute('''
+                SELECT c.position, r.session_id, r.expires_at
+                FROM reservation_claims c
+                JOIN statement_reservations r ON r.claim_key = c.claim_key
+                WHERE r.session_id != ?
+            ''', (session_id,))
+            for position, holder, expires_at in cursor.fetchall():
+                results[position] = {'session_id': holder, 'expires_at': expires_at}
+            
+            # Give back the other key of any statement held elsewhere
+            held = {key for position, key in claims if results[position] is None}
+            released = {key for position, key in claims if results[position] is not None} - held
+            cursor.executemany('''
+                DELETE FROM statement_reservations WHERE claim_key = ? AND session_id = ?
+            ''', [(key, session_id) for key in released])
+            
+            cursor.execute('DELETE FROM reservation_claims')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    
+    return results
+
+def release_reservations(session_id):
+    """Drop every lease a session holds - returns how many were released"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM statement_reservations WHERE session_id = ?', (session_id,))
+        conn.commit()
+        return cursor.rowcount
+
+def new_batch_id():
+    """Batch id from the current time plus a random suffix, so batches committed in the same second don't collide"""
+    return f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+def commit_batch(batch_id, aba_filename, statements, record_count=None, shards=None, session_id=None):
+    """Record a generated batch and all of its statements in one transaction
+    
+    statements are asic_data dicts including 'file_hash'. Either every
+    statement and the batch header row are saved, or nothing is: if any
+    statement's file_hash or payment (asic_reference and bpay_reference) is
+    already in processed_statements, appears twice in the batch, or is
+    reserved by a session other than session_id under an unexpired lease, the
+    transaction is rolled back. The leases on committed statements are
+    released. record_count defaults to one ABA detail record per statement
+    plus the balancing debit.
+    
+    A batch split across several ABA files passes shards - one dict per file
+    with 'aba_filename', 'statements', 'record_count' and optionally 'sha256' -
+    and aba_filename then names the batch's manifest. Each statement is
+    recorded against the file it was paid in, and a batch_shards row is
+    written per file (a single row for an unsplit batch).
+    
+    Returns a dict with 'committed', 'saved_count', 'conflicts' - the
+    statements that conflicted - and 'error', set when the batch itself could
+    not be recorded (e.g. batch_id is already taken) and None otherwise.
+    """
+    if shards is None:
+        statements = list(statements)
+        shards = [{
+            'aba_filename': aba_filename,
+            'statements': statements,
+            'record_count': len(statements) + 1 if record_count is None else record_count
+        }]
+    else:
+        statements = [asic_data for shard in shards for asic_data in shard['statements']]
+    if record_count is None:
+        record_count = sum(shard['record_count'] for shard in shards)
+    total_cents = sum(amount_to_cents(asic_data['amount']) for asic_data in statements)
+    
+    with db_write_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Take the write lock up front so no other session can commit the
+        # same statements between the conflict check and the insert
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            seen = set()
+            repeated = set()
+            for asic_data in statements:
+                if asic_data['file_hash'] in seen:
+                    repeated.add(asic_data['file_hash'])
+                seen.add(asic_data['file_hash'])
+            
+            file_hashes = list(seen)
+            existing = set()
+            for start in range(0, len(file_hashes), 500):
+                chunk = file_hashes[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(f'''
+                    SELECT file_hash FROM processed_statements
+                    WHERE file_hash IN ({placeholders})
+                ''', chunk)
+                existing.update(row[0] for row in cursor.fetchall())
+            
+            # The same payment from a different scan of the statement
+            seen_payments = set()
+            for asic_data in statements:
+                payment = (asic_data['asic_reference'], asic_data['bpay_reference'])
+                if all(payment) and payment in seen_payments:
+                    repeated.add(payment)
+                seen_payments.add(payment)
+            
+            payments = [payment for payment in seen_payments if all(payment)]
+            for start in range(0, len(payments), 250):
+                chunk = payments[start:start + 250]
+                values = ", ".join(["(?, ?)"] * len(chunk))
+                cursor.execute(f'''
+                    WITH batch (asic_reference, bpay_reference) AS (VALUES {values})
+                    SELECT p.asic_reference, p.bpay_reference
+                    FROM batch
+                    JOIN processed_statements p
+                      ON p.asic_reference = batch.asic_reference AND p.bpay_reference = batch.bpay_reference
+                ''', [value for payment in chunk for value in payment])
+                existing.update(cursor.fetchall())
+            
+            # Statements staged by another session that still holds the lease
+            claim_keys = {
+                id(asic_data): _claim_keys(asic_data['file_hash'], asic_data['asic_reference'], asic_data['bpay_reference'])
+                for asic_data in statements
+            }
+            keys = list({key for keys in claim_keys.values() for key in keys})
+            leased = set()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(f'''
+                    SELECT claim_key FROM statement_reservations
+                    WHERE claim_key IN ({placeholders}) AND expires_at > ? AND session_id IS NOT ?
+                ''', [*chunk, time.time(), session_id])
+                leased.update(row[0] for row in cursor.fetchall())
+            
+            conflicts = [
+                asic_data for asic_data in statements
+                if asic_data['file_hash'] in existing or asic_data['file_hash'] in repeated
+                or (asic_data['asic_reference'], asic_data['bpay_reference']) in existing
+                or (asic_data['asic_reference'], asic_data['bpay_reference']) in repeated
+                or any(key in leased for key in claim_keys[id(asic_data)])
+            ]
+            if conflicts:
+                conn.rollback()
+                return {'committed': False, 'saved_count': 0, 'conflicts': conflicts, 'error': None}
+            
+            try:
+                _insert_batch(cursor, batch_id, aba_filename, statements, shards, total_cents, record_count)
+            except sqlite3.IntegrityError as e:
+                conn.rollback()
+                return {'committed': False, 'saved_count': 0, 'conflicts': [], 'error': f"could not record batch {batch_id}: {e}"}
+            
+            # Processed statements are caught by the duplicate checks from now on
+            cursor.executemany('''
+                DELETE FROM statement_reservations WHERE claim_key = ?
+            ''', [(key,) for key in keys])
+            
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    
+    return {'committed': True, 'saved_count': len(statements), 'conflicts': [], 'error': None}
+
+def _insert_batch(cursor, batch_id, aba_filename, statements, shards, total_cents, record_count):
+    """Insert a batch's header, shard and statement rows"""
+    cursor.execute('''
+        INSERT INTO batches (batch_id, aba_filename, statement_count, total_cents, record_count)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (batch_id, aba_filename, len(statements), total_cents, record_count))
+    
+    cursor.executemany('''
+        INSERT INTO batch_shards
+        (batch_id, shard_number, aba_filename, statement_count, total_cents, record_count, aba_sha256)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (
+            batch_id,
+            shard_number,
+            shard['aba_filename'],
+            len(shard['statements']),
+            sum(amount_to_cents(asic_data['amount']) for asic_data in shard['statements']),
+            shard['record_count'],
+            shard.get('sha256')
+        )
+        for shard_number, shard in enumerate(shards, 1)
+    ])
+    
+    cursor.executemany('''
+        INSERT INTO processed_statements
+        (company_name, acn, asic_reference, bpay_reference, amount, file_hash, aba_filename, batch_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (
+            asic_data['company_name'],
+            asic_data['acn'],
+            asic_data['asic_reference'],
+            asic_data['bpay_reference'],
+            float(asic_data['amount']),
+            asic_data['file_hash'],
+            shard['aba_filename'],
+            batch_id
+        )
+        for shard in shards
+        for asic_data in shard['statements']
+    ])
+
+def get_batch_manifest(batch_id):
+    """The ABA files of a committed batch and the statements paid in each, or None
+    
+    Returns a dict with the batch's 'batch_id', 'aba_filename', 'statement_count',
+    'total_cents', 'record_count' and 'created_date', and 'shards' - per file its
+    'shard_number', 'aba_filename', 'statement_count', 'total_cents',
+    'record_count', 'sha256' and the 'file_hashes' of its statements.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT batch_id, aba_filename, statement_count, total_cents, record_count, created_date
+            FROM batches
+            WHERE batch_id = ?
+        ''', (batch_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        manifest = dict(zip(
+            ('batch_id', 'aba_filename', 'statement_count', 'total_cents', 'record_count', 'created_date'), row
+        ))
+        
+        cursor.execute('''
+            SELECT shard_number, aba_filename, statement_count, total_cents, record_count, aba_sha256
+            FROM batch_shards
+            WHERE batch_id = ?
+            ORDER BY shard_number
+        ''', (batch_id,))
+        manifest['shards'] = [
+            dict(zip(('shard_number', 'aba_filename', 'statement_count', 'total_cents', 'record_count', 'sha256'), row))
+            for row in cursor.fetchall()
+        ]
+        if not manifest['shards']:
+            # Batches committed before shards were recorded had a single ABA file
+            manifest['shards'] = [{
+                'shard_number': 1,
+                **{key: manifest[key] for key in ('aba_filename', 'statement_count', 'total_cents', 'record_count')},
+                'sha256': None
+            }]
+        
+        cursor.execute('''
+            SELECT aba_filename, file_hash
+            FROM processed_statements
+            WHERE batch_id = ?
+            ORDER BY id
+        ''', (batch_id,))
+        file_hashes = {}
+        for aba_filename, file_hash in cursor.fetchall():
+            file_hashes.setdefault(aba_filename, []).append(file_hash)
+        for shard in manifest['shards']:
+            shard['file_hashes'] = file_hashes.get(shard['aba_filename'], [])
+        
+        return manifest
+
+def get_processed_statements():
+    """Get all processed statements from database"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT company_name, acn, asic_reference, amount, processed_date, aba_filename
+            FROM processed_statements
+            ORDER BY processed_date DESC
+        ''')
+        
+        return cursor.fetchall()
+
+def _processed_date_conditions(date_from, date_to):
+    """WHERE conditions and parameters for an inclusive range of processed dates"""
+    conditions = []
+    params = []
+    if date_from:
+        conditions.append("processed_date >= ?")
+        params.append(date_from.strftime("%Y-%m-%d"))
+    if date_to:
+        conditions.append("processed_date < ?")
+        params.append((date_to + timedelta(days=1)).strftime("%Y-%m-%d"))
+    return conditions, params
+
+# Columns returned for each row of statement history
+HISTORY_COLUMNS = (
+    'id', 'company_name', 'acn', 'asic_reference', 'bpay_reference',
+    'amount', 'processed_date', 'aba_filename', 'batch_id'
+)
+
+def get_statement_history(limit=25, cursor=None, company_name=None, acn=None,
+                          asic_reference=None, batch_id=None, date_from=None, date_to=None):
+    """Get one page of processed statements, newest first
+    
+    Uses keyset pagination on (processed_date, id): pass the returned
+    next_cursor back in to get the following page, so each page costs the same
+    no matter how deep into the history it is. company_name matches any part of
+    the name (case-insensitive); acn, asic_reference and batch_id match
+    exactly; date_from and date_to are inclusive dates.
+    
+    Returns (rows, next_cursor) where rows are dicts of HISTORY_COLUMNS and
+    next_cursor is None on the last page.
+    """
+    conditions = []
+    params = []
+    
+    if cursor is not None:
+        conditions.append("(processed_date, id) < (?, ?)")
+        params.extend(cursor)
+    if company_name:
+        conditions.append("company_name LIKE ?")
+        params.append(f"%{company_name.strip()}%")
+    if acn:
+        conditions.append("acn = ?")
+        params.append(acn.replace(" ", ""))
+    if asic_reference:
+        conditions.append("asic_reference = ?")
+        params.append(asic_reference.replace(" ", "").upper())
+    if batch_id:
+        conditions.append("batch_id = ?")
+        params.append(batch_id.strip())
+    date_conditions, date_params = _processed_date_conditions(date_from, date_to)
+    conditions.extend(date_conditions)
+    params.extend(date_params)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    with db_connection() as conn:
+        # Fetch one extra row to know whether another page follows
+        rows = conn.execute(f'''
+            SELECT {", ".join(HISTORY_COLUMNS)}
+            FROM processed_statements
+            {where}
+            ORDER BY processed_date DESC, id DESC
+            LIMIT ?
+        ''', (*params, limit + 1)).fetchall()
+    
+    rows = [dict(zip(HISTORY_COLUMNS, row)) for row in rows]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1]['processed_date'], rows[-1]['id'])
+    
+    return rows, next_cursor
+
+# Analytics functions
+# Statement amounts summed as exact integer cents
+_SUM_CENTS = "SUM(CAST(ROUND(amount * 100) AS INTEGER))"
+
+# Ways get_payment_summary can group statements, and the columns of each row
+SUMMARY_GROUPINGS = {
+    'month': ('month', 'statement_count', 'total_cents'),
+    'company': ('acn', 'company_name', 'statement_count', 'total_cents', 'last_processed'),
+    'batch': ('batch_id', 'processed_date', 'statement_count', 'total_cents', 'file_count'),
+    'fee': ('amount_cents', 'statement_count', 'total_cents'),
+}
+
+def get_statements_version():
+    """Newest processed statement id - changes whenever a batch is committed, so it keys cached summaries"""
+    with db_connection() as conn:
+        return conn.execute("SELECT MAX(id) FROM processed_statements").fetchone()[0] or 0
+
+def get_payment_summary(group_by, date_from=None, date_to=None, limit=None):
+    """Aggregate processed statements by month, company, batch or fee amount
+    
+    The totals are computed in SQLite with GROUP BY over a covering index for
+    each grouping, so only the summary rows reach Python however long the
+    history is. date_from and date_to are inclusive dates. Months come oldest
+    first, fee amounts most common first, companies by total paid and batches
+    newest first; limit keeps the first rows of that order.
+    
+    Returns dicts of the grouping's SUMMARY_GROUPINGS columns, with money as
+    integer cents.
+    """
+    if group_by not in SUMMARY_GROUPINGS:
+        raise ValueError(f"Unknown grouping: {group_by!r}")
+    
+    conditions, params = _processed_date_conditions(date_from, date_to)
+    if group_by == 'month':
+        # Also bound the month itself, so the range seeks idx_processed_statements_month
+        if date_from:
+            conditions.append("substr(processed_date, 1, 7) >= ?")
+            params.append(date_from.strftime("%Y-%m"))
+        if date_to:
+            conditions.append("substr(processed_date, 1, 7) <= ?")
+            params.append(date_to.strftime("%Y-%m"))
+    elif group_by == 'batch':
+        # Statements saved before batches were recorded have no batch_id
+        conditions.append("batch_id IS NOT NULL")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    queries = {
+        'month': f'''
+            SELECT substr(processed_date, 1, 7), COUNT(*), {_SUM_CENTS}
+            FROM processed_statements
+            {where}
+            GROUP BY substr(processed_date, 1, 7)
+            ORDER BY substr(processed_date, 1, 7)
+        ''',
+        'company': f'''
+            SELECT acn, MAX(company_name), COUNT(*), {_SUM_CENTS}, MAX(processed_date)
+            FROM processed_statements
+            {where}
+            GROUP BY acn
+            ORDER BY 4 DESC, acn
+        ''',
+        'batch': f'''
+            SELECT batch_id, MIN(processed_date), COUNT(*), {_SUM_CENTS},
+                   MAX(1, (SELECT COUNT(*) FROM batch_shards s WHERE s.batch_id = processed_statements.batch_id))
+            FROM processed_statements
+            {where}
+            GROUP BY batch_id
+            ORDER BY 2 DESC, batch_id DESC
+        ''',
+        'fee': f'''
+            SELECT CAST(ROUND(amount * 100) AS INTEGER), COUNT(*), {_SUM_CENTS}
+            FROM processed_statements
+            {where}
+            GROUP BY amount
+            ORDER BY 2 DESC, 1
+        ''',
+    }
+    query = queries[group_by]
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    
+    with db_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+    
+    return [dict(zip(SUMMARY_GROUPINGS[group_by], row)) for row in rows]
+
+def get_payment_totals(date_from=None, date_to=None):
+    """Headline totals for processed statements in an inclusive date range
+    
+    Returns a dict of statement_count, total_cents, company_count,
+    batch_count, first_processed and last_processed (None when no
+    statements are in the range).
+    """
+    conditions, params = _processed_date_conditions(date_from, date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    with db_connection() as conn:
+        statement_count, total_cents, first_processed, last_processed = conn.execute(f'''
+            SELECT COUNT(*), COALESCE({_SUM_CENTS}, 0), MIN(processed_date), MAX(processed_date)
+            FROM processed_statements
+            {where}
+        ''', params).fetchone()
+        company_count = conn.execute(f'''
+            SELECT COUNT(DISTINCT acn) FROM processed_statements {where}
+        ''', params).fetchone()[0]
+        batch_count = conn.execute(f'''
+            SELECT COUNT(DISTINCT batch_id) FROM processed_statements {where}
+        ''', params).fetchone()[0]
+    
+    return {
+        'statement_count': statement_count,
+        'total_cents': total_cents,
+        'company_count': company_count,
+        'batch_count': batch_count,
+        'first_processed': first_processed,
+        'last_processed': last_processed
+    }
+
+def iter_statement_rows(date_from=None, date_to=None, chunk_size=10000):
+    """Yield processed statements in chunks of at most chunk_size rows, oldest first
+    
+    Each chunk is a separate keyset-paged query on (processed_date, id), so
+    an export holds one chunk in memory and no read transaction stays open
+    between chunks. Rows are tuples of HISTORY_COLUMNS with the amount as a
+    two-decimal string.
+    """
+    conditions, params = _processed_date_conditions(date_from, date_to)
+    columns = ", ".join("printf('%.2f', amount)" if column == 'amount' else column for column in HISTORY_COLUMNS)
+    position = None
+    
+    while True:
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if position is not None:
+            page_conditions.append("(processed_date, id) > (?, ?)")
+            page_params.extend(position)
+        where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+        
+        with db_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {columns}
+                FROM processed_statements
+                {where}
+                ORDER BY processed_date, id
+                LIMIT ?
+            ''', (*page_params, chunk_size)).fetchall()
+        
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        position = (rows[-1][HISTORY_COLUMNS.index('processed_date')], rows[-1][0])
+
+# Reconciliation functions
+def save_bank_transactions(import_id, transactions):
+    """Store imported bank transactions, skipping any already imported
+    
+    transactions are dicts with 'row_hash', 'date' (a date), 'amount_cents'
+    and 'description'. Returns a dict of row_hash -> (id, match_type) for
+    every transaction given, including those from earlier imports, whose
+    match_type may already be set.
+    """
+    transactions = list(transactions)
+    if not transactions:
+        return {}
+    
+    stored = {}
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT OR IGNORE INTO bank_transactions
+            (row_hash, transaction_date, amount_cents, description, import_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (transaction['row_hash'], transaction['date'].isoformat(), transaction['amount_cents'], transaction['description'], import_id)
+            for transaction in transactions
+        ])
+        
+        row_hashes = [transaction['row_hash'] for transaction in transactions]
+        for start in range(0, len(row_hashes), 500):
+            chunk = row_hashes[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f'''
+                SELECT row_hash, id, match_type FROM bank_transactions
+                WHERE row_hash IN ({placeholders})
+            ''', chunk)
+            for row_hash, transaction_id, match_type in cursor.fetchall():
+                stored[row_hash] = (transaction_id, match_type)
+        
+        conn.commit()
+    
+    return stored
+
+def get_unreconciled_statements(date_from, date_to):
+    """Statements processed on or after date_from and before date_to that no bank transaction has matched yet
+    
+    Uses the processed_date index, so only the window being reconciled is
+    read however long the history is. Returns dicts of HISTORY_COLUMNS,
+    oldest first.
+    """
+    with db_connection() as conn:
+        rows = conn.execute(f'''
+            SELECT {", ".join("p." + column for column in HISTORY_COLUMNS)}
+            FROM processed_statements p
+            WHERE p.processed_date >= ? AND p.processed_date < ?
+              AND NOT EXISTS (SELECT 1 FROM statement_reconciliation r WHERE r.statement_id = p.id)
+            ORDER BY p.processed_date, p.id
+        ''', (date_from.strftime("%Y-%m-%d"), date_to.strftime("%Y-%m-%d"))).fetchall()
+    
+    return [dict(zip(HISTORY_COLUMNS, row)) for row in rows]
+
+def save_reconciliation_matches(matches):
+    """Record matches in one transaction - matches are (transaction_id, match_type, statement_ids) tuples"""
+    if not matches:
+        return
+    
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            UPDATE bank_transactions SET match_type = ? WHERE id = ?
+        ''', [(match_type, transaction_id) for transaction_id, match_type, _ in matches])
+        cursor.executemany('''
+            INSERT OR REPLACE INTO statement_reconciliation (statement_id, transaction_id, match_type)
+            VALUES (?, ?, ?)
+        ''', [
+            (statement_id, transaction_id, match_type)
+            for transaction_id, match_type, statement_ids in matches
+            for statement_id in statement_ids
+        ])
+        conn.commit()
+
+# Extraction cache functions
+def get_cached_extractions(file_hashes, extractor_version):
+    """Get cached extraction results for the given file hashes
+    
+    Returns a dict of file_hash -> (extracted fields, backend name) for hashes
+    cached by extractor_version, and marks those entries as recently used.
+    """
+    file_hashes = list(dict.fromkeys(file_hashes))
+    if not file_hashes:
+        return {}
+    
+    cached = {}
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Chunk the IN list to stay under SQLite's host parameter limit
+        for start in range(0, len(file_hashes), 500):
+            chunk = file_hashes[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f'''
+                SELECT file_hash, company_name, acn, amount, asic_reference, bpay_reference, backend
+                FROM extraction_cache
+                WHERE extractor_version = ? AND file_hash IN ({placeholders})
+            ''', (extractor_version, *chunk))
+            
+            for row in cursor.fetchall():
+                cached[row[0]] = (dict(zip(EXTRACTED_FIELDS, row[1:-1])), row[-1])
+        
+        if cached:
+            cursor.executemany('''
+                UPDATE extraction_cache SET last_used_date = CURRENT_TIMESTAMP
+                WHERE file_hash = ?
+            ''', [(file_hash,) for file_hash in cached])
+            conn.commit()
+    
+    return cached
+
+def save_cached_extractions(extractions, extractor_version):
+    """Store extracted fields in the cache - extractions maps file_hash -> (asic_data, backend name)"""
+    if not extractions:
+        return
+    
+    with db_connection() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO extraction_cache
+            (file_hash, extractor_version, company_name, acn, amount, asic_reference, bpay_reference, backend)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (file_hash, extractor_version, *(asic_data[field] for field in EXTRACTED_FIELDS), backend)
+            for file_hash, (asic_data, backend) in extractions.items()
+        ])
+        conn.commit()
+
+def evict_extraction_cache(extractor_version, max_entries=None, max_age_days=None):
+    """Remove outdated, expired and least recently used extraction cache entries"""
+    if max_entries is None:
+        max_entries = EXTRACTION_CACHE_MAX_ENTRIES
+    if max_age_days is None:
+        max_age_days = EXTRACTION_CACHE_MAX_AGE_DAYS
+    
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Results from an older extractor will never be served again
+        cursor.execute('''
+            DELETE FROM extraction_cache WHERE extractor_version != ?
+        ''', (extractor_version,))
+        
+        # Age-based eviction
+        cursor.execute('''
+            DELETE FROM extraction_cache
+            WHERE last_used_date < datetime('now', ?)
+        ''', (f"-{max_age_days} days",))
+        
+        # Size-based eviction - keep the most recently used entries
+        cursor.execute('''
+            DELETE FROM extraction_cache
+            WHERE file_hash IN (
+                SELECT file_hash FROM extraction_cache
+                ORDER BY last_used_date DESC
+                LIMIT -1 OFFSET ?
+            )
+        ''', (max_entries,))
+        
+        conn.commit()
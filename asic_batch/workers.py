@@ -0,0 +1,22 @@
+"""Worker processes shared by batch extraction and ABA writing"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+def get_worker_count():
+    """Number of worker processes for batch extraction and ABA writing (ASIC_EXTRACTION_WORKERS overrides)"""
+    configured = os.getenv("ASIC_EXTRACTION_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    return os.cpu_count() or 1
+
+def process_pool(max_workers):
+    """Process pool for extraction or ABA writing, with workers started by spawn
+    
+    The app starts pools from a thread of the multi-threaded Streamlit server,
+    and a forked worker would inherit pooled SQLite connections and any lock
+    another thread held at that moment. Spawned workers start a fresh interpreter
+    and import only what the function they run needs.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
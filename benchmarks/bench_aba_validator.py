@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Benchmark: validating and parsing a large ABA file
+
+Writes an ABA file with write_aba_file, then times validate_aba_file over it
+and, for comparison, reading every record into fields with iter_aba_records.
+Run from the repository root:
+    
+    python benchmarks/bench_aba_validator.py
+    python benchmarks/bench_aba_validator.py --payments 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asic_batch.aba import write_aba_file
+from asic_batch.aba_validator import iter_aba_records, validate_aba_file
+
+def payments(count):
+    for index in range(count):
+        # Small amounts so even a large file's total fits the trailer fields
+        yield {'amount': f"{index % 90 + 1}.{index % 100:02d}", 'bpay_reference': f"{index:013d}"}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=500_000, help="Credit records in the file")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.ABA")
+        started = time.perf_counter()
+        with open(path, "wb") as f:
+            stats = write_aba_file(payments(args.payments), f, "063245", "10758330", "Benchmark", datetime(2025, 7, 28))
+        write_seconds = time.perf_counter() - started
+        print(f"{stats['record_count'] + 2} records, {os.path.getsize(path) / 1e6:.1f} MB\n")
+        
+        started = time.perf_counter()
+        report = validate_aba_file(path, require_balanced=True)
+        validate_seconds = time.perf_counter() - started
+        assert report.valid, report.errors
+        
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            for _ in iter_aba_records(f):
+                pass
+        parse_seconds = time.perf_counter() - started
+        
+        records = stats['record_count'] + 2
+        print(f"{'Step':<34} {'Seconds':>8} {'Records/s':>12}")
+        print("-" * 56)
+        for label, seconds in [
+            ("write_aba_file", write_seconds),
+            ("validate_aba_file", validate_seconds),
+            ("iter_aba_records (parse only)", parse_seconds),
+        ]:
+            print(f"{label:<34} {seconds:>8.2f} {records / seconds:>12,.0f}")
+
+if __name__ == "__main__":
+    main()
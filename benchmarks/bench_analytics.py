@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Benchmark: payment analytics and exports over a long statement history
+
+Seeds a temp database with --statements processed statements in daily
+batches, then times each summary three ways: the indexed aggregate query,
+the same call answered from the analytics cache, and the approach it
+replaces - loading every row into pandas and grouping there. Also times the
+streaming CSV and Parquet exports and reports their peak Python memory
+against holding every row at once (times include tracemalloc overhead).
+Run from the repository root:
+    
+    python benchmarks/bench_analytics.py
+    python benchmarks/bench_analytics.py --statements 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asic_batch.analytics import clear_analytics_cache, export_statements, parquet_available, payment_summary
+from asic_batch.storage import HISTORY_COLUMNS, db_connection, init_database, set_database_path
+
+# Common ASIC fees, so many statements share an amount
+FEES = ("321.00", "1096.85", "102.30", "87.00", "430.00", "65.00", "1371.00")
+
+def seed_history(statement_count, per_day, companies, rng):
+    """Insert daily batches ending 2025-06-30, with companies paying repeatedly"""
+    day = date(2025, 6, 30) - timedelta(days=statement_count // per_day)
+    rows = []
+    for index in range(statement_count):
+        if index % per_day == 0:
+            day += timedelta(days=1)
+        company = rng.randrange(companies)
+        rows.append((
+            f"COMPANY {company} PTY LTD", f"{company:09d}", f"4X{index:011d}A", f"22{index:011d}",
+            float(rng.choice(FEES)), f"hash-{index}", f"{day.isoformat()} 10:00:00",
+            f"ASIC_Batch_{day.strftime('%Y%m%d')}.ABA", f"batch_{day.strftime('%Y%m%d')}_100000"
+        ))
+    
+    with db_connection() as conn:
+        conn.executemany('''
+            INSERT INTO processed_statements
+            (company_name, acn, asic_reference, bpay_reference, amount, file_hash, processed_date, aba_filename, batch_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+def pandas_summary(group_by):
+    """The straightforward approach: read every statement and group in pandas"""
+    with db_connection() as conn:
+        frame = pd.read_sql_query(f"SELECT {', '.join(HISTORY_COLUMNS)} FROM processed_statements", conn)
+    frame['cents'] = (frame['amount'] * 100).round().astype("int64")
+    keys = {
+        'month': frame['processed_date'].str[:7],
+        'company': frame['acn'],
+        'batch': frame['batch_id'],
+        'fee': frame['cents'],
+    }
+    return frame.groupby(keys[group_by])['cents'].agg(['count', 'sum'])
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+def peak_memory(function, *args):
+    """Seconds and peak traced Python memory (MB) of one call"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1024 / 1024
+
+def load_all_rows():
+    with db_connection() as conn:
+        return conn.execute(f"SELECT {', '.join(HISTORY_COLUMNS)} FROM processed_statements").fetchall()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--statements", type=int, default=500_000, help="Processed statements in the database")
+    parser.add_argument("--per-day", type=int, default=250, help="Statements per daily batch")
+    parser.add_argument("--companies", type=int, default=20_000, help="Distinct companies paying")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        set_database_path(os.path.join(directory, "bench.db"))
+        init_database()
+        started = time.perf_counter()
+        seed_history(args.statements, args.per_day, args.companies, random.Random(0))
+        print(f"Seeded {args.statements} statements in {time.perf_counter() - started:.1f} s\n")
+        
+        print(f"{'Summary':<10} {'Indexed ms':>11} {'Cached ms':>10} {'pandas ms':>10}")
+        print("-" * 44)
+        for group_by in ('month', 'company', 'batch', 'fee'):
+            clear_analytics_cache()
+            indexed = timed(payment_summary, group_by, None, None, 50)
+            cached = timed(payment_summary, group_by, None, None, 50)
+            in_pandas = timed(pandas_summary, group_by)
+            print(f"{group_by:<10} {indexed * 1000:>11.1f} {cached * 1000:>10.2f} {in_pandas * 1000:>10.1f}")
+        
+        print(f"\n{'Export':<24} {'Seconds':>8} {'Peak MB':>8} {'File MB':>8}")
+        print("-" * 51)
+        seconds, peak = peak_memory(load_all_rows)
+        print(f"{'every row in memory':<24} {seconds:>8.2f} {peak:>8.1f} {'':>8}")
+        for export_format in ('csv', 'parquet'):
+            if export_format == 'parquet' and not parquet_available():
+                print(f"{'parquet':<24} {'pyarrow not installed':>26}")
+                continue
+            path = os.path.join(directory, f"statements.{export_format}")
+            seconds, peak = peak_memory(export_statements, path, export_format)
+            print(f"{export_format + ' (streamed)':<24} {seconds:>8.2f} {peak:>8.1f} {os.path.getsize(path) / 1024 / 1024:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Benchmark: adaptive PyPDF2-first extraction vs pdfplumber for every statement
+
+Extracts the same synthetic statements with each backend order and reports
+per-file time, which backend produced each result and whether the fields
+match. Run from the repository root:
+    
+    python benchmarks/bench_backends.py
+    python benchmarks/bench_backends.py --count 500
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asic_batch.backends import BACKENDS, DEFAULT_BACKEND_ORDER
+from asic_batch.extraction import extract_asic_data_with_backend
+from asic_batch.instrumentation import Metrics
+from benchmarks.synthetic import generate_statements
+
+ORDERS = [
+    ("pdfplumber only (previous)", ("pdfplumber",)),
+    ("PyPDF2 only", ("pypdf2",)),
+    ("adaptive (default)", DEFAULT_BACKEND_ORDER),
+]
+
+def run_order(statements, names, repeat):
+    """Best-of-repeat seconds for the whole set, plus backends used and mismatches"""
+    backends = [BACKENDS[name] for name in names]
+    best = None
+    for _ in range(repeat):
+        used = Counter()
+        mismatches = 0
+        started = time.perf_counter()
+        for statement in statements:
+            asic_data, backend = extract_asic_data_with_backend(io.BytesIO(statement['pdf']), Metrics(), backends)
+            used[backend] += 1
+            mismatches += asic_data != statement['expected']
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best, used, mismatches
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200, help="Synthetic statements to extract")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per order (best is reported)")
+    args = parser.parse_args(argv)
+    
+    statements = list(generate_statements(args.count, seed=0))
+    print(f"{args.count} synthetic statements, {sum(s['pages'] for s in statements)} pages\n")
+    print(f"{'Backend order':<28} {'Per file':>10} {'Speedup':>8}  {'Mismatches':>10}  Backends used")
+    print("-" * 90)
+    
+    reference = None
+    for label, names in ORDERS:
+        seconds, used, mismatches = run_order(statements, names, args.repeat)
+        reference = reference or seconds
+        backends_used = ", ".join(f"{name} {count}" for name, count in used.most_common())
+        print(
+            f"{label:<28} {seconds / len(statements) * 1000:>8.2f}ms "
+            f"{reference / seconds:>7.1f}x  {mismatches:>10}  {backends_used}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Benchmark: in-memory duplicate index against a long statement history
+
+Seeds a temp database with --statements processed statements, then for each
+kind of index - exact strings (for comparison), 64-bit fingerprint sets and
+Bloom filters - reports how long loading the history takes, how much Python
+memory it holds, how long a refresh with nothing new and one picking up a
+new batch take, and how long checking an upload of --upload statements
+(--duplicates of them already paid) takes against the SQL check. Run from
+the repository root:
+    
+    python benchmarks/bench_dedup_index.py
+    python benchmarks/bench_dedup_index.py --statements 100000 --upload 5000
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asic_batch.dedup import DuplicateIndex
+from asic_batch.storage import (
+    check_duplicate_statements,
+    db_connection,
+    init_database,
+    iter_duplicate_keys,
+    set_database_path,
+)
+
+def statement_keys(index):
+    """(file_hash, asic_reference, bpay_reference) of a synthetic statement"""
+    return hashlib.sha256(f"statement-{index}".encode()).hexdigest(), f"4X{index:011d}A", f"22{index:011d}"
+
+def seed_history(first, count, batch_id):
+    rows = [
+        (f"COMPANY {index} PTY LTD", f"{index % 50000:09d}", *statement_keys(index)[1:], 321.0,
+         statement_keys(index)[0], f"{batch_id}.ABA", batch_id)
+        for index in range(first, first + count)
+    ]
+    with db_connection() as conn:
+        conn.executemany('''
+            INSERT INTO processed_statements
+            (company_name, acn, asic_reference, bpay_reference, amount, file_hash, aba_filename, batch_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+class StringIndex:
+    """The straightforward index: the keys themselves in sets"""
+    
+    def refresh(self):
+        self.file_hashes = set()
+        self.payments = set()
+        for rows in iter_duplicate_keys():
+            for _, file_hash, asic_reference, bpay_reference in rows:
+                self.file_hashes.add(file_hash)
+                self.payments.add((asic_reference, bpay_reference))
+
+def measure_load(make_index):
+    """Seconds to load the history, and the Python memory (MB) the loaded index holds
+    
+    The history is loaded twice: once timed, and once under tracemalloc, which
+    would otherwise slow the load severalfold.
+    """
+    started = time.perf_counter()
+    index = make_index()
+    index.refresh()
+    seconds = time.perf_counter() - started
+    del index
+    
+    tracemalloc.start()
+    index = make_index()
+    index.refresh()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return index, seconds, held / 1024 / 1024
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--statements", type=int, default=1_000_000, help="Processed statements in the database")
+    parser.add_argument("--upload", type=int, default=1000, help="Statements in the checked upload")
+    parser.add_argument("--duplicates", type=int, default=10, help="Statements in the upload already paid")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        set_database_path(os.path.join(directory, "bench.db"))
+        init_database()
+        started = time.perf_counter()
+        for first in range(0, args.statements, 100_000):
+            seed_history(first, min(100_000, args.statements - first), f"batch_{first}")
+        print(f"Seeded {args.statements} statements in {time.perf_counter() - started:.1f} s\n")
+        
+        # New statements, plus a few already paid spread across the history
+        upload = [statement_keys(args.statements + 1_000_000 + index) for index in range(args.upload - args.duplicates)]
+        upload += [statement_keys(index * (args.statements // max(1, args.duplicates))) for index in range(args.duplicates)]
+        
+        sql_seconds, expected = timed(check_duplicate_statements, upload)
+        print(f"SQL check of {args.upload} statements: {sql_seconds * 1000:.1f} ms\n")
+        
+        print(f"{'Index':<20} {'Load s':>7} {'Memory MB':>10} {'Bytes/row':>10} {'Refresh ms':>11} {'+1k rows ms':>12} {'Check ms':>9} {'To confirm':>11}")
+        print("-" * 96)
+        index, seconds, held = measure_load(StringIndex)
+        print(f"{'strings':<20} {seconds:>7.2f} {held:>10.1f} {held * 1024 * 1024 / args.statements:>10.0f}")
+        del index
+        
+        next_statement = args.statements
+        for label, bloom in (("fingerprints", False), ("bloom (1% FP)", True)):
+            index, seconds, held = measure_load(lambda: DuplicateIndex(bloom=bloom))
+            idle_seconds, _ = timed(index.refresh)
+            seed_history(next_statement, 1000, f"batch_{next_statement}")
+            next_statement += 1000
+            new_seconds, added = timed(index.refresh)
+            assert added == 1000
+            
+            check_seconds, results = timed(index.check_duplicate_statements, upload)
+            assert results == expected
+            to_confirm = sum(1 for statement in upload if any(index.might_be_duplicate(*statement)))
+            print(
+                f"{label:<20} {seconds:>7.2f} {held:>10.1f} {held * 1024 * 1024 / args.statements:>10.0f} "
+                f"{idle_seconds * 1000:>11.2f} {new_seconds * 1000:>12.1f} {check_seconds * 1000:>9.1f} {to_confirm:>11}"
+            )
+            del index
+
+if __name__ == "__main__":
+    main()
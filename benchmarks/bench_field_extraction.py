@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: single-pass FieldExtractor vs the original regex cascade
+
+Times per-document field extraction over large multi-page statement text.
+Run from the repository root:
+    
+    python benchmarks/bench_field_extraction.py
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asic_batch.extraction import extract_fields
+
+def legacy_extract_fields(text):
+    """The regex cascade extract_asic_data used before FieldExtractor"""
+    company_name_match = re.search(r'FOR\s+([A-Z][A-Z0-9\s&]+(?:PTY\s+LTD|LIMITED|LTD))', text)
+    company_name = company_name_match.group(1).strip() if company_name_match else "Unknown Company"
+    
+    acn_match = re.search(r'ACN\s+(\d{3}\s+\d{3}\s+\d{3})', text)
+    acn = acn_match.group(1).replace(' ', '') if acn_match else ""
+    
+    amount_match = re.search(r'Annual Review.*?\$(\d+\.\d{2})', text)
+    amount = amount_match.group(1) if amount_match else "0.00"
+    
+    ref_match = re.search(r'Annual Review.*?([A-Z0-9]{13}\s+[A-Z])', text)
+    asic_reference = ref_match.group(1).replace(' ', '') if ref_match else ""
+    
+    bpay_ref_match = re.search(r'^\s*(\d{13})\s*$', text, re.MULTILINE)
+    if bpay_ref_match:
+        bpay_ref = bpay_ref_match.group(1)
+    else:
+        barcode_match = re.search(r'\*\d+\s+(\d{13})\s+\d+\s+\*', text)
+        if barcode_match:
+            bpay_ref = barcode_match.group(1)
+        else:
+            bpay_fallback = re.search(r'Ref:\s+(\d{4}\s+\d{4}\s+\d{4}\s+\d{3})', text)
+            bpay_ref = bpay_fallback.group(1).replace(' ', '') if bpay_fallback else ""
+    
+    return {
+        'company_name': company_name,
+        'acn': acn,
+        'amount': amount,
+        'asic_reference': asic_reference,
+        'bpay_reference': bpay_ref
+    }
+
+STATEMENT_PAGE = """Australian Securities & Investments Commission
+Company statement
+ACN 612 433 502
+FOR ZYH PTY LTD
+Issue date 28 Jul 25
+Annual Review - Special Purpose Pty Co 4X9702542480B A $321.00
+Biller Code: 17301
+Ref: 2296 1243 3502 902
+2296124335029
+*814 2296124335029 00321 *
+"""
+
+# Statements laid out without the standalone BPay line (e.g. PyPDF2 text)
+BARCODE_ONLY_PAGE = STATEMENT_PAGE.replace("2296124335029\n", "", 1)
+
+ATTACHMENT_LINE = "Registered office and principal place of business details as recorded by ASIC on 28 July 2025\n"
+
+def build_text(statement_pages, attachment_pages, lines_per_page=45, statement_page=STATEMENT_PAGE):
+    """Statement text followed by pages of attachment text"""
+    attachment_page = ATTACHMENT_LINE * lines_per_page
+    return statement_page * statement_pages + attachment_page * attachment_pages
+
+def time_per_document(func, text, repeat=5):
+    """Best-of-repeat seconds per call"""
+    number = max(1, int(20000 / max(1, len(text) // 1000)))
+    return min(timeit.repeat(lambda: func(text), number=number, repeat=repeat)) / number
+
+scenarios = [
+    ("1 statement page", build_text(1, 0)),
+    ("statement + 20 attachment pages", build_text(1, 20)),
+    ("statement + 200 attachment pages", build_text(1, 200)),
+    ("barcode-only BPay + 20 pages", build_text(1, 20, statement_page=BARCODE_ONLY_PAGE)),
+    ("barcode-only BPay + 200 pages", build_text(1, 200, statement_page=BARCODE_ONLY_PAGE)),
+    ("200 pages, no fields found", build_text(0, 200)),
+]
+
+print(f"{'Scenario':<36} {'Text KB':>8} {'Cascade':>12} {'Single-pass':>12} {'Speedup':>8}")
+print("-" * 80)
+for name, text in scenarios:
+    legacy = legacy_extract_fields(text)
+    fields, matched_rules = extract_fields(text)
+    assert fields == legacy, f"{name}: {fields} != {legacy}"
+    
+    legacy_seconds = time_per_document(legacy_extract_fields, text)
+    single_pass_seconds = time_per_document(extract_fields, text)
+    print(
+        f"{name:<36} {len(text) / 1024:>8.1f} "
+        f"{legacy_seconds * 1e6:>10.1f}us {single_pass_seconds * 1e6:>10.1f}us "
+        f"{legacy_seconds / single_pass_seconds:>7.1f}x"
+    )
+
+print("\nRules matched on the statement page:")
+for field, rule in extract_fields(STATEMENT_PAGE)[1].items():
+    print(f"  {field}: {rule}")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Benchmark: peak RSS while the headless pipeline ingests a 500-statement batch
+
+Writes synthetic statements (with attachment pages, so files are realistically
+large) to a temp inbox and a ZIP, then runs `python -m asic_batch process
+--dry-run` over each in a fresh process and reports the peak resident memory
+of the main process and of the largest extraction worker. Run from the
+repository root:
+    
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --count 100 --workers 1
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import generate_statements
+
+# Runs the CLI in-process and reports its own peak RSS and its workers'
+RUNNER = """
+import json, resource, sys
+from asic_batch.cli import main
+status = main(sys.argv[1:])
+print(json.dumps({
+    'status': status,
+    'main_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'worker_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+}))
+"""
+
+def build_inputs(directory, count, attachment_pages):
+    """Write count statements as PDFs into inbox/ and as one ZIP - returns (inbox, zip path, bytes)"""
+    inbox = os.path.join(directory, "inbox")
+    os.makedirs(inbox)
+    zip_path = os.path.join(directory, "statements.zip")
+    total = 0
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for statement in generate_statements(count, seed=0, max_attachment_pages=attachment_pages):
+            with open(os.path.join(inbox, statement['filename']), "wb") as f:
+                f.write(statement['pdf'])
+            archive.writestr(statement['filename'], statement['pdf'])
+            total += len(statement['pdf'])
+    return inbox, zip_path, total
+
+def run_scenario(input_path, directory, workers, spool_mb, name):
+    env = dict(os.environ, PYTHONPATH=ROOT, ASIC_LOG_LEVEL="WARNING")
+    if spool_mb is not None:
+        env["ASIC_SPOOL_MAX_MEMORY_MB"] = str(spool_mb)
+    argv = [
+        "process", input_path, "--dry-run", "--workers", str(workers),
+        # A fresh database per scenario so nothing is answered from the extraction cache
+        "--db", os.path.join(directory, f"{name}.db"),
+        "--summary", os.path.join(directory, "summary.json"),
+    ]
+    completed = subprocess.run(
+        [sys.executable, "-c", RUNNER, *argv], env=env, cwd=ROOT,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=500, help="Statements in the batch")
+    parser.add_argument("--attachment-pages", type=int, default=120, help="Most attachment pages per statement")
+    parser.add_argument("--workers", type=int, default=2, help="Extraction worker processes")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        inbox, zip_path, total = build_inputs(directory, args.count, args.attachment_pages)
+        print(f"{args.count} statements, {total / 1e6:.1f} MB of PDFs, {args.workers} worker(s)\n")
+        
+        scenarios = [
+            ("PDF inbox, hashed in place", inbox, None),
+            ("ZIP, members held in memory", zip_path, 1_000_000),
+            ("ZIP, default spool budget", zip_path, None),
+            ("ZIP, every member spooled", zip_path, 0),
+        ]
+        print(f"{'Scenario':<32} {'Main peak RSS':>14} {'Worker peak RSS':>16}")
+        print("-" * 64)
+        for number, (label, input_path, spool_mb) in enumerate(scenarios):
+            result = run_scenario(input_path, directory, args.workers, spool_mb, f"scenario_{number}")
+            print(f"{label:<32} {result['main_kb'] / 1024:>11.1f} MB {result['worker_kb'] / 1024:>13.1f} MB")
+
+if __name__ == "__main__":
+    main()
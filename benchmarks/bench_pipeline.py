@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Benchmark the batch pipeline on synthetic statements
+
+Times hashing, PDF extraction, duplicate checks and ABA generation at 10, 1k
+and 10k statements, then repeats each stage under tracemalloc for its peak
+memory. Results are compared against benchmarks/baseline.json so regressions
+in these hot paths show up as numbers. Run from the repository root:
+    
+    python benchmarks/bench_pipeline.py                   # compare with baseline
+    python benchmarks/bench_pipeline.py --sizes 10 1000   # quicker run
+    python benchmarks/bench_pipeline.py --save-baseline   # record a new baseline
+
+Extraction is timed in a single process so per-document latency is
+comparable between machines. The full run takes about 15 minutes, most of
+it the 10k extraction under tracemalloc; --no-memory skips that pass.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asic_batch import aba, extraction, spool, storage
+from benchmarks.synthetic import generate_statements
+
+DEFAULT_SIZES = [10, 1000, 10000]
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Stages faster than this are too noisy to flag as regressions
+MIN_COMPARABLE_SECONDS = 0.05
+
+def stage_hash(statements, context):
+    for statement in statements:
+        yield lambda statement=statement: spool.get_file_hash(statement['pdf'])
+
+def stage_extract(statements, context):
+    for statement in statements:
+        yield lambda statement=statement: extraction._extract_upload((statement['filename'], statement['pdf']))
+
+def stage_dedup_per_file(statements, context):
+    for statement in statements:
+        expected = statement['expected']
+        yield lambda statement=statement, expected=expected: storage.check_duplicate_statement(
+            statement['file_hash'], expected['asic_reference'], expected['bpay_reference']
+        )
+
+def stage_dedup_batch(statements, context):
+    yield lambda: storage.check_duplicate_statements(
+        (statement['file_hash'], statement['expected']['asic_reference'], statement['expected']['bpay_reference'])
+        for statement in statements
+    )
+
+def stage_aba(statements, context):
+    yield lambda: aba.write_aba_file(
+        (statement['expected'] for statement in statements),
+        io.BytesIO(),
+        aba.DEFAULT_BSB,
+        aba.DEFAULT_ACCOUNT,
+        aba.DEFAULT_ACCOUNT_NAME,
+        context['processing_date'],
+        aba.DEFAULT_APCA_NUMBER
+    )
+
+# Each stage yields the calls to time; stages yielding one call per statement
+# also report per-statement latency percentiles
+STAGES = [
+    ("hash", stage_hash),
+    ("extract", stage_extract),
+    ("dedup_per_file", stage_dedup_per_file),
+    ("dedup_batch", stage_dedup_batch),
+    ("aba", stage_aba),
+]
+
+def run_stage(stage, statements, context):
+    """Time every call a stage yields - returns (total seconds, per-call seconds)"""
+    latencies = []
+    for call in stage(statements, context):
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    return sum(latencies), latencies
+
+def measure_memory(stage, statements, context):
+    """Peak bytes allocated while a stage runs (input PDFs are allocated beforehand)"""
+    tracemalloc.start()
+    try:
+        for call in stage(statements, context):
+            call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def prepare_database(statements, db_dir):
+    """Fresh database where every other statement has already been processed"""
+    storage.set_database_path(os.path.join(db_dir, f"bench_{len(statements)}.db"))
+    storage.init_database()
+    history = [
+        dict(statement['expected'], file_hash=statement['file_hash'])
+        for statement in statements[::2]
+    ]
+    storage.commit_batch("batch_bench", "bench.ABA", history)
+
+def benchmark_size(size, seed, db_dir, memory=True):
+    statements = list(generate_statements(size, seed=seed))
+    for statement in statements:
+        statement['file_hash'] = spool.get_file_hash(statement['pdf'])
+    prepare_database(statements, db_dir)
+    
+    context = {'processing_date': datetime(2025, 7, 28)}
+    pages = sum(statement['pages'] for statement in statements)
+    results = {}
+    
+    # Benchmark numbers are meaningless if extraction stops finding the fields
+    for statement in statements[:50]:
+        asic_data, _, error, _ = extraction._extract_upload((statement['filename'], statement['pdf']))
+        assert not error and {field: asic_data[field] for field in statement['expected']} == statement['expected'], (
+            f"{statement['filename']}: extracted {asic_data} expected {statement['expected']}"
+        )
+    
+    for name, stage in STAGES:
+        seconds, latencies = run_stage(stage, statements, context)
+        result = {
+            'seconds': round(seconds, 6),
+            'statements_per_second': round(size / seconds, 1) if seconds else None,
+        }
+        if len(latencies) == size and size > 1:
+            quantiles = statistics.quantiles(latencies, n=100)
+            result['p50_ms'] = round(quantiles[49] * 1000, 4)
+            result['p95_ms'] = round(quantiles[94] * 1000, 4)
+        if name == "extract":
+            result['pages_per_second'] = round(pages / seconds, 1)
+        if memory:
+            result['peak_kib'] = round(measure_memory(stage, statements, context) / 1024, 1)
+        results[name] = result
+        
+        p95 = f"{result['p95_ms']:.3f}ms" if 'p95_ms' in result else "-"
+        peak = f"{result['peak_kib']:,.0f} KiB" if memory else "-"
+        print(f"  {name:<16} {seconds:>9.3f}s {result['statements_per_second'] or 0:>12,.0f}/s {p95:>12} {peak:>15}")
+    
+    return results
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Print stage-by-stage ratios against the baseline - returns the regressions"""
+    regressions = []
+    print(f"\n{'Size':>6} {'Stage':<16} {'Baseline':>10} {'Now':>10} {'Ratio':>7}  {'Peak KiB (base -> now)'}")
+    print("-" * 80)
+    for size, stages in results.items():
+        for name, result in stages.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if not base:
+                continue
+            ratio = result['seconds'] / base['seconds'] if base['seconds'] else 1.0
+            memory_ratio = (
+                result['peak_kib'] / base['peak_kib']
+                if base.get('peak_kib') and result.get('peak_kib') is not None else 1.0
+            )
+            
+            flags = []
+            if base['seconds'] >= MIN_COMPARABLE_SECONDS and ratio > 1 + tolerance:
+                flags.append("SLOWER")
+            if base.get('peak_kib', 0) >= 64 and memory_ratio > 1 + tolerance:
+                flags.append("MORE MEMORY")
+            if flags:
+                regressions.append((size, name, flags))
+            
+            memory = (
+                f"{base['peak_kib']:>9,.0f} -> {result['peak_kib']:>9,.0f}"
+                if 'peak_kib' in base and 'peak_kib' in result else f"{'-':>22}"
+            )
+            print(f"{size:>6} {name:<16} {base['seconds']:>9.3f}s {result['seconds']:>9.3f}s {ratio:>6.2f}x"
+                  f"  {memory}  {' '.join(flags)}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Statement counts to run")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the synthetic statements")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    args = parser.parse_args(argv)
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as db_dir:
+        for size in args.sizes:
+            print(f"\n{size:,} statements")
+            print(f"  {'Stage':<16} {'Total':>10} {'Throughput':>13} {'p95':>12} {'Peak memory':>15}")
+            results[str(size)] = benchmark_size(size, args.seed, db_dir, memory=not args.no_memory)
+            storage.get_connection_pool(storage.DB_PATH).close()
+    
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'python': platform.python_version(),
+                'machine': f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+                'seed': args.seed,
+                'results': results
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline} - run with --save-baseline to create one")
+        return 0
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    print(f"\nBaseline from {baseline['created']} ({baseline['machine']}, Python {baseline['python']})")
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Benchmark: reconciling a year of bank transactions against years of history
+
+Seeds a temp database with daily batches of processed statements (each split
+into ABA files), writes a bank CSV of the last --days days holding each ABA
+file's debit plus unrelated debits and credits, then times
+reconcile_bank_csv. A nested-loop matcher is timed on a sample of the same
+debits for comparison. Run from the repository root:
+    
+    python benchmarks/bench_reconcile.py
+    python benchmarks/bench_reconcile.py --years 1 --days 90
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asic_batch.money import amount_to_cents, cents_to_amount
+from asic_batch.reconcile import RECONCILE_WINDOW_DAYS, read_bank_csv, reconcile_bank_csv
+from asic_batch.storage import db_connection, get_unreconciled_statements, init_database, set_database_path
+
+# Common ASIC fees, so many statements share an amount
+FEES = ("321.00", "1096.85", "102.30", "87.00", "430.00", "65.00", "1371.00")
+
+def seed_history(end_day, years, per_day, per_file, rng):
+    """Insert years of daily batches - returns {day: [ABA file totals in cents]}"""
+    file_totals = {}
+    rows = []
+    first_day = end_day - timedelta(days=365 * years)
+    day = first_day
+    index = 0
+    while day <= end_day:
+        batch_id = f"batch_{day.strftime('%Y%m%d')}_100000"
+        totals = []
+        for start in range(0, per_day, per_file):
+            aba_filename = f"ASIC_Batch_{day.strftime('%Y%m%d')}_part{start // per_file + 1:02d}.ABA"
+            total = 0
+            for _ in range(min(per_file, per_day - start)):
+                amount = rng.choice(FEES)
+                total += amount_to_cents(amount)
+                rows.append((
+                    f"COMPANY {index} PTY LTD", f"{index:09d}", f"4X{index:011d}A", f"22{index:011d}",
+                    float(amount), f"hash-{index}", f"{day.isoformat()} 10:00:00", aba_filename, batch_id
+                ))
+                index += 1
+            totals.append(total)
+        file_totals[day] = totals
+        day += timedelta(days=1)
+    
+    with db_connection() as conn:
+        conn.executemany('''
+            INSERT INTO processed_statements
+            (company_name, acn, asic_reference, bpay_reference, amount, file_hash, processed_date, aba_filename, batch_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+    return file_totals, len(rows)
+
+def bank_csv(file_totals, first_day, noise_per_day, rng):
+    """A headerless CommBank-style export from first_day on"""
+    lines = []
+    for day, totals in sorted(file_totals.items()):
+        if day < first_day:
+            continue
+        debit_day = day + timedelta(days=rng.randint(0, 2))
+        for total in totals:
+            lines.append(f'{debit_day.strftime("%d/%m/%Y")},"-{cents_to_amount(total)}","Direct Entry TT Accountancy","+0.00"')
+        for _ in range(noise_per_day):
+            cents = rng.randint(100, 500_000)
+            sign = "-" if rng.random() < 0.7 else "+"
+            lines.append(f'{day.strftime("%d/%m/%Y")},"{sign}{cents_to_amount(cents)}","Card purchase {rng.randint(1, 999)}","+0.00"')
+    return "\n".join(lines) + "\n"
+
+def nested_loop_match(debits, statements, window_days):
+    """The straightforward approach: scan every statement for every debit"""
+    matched = set()
+    for debit in debits:
+        for statement in statements:
+            lag = (debit['date'] - date.fromisoformat(statement['processed_date'][:10])).days
+            if statement['id'] not in matched and 0 <= lag <= window_days and amount_to_cents(statement['amount']) == -debit['amount_cents']:
+                matched.add(statement['id'])
+                break
+    return matched
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=3, help="Years of processed statements in the database")
+    parser.add_argument("--days", type=int, default=365, help="Days covered by the bank export")
+    parser.add_argument("--per-day", type=int, default=100, help="Statements processed per day")
+    parser.add_argument("--noise-per-day", type=int, default=60, help="Unrelated transactions per day in the export")
+    parser.add_argument("--sample", type=int, default=500, help="Debits the nested-loop matcher is timed on")
+    args = parser.parse_args(argv)
+    
+    rng = random.Random(0)
+    end_day = date(2025, 6, 30)
+    with tempfile.TemporaryDirectory() as directory:
+        set_database_path(os.path.join(directory, "bench.db"))
+        init_database()
+        file_totals, statement_count = seed_history(end_day, args.years, args.per_day, 25, rng)
+        content = bank_csv(file_totals, end_day - timedelta(days=args.days), args.noise_per_day, rng).encode("utf-8")
+        transaction_count = content.count(b"\n")
+        print(f"{statement_count} statements over {args.years} year(s); bank export of {transaction_count} transactions\n")
+        
+        started = time.perf_counter()
+        summary = reconcile_bank_csv(io.BytesIO(content))
+        seconds = time.perf_counter() - started
+        
+        debits = [transaction for transaction in read_bank_csv(io.BytesIO(content))[0] if transaction['amount_cents'] < 0]
+        candidates = get_unreconciled_statements(end_day - timedelta(days=args.days + RECONCILE_WINDOW_DAYS), end_day + timedelta(days=1))
+        sample = debits[:args.sample]
+        started = time.perf_counter()
+        nested_loop_match(sample, candidates, RECONCILE_WINDOW_DAYS)
+        nested_seconds = (time.perf_counter() - started) * len(debits) / max(len(sample), 1)
+        
+        print(f"{'Matcher':<40} {'Seconds':>9}")
+        print("-" * 50)
+        print(f"{'reconcile_bank_csv (import + match)':<40} {seconds:>9.2f}")
+        print(f"{'nested loops (estimated from sample)':<40} {nested_seconds:>9.2f}")
+        print(
+            f"\n{summary['debits']} debits: {sum(summary['matched'].values())} matched covering "
+            f"{summary['matched_statements']} statements, {len(summary['unmatched_debits'])} unmatched debits, "
+            f"{len(summary['unmatched_statements'])} unmatched statements"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Benchmark: import time of each entry point and start-up of extraction workers
+
+Imports each module in a fresh interpreter --repeat times and reports the
+median import time and which heavy libraries (Streamlit, pandas, the PDF
+libraries, pyarrow) it pulled in. Then times `python -m asic_batch --help`
+end to end, and how long a new extraction worker pool takes to return its
+first statement under each multiprocessing start method - with the worker
+importing only asic_batch.extraction, and for comparison importing app, as
+workers did when the extraction code lived there. Run from the repository
+root:
+    
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from asic_batch.extraction import _extract_upload
+from benchmarks.synthetic import generate_statements
+
+MODULES = (
+    "asic_batch.storage",
+    "asic_batch.aba",
+    "asic_batch.extraction",
+    "asic_batch.cli",
+    "app",
+)
+HEAVY_MODULES = ("streamlit", "pandas", "PyPDF2", "pdfplumber", "pyarrow")
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps([time.perf_counter() - started, [name for name in {heavy!r} if name in sys.modules]]))
+"""
+
+def time_import(module, repeat):
+    """Median seconds to import module in a fresh interpreter, and the heavy libraries it loaded"""
+    seconds = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        elapsed, loaded = json.loads(output)
+        seconds.append(elapsed)
+    return statistics.median(seconds), loaded
+
+def time_command(args, repeat):
+    """Median wall-clock seconds of a whole command"""
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(args, cwd=ROOT, capture_output=True, check=True)
+        seconds.append(time.perf_counter() - started)
+    return statistics.median(seconds)
+
+def loaded_heavy_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+def time_first_result(start_method, preload, upload):
+    """Seconds from creating a one-worker pool to its first extracted statement, and the worker's heavy libraries"""
+    context = multiprocessing.get_context(start_method)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=context,
+        initializer=importlib.import_module if preload else None,
+        initargs=(preload,) if preload else ()
+    ) as executor:
+        asic_data, _, error, _ = executor.submit(_extract_upload, upload).result()
+        seconds = time.perf_counter() - started
+        loaded = executor.submit(loaded_heavy_modules).result()
+    assert error is None and asic_data['bpay_reference'], error
+    return seconds, loaded
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (the median is reported)")
+    args = parser.parse_args(argv)
+    
+    print(f"{'Import':<24} {'ms':>8}  Heavy libraries loaded")
+    print("-" * 72)
+    baseline = time_command([sys.executable, "-c", "pass"], args.repeat)
+    for module in MODULES:
+        seconds, loaded = time_import(module, args.repeat)
+        print(f"{module:<24} {seconds * 1000:>8.1f}  {', '.join(loaded) or '-'}")
+    cli_seconds = time_command([sys.executable, "-m", "asic_batch", "--help"], args.repeat)
+    print(f"\n`python -m asic_batch --help`: {cli_seconds * 1000:.0f} ms (an empty interpreter takes {baseline * 1000:.0f} ms)\n")
+    
+    statement = next(generate_statements(1, seed=1))
+    upload = (statement['filename'], statement['pdf'])
+    print(f"{'Worker start method':<20} {'Worker imports':<24} {'First result ms':>16}  Heavy libraries loaded")
+    print("-" * 92)
+    for start_method in multiprocessing.get_all_start_methods():
+        for label, preload in (("asic_batch.extraction", None), ("app (before the split)", "app")):
+            times = []
+            for _ in range(args.repeat):
+                seconds, loaded = time_first_result(start_method, preload, upload)
+                times.append(seconds)
+            print(f"{start_method:<20} {label:<24} {statistics.median(times) * 1000:>16.1f}  {', '.join(loaded) or '-'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Load test: many sessions staging and committing overlapping statements at once
+
+Every simulated session repeatedly picks a random batch from a shared pool of
+statements (some of them re-scans with a different file hash), drops the
+duplicates, reserves the rest with reserve_statements, renews the lease while
+its user "reviews" the batch, and commits what it holds with commit_batch. A
+share of sessions abandon their batch instead and leave the lease to expire.
+Sessions run as threads, like Streamlit sessions in one server, or with
+--processes as separate processes sharing the database file, like several
+servers or cron runs. Prints latency percentiles per operation and exits
+non-zero if any payment was recorded twice, any commit conflicted over a
+statement another session held, or any database call failed. Run from the
+repository root:
+    
+    python benchmarks/load_test_reservations.py
+    python benchmarks/load_test_reservations.py --sessions 32 --processes
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from sqlite3 import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asic_batch.storage import (
+    check_duplicate_statements,
+    commit_batch,
+    db_connection,
+    init_database,
+    reserve_statements,
+    set_database_path,
+)
+
+OPERATIONS = ('duplicate_check', 'reserve', 'renew', 'commit')
+
+def pool_statement(index, scan=None):
+    return {
+        'company_name': f"COMPANY {index} PTY LTD",
+        'acn': f"{index:09d}",
+        'amount': f"{index % 900 + 100}.00",
+        'asic_reference': f"4X{index:011d}A",
+        'bpay_reference': f"22{index:011d}",
+        'file_hash': f"hash-{index}" if scan is None else f"hash-{index}-scan-{scan}"
+    }
+
+def claim(asic_data):
+    return (asic_data['file_hash'], asic_data['asic_reference'], asic_data['bpay_reference'])
+
+def timed(timings, operation, function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    timings[operation].append(time.perf_counter() - started)
+    return result
+
+def run_session(db_path, session_number, options):
+    """One session's rounds - returns its timings and counters"""
+    set_database_path(db_path)
+    rng = random.Random(session_number)
+    session_id = f"load-{session_number}"
+    timings = {operation: [] for operation in OPERATIONS}
+    counters = {
+        'staged': 0, 'held_elsewhere': 0, 'lost_leases': 0, 'abandoned': 0,
+        'committed': 0, 'commit_conflicts': 0, 'lease_violations': 0, 'errors': 0
+    }
+    
+    for round_number in range(options['rounds']):
+        try:
+            staged = []
+            for index in rng.sample(range(options['statements']), options['batch_size']):
+                rescan = rng.random() < options['rescan_rate']
+                staged.append(pool_statement(index, scan=session_number if rescan else None))
+            
+            checks = timed(timings, 'duplicate_check', check_duplicate_statements, [claim(asic_data) for asic_data in staged])
+            staged = [
+                asic_data for asic_data, check in zip(staged, checks)
+                if not (check['file_duplicate'] or check['payment_duplicate'] or check['upload_duplicate'] is not None)
+            ]
+            counters['staged'] += len(staged)
+            holders = timed(timings, 'reserve', reserve_statements, session_id, [claim(asic_data) for asic_data in staged], options['lease_seconds'])
+            counters['held_elsewhere'] += sum(holder is not None for holder in holders)
+            
+            # The user reviews the batch; each rerun renews the lease
+            for _ in range(options['renewals']):
+                time.sleep(rng.uniform(0, options['think_seconds']))
+                renewed = timed(timings, 'renew', reserve_statements, session_id, [claim(asic_data) for asic_data in staged], options['lease_seconds'])
+                counters['lost_leases'] += sum(before is None and after is not None for before, after in zip(holders, renewed))
+                holders = renewed
+            
+            if rng.random() < options['abandon_rate']:
+                counters['abandoned'] += 1
+                continue
+            
+            held = [asic_data for asic_data, holder in zip(staged, holders) if holder is None]
+            if not held:
+                continue
+            result = timed(
+                timings, 'commit', commit_batch,
+                f"load_{session_number}_{round_number}", f"load_{session_number}_{round_number}.ABA", held,
+                session_id=session_id
+            )
+            if result['committed']:
+                counters['committed'] += result['saved_count']
+            else:
+                counters['commit_conflicts'] += 1
+                counters['lease_violations'] += count_lease_violations(result['conflicts'])
+        except OperationalError:
+            counters['errors'] += 1
+    
+    return timings, counters
+
+def count_lease_violations(conflicts):
+    """Conflicting statements that were not already paid - only another session's lease could explain them"""
+    checks = check_duplicate_statements([claim(asic_data) for asic_data in conflicts])
+    return sum(not (check['file_duplicate'] or check['payment_duplicate']) for check in checks)
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent sessions")
+    parser.add_argument("--processes", action="store_true", help="Run sessions as processes instead of threads")
+    parser.add_argument("--statements", type=int, default=2000, help="Statements in the shared pool")
+    parser.add_argument("--batch-size", type=int, default=25, help="Statements each session stages per round")
+    parser.add_argument("--rounds", type=int, default=20, help="Batches staged per session")
+    parser.add_argument("--renewals", type=int, default=2, help="Lease renewals while a batch is reviewed")
+    parser.add_argument("--think-ms", type=float, default=20, help="Longest pause between renewals")
+    parser.add_argument("--lease-seconds", type=float, default=5, help="Lease length")
+    parser.add_argument("--abandon-rate", type=float, default=0.1, help="Share of batches left to expire instead of committed")
+    parser.add_argument("--rescan-rate", type=float, default=0.1, help="Share of staged statements that are re-scans with another file hash")
+    args = parser.parse_args(argv)
+    
+    options = {
+        'statements': args.statements, 'batch_size': args.batch_size, 'rounds': args.rounds,
+        'renewals': args.renewals, 'think_seconds': args.think_ms / 1000, 'lease_seconds': args.lease_seconds,
+        'abandon_rate': args.abandon_rate, 'rescan_rate': args.rescan_rate
+    }
+    executor_class = ProcessPoolExecutor if args.processes else ThreadPoolExecutor
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "load.db")
+        set_database_path(db_path)
+        init_database()
+        
+        started = time.perf_counter()
+        with executor_class(max_workers=args.sessions) as executor:
+            sessions = list(executor.map(
+                run_session, [db_path] * args.sessions, range(args.sessions), [options] * args.sessions
+            ))
+        seconds = time.perf_counter() - started
+        
+        with db_connection() as conn:
+            paid_twice = conn.execute('''
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM processed_statements
+                    GROUP BY asic_reference, bpay_reference HAVING COUNT(*) > 1
+                )
+            ''').fetchone()[0]
+            processed = conn.execute("SELECT COUNT(*) FROM processed_statements").fetchone()[0]
+    
+    timings = {operation: sorted(value for session_timings, _ in sessions for value in session_timings[operation]) for operation in OPERATIONS}
+    counters = {name: sum(session_counters[name] for _, session_counters in sessions) for name in sessions[0][1]}
+    
+    mode = "processes" if args.processes else "threads"
+    print(f"{args.sessions} sessions ({mode}) x {args.rounds} rounds of {args.batch_size} from {args.statements} statements in {seconds:.2f} s\n")
+    print(f"{'Operation':<16} {'Calls':>7} {'Calls/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    print("-" * 70)
+    for operation in OPERATIONS:
+        values = timings[operation]
+        if values:
+            print(
+                f"{operation:<16} {len(values):>7} {len(values) / seconds:>9.1f} "
+                + " ".join(f"{percentile(values, fraction) * 1000:>8.1f}" for fraction in (0.5, 0.95, 0.99, 1.0))
+            )
+    print(
+        f"\n{counters['staged']} staged, {counters['held_elsewhere']} held by another session, "
+        f"{counters['abandoned']} batches abandoned, {processed} statements committed "
+        f"({counters['commit_conflicts']} commits rejected)"
+    )
+    
+    failures = {
+        'payments recorded twice': paid_twice,
+        'statements committed twice': processed - counters['committed'],
+        'commit conflicts over leased statements': counters['lease_violations'],
+        'leases lost before expiry': counters['lost_leases'],
+        'database errors': counters['errors'],
+    }
+    for label, count in failures.items():
+        print(f"{label}: {count}")
+    return 1 if any(failures.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
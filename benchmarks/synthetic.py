@@ -0,0 +1,171 @@
+"""Synthetic ASIC statement PDFs for offline benchmarks
+
+Builds minimal but valid PDFs laid out like an ASIC annual review company
+statement - company name, ACN, annual review fee line with the ASIC reference
+and a BPay payment slip - followed by a varying number of attachment pages.
+Everything is seeded so the same count and seed always give the same files.
+
+    from benchmarks.synthetic import generate_statements
+
+    for statement in generate_statements(100, seed=1):
+        statement['filename'], statement['pdf'], statement['expected']
+"""
+
+import io
+import random
+
+NAME_WORDS = [
+    "ACACIA", "BANKSIA", "COASTAL", "DUNE", "EASTERN", "FIG", "GOLDEN", "HARBOUR",
+    "IRONBARK", "JARRAH", "KOALA", "LAKESIDE", "MALLEE", "NORTHERN", "OUTBACK", "PEARL",
+    "QUARRY", "RIVERINA", "SOUTHERN", "TASMAN", "URBAN", "VALLEY", "WATTLE", "YARRA"
+]
+NAME_SUFFIXES = [
+    "HOLDINGS", "INVESTMENTS", "CONSULTING", "PROPERTY", "SUPER FUND", "TRADING",
+    "NOMINEES", "& CO", "DEVELOPMENTS", "SERVICES"
+]
+NAME_ENDINGS = ["PTY LTD", "PTY LTD", "PTY LTD", "LIMITED", "LTD"]
+
+# Annual review fees with the review type as it appears on the statement
+REVIEW_FEES = [
+    ("Annual Review - Special Purpose Pty Co", "65.00"),
+    ("Annual Review - Special Purpose Pty Co", "67.00"),
+    ("Annual Review - Proprietary Company", "321.00"),
+    ("Annual Review - Proprietary Company", "329.00"),
+    ("Annual Review - Public Company", "1451.00"),
+]
+LATE_FEES = ["0.00", "96.00", "398.00"]
+
+ATTACHMENT_LINE = "Registered office and principal place of business details as recorded by ASIC on {date}"
+LINES_PER_PAGE = 60
+
+def acn_check_digit(digits):
+    """ASIC ACN check digit for the first eight digits"""
+    total = sum(int(digit) * weight for digit, weight in zip(digits, range(8, 0, -1)))
+    return str((10 - total % 10) % 10)
+
+def luhn_check_digit(digits):
+    """Luhn (mod 10) check digit, as used on BPay customer references"""
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit) * (2 if position % 2 == 0 else 1)
+        total += value - 9 if value > 9 else value
+    return str((10 - total % 10) % 10)
+
+def random_statement(rng):
+    """Fields for one random statement, in the shape extract_asic_data returns"""
+    acn_prefix = f"{rng.randrange(10 ** 8):08d}"
+    acn = acn_prefix + acn_check_digit(acn_prefix)
+    
+    bpay_prefix = "2291" + acn[:8]
+    review, fee = rng.choice(REVIEW_FEES)
+    late_fee = rng.choice(LATE_FEES)
+    amount = f"{float(fee) + float(late_fee):.2f}"
+    
+    company_name = " ".join([
+        rng.choice(NAME_WORDS),
+        *([rng.choice(NAME_WORDS)] if rng.random() < 0.4 else []),
+        rng.choice(NAME_SUFFIXES),
+        rng.choice(NAME_ENDINGS)
+    ])
+    
+    asic_reference = "".join(rng.choice("0123456789ABCDEFGHJKLMNPQRSTUVWXYZ") for _ in range(13))
+    
+    return {
+        'company_name': company_name,
+        'acn': acn,
+        'amount': amount,
+        'asic_reference': asic_reference + rng.choice("ABCDEFGHJK"),
+        'bpay_reference': bpay_prefix + luhn_check_digit(bpay_prefix),
+        'review': review,
+        'issue_date': f"{rng.randint(1, 28):02d} {rng.choice(['Jan', 'Apr', 'Jul', 'Oct'])} 25",
+    }
+
+def statement_pages(statement, attachment_pages=0):
+    """Lines of text for each page of a statement"""
+    acn = statement['acn']
+    bpay = statement['bpay_reference']
+    reference = statement['asic_reference']
+    cents = int(round(float(statement['amount']) * 100))
+    
+    first_page = [
+        "Australian Securities & Investments Commission",
+        "Company statement",
+        f"ACN {acn[:3]} {acn[3:6]} {acn[6:]}",
+        f"FOR {statement['company_name']}",
+        f"Issue date {statement['issue_date']}",
+        "",
+        "Amount due",
+        f"{statement['review']} {reference[:-1]} {reference[-1]} ${statement['amount']}",
+        "",
+        "Payment slip",
+        "Biller Code: 17301",
+        f"Ref: {bpay[:4]} {bpay[4:8]} {bpay[8:12]} {bpay[12:]}",
+        bpay,
+        f"*814 {bpay} {cents:05d} *",
+    ]
+    
+    attachment = [
+        ATTACHMENT_LINE.format(date=statement['issue_date'])
+    ] * LINES_PER_PAGE
+    
+    return [first_page] + [attachment] * attachment_pages
+
+def _pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def build_pdf(pages):
+    """Minimal PDF with one Helvetica text page per list of lines"""
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    kids = []
+    number = 4
+    for lines in pages:
+        page_number, content_number = number, number + 1
+        number += 2
+        kids.append(f"{page_number} 0 R")
+        
+        operators = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        operators.extend(f"({_pdf_string(line)}) Tj T*" for line in lines)
+        operators.append("ET")
+        stream = "\n".join(operators).encode("latin-1")
+        
+        objects[content_number] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        objects[page_number] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_number
+        )
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(kids).encode(), len(pages))
+    
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for object_number in range(1, number):
+        offsets.append(output.tell())
+        output.write(b"%d 0 obj\n%s\nendobj\n" % (object_number, objects[object_number]))
+    
+    xref = output.tell()
+    output.write(b"xref\n0 %d\n0000000000 65535 f \n" % number)
+    for offset in offsets:
+        output.write(b"%010d 00000 n \n" % offset)
+    output.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (number, xref))
+    
+    return output.getvalue()
+
+def generate_statements(count, seed=0, max_attachment_pages=3):
+    """Yield count synthetic statements as dicts of filename, pdf, pages and expected fields"""
+    rng = random.Random(seed)
+    for index in range(count):
+        statement = random_statement(rng)
+        attachment_pages = rng.randint(0, max_attachment_pages)
+        expected = {field: statement[field] for field in (
+            'company_name', 'acn', 'amount', 'asic_reference', 'bpay_reference'
+        )}
+        
+        yield {
+            'filename': f"statement_{index:05d}_{statement['acn']}.pdf",
+            'pdf': build_pdf(statement_pages(statement, attachment_pages)),
+            'pages': attachment_pages + 1,
+            'expected': expected,
+        }
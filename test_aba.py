@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from app import format_aba_amount, generate_aba_file
+from asic_batch.aba import format_aba_amount, generate_aba_file
 from datetime import datetime
 
 # Test data similar to what would be extracted from ASIC PDF
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from asic_batch.aba import (
+    ABA_RECORD_BYTES,
+    aba_shard_filename,
+    max_total_cents_from_env,
+    plan_aba_shards,
+    write_aba_shards,
+)
+from asic_batch.cli import main
+from asic_batch.storage import commit_batch, get_batch_manifest, init_database, set_database_path
+from benchmarks.synthetic import generate_statements
+
+# Worker pools start by spawn, which imports this script again in each worker
+# as __mp_main__ - run the tests only in the parent (a script or under pytest)
+if __name__ != "__mp_main__":
+    print("Testing ABA batch sharding...")
+    print("-" * 60)
+    
+    def payment(index, amount):
+        return {
+            'company_name': f"COMPANY {index} PTY LTD",
+            'acn': f"{index:09d}",
+            'amount': amount,
+            'asic_reference': f"4X{index:011d}A",
+            'bpay_reference': f"{index:013d}",
+            'file_hash': f"hash-{index}"
+        }
+    
+    payments = [payment(i, "100.00") for i in range(10)]
+    assert [len(shard) for shard in plan_aba_shards(payments)] == [10]
+    assert [len(shard) for shard in plan_aba_shards(payments, max_records=4)] == [3, 3, 3, 1]
+    assert [len(shard) for shard in plan_aba_shards(payments, max_total_cents=25000)] == [2, 2, 2, 2, 2]
+    assert [len(shard) for shard in plan_aba_shards(payments, max_bytes=7 * ABA_RECORD_BYTES)] == [4, 4, 2]
+    assert [asic_data['file_hash'] for shard in plan_aba_shards(payments, max_records=4) for asic_data in shard] == [
+        asic_data['file_hash'] for asic_data in payments
+    ]
+    try:
+        plan_aba_shards([payment(0, "500.00")], max_total_cents=25000)
+        assert False, "payment over the per-file total accepted"
+    except ValueError:
+        pass
+    print("✓ Batches split by record count, total and file size, keeping payment order")
+    
+    os.environ["TEST_ABA_MAX_TOTAL"] = "$50,000"
+    assert max_total_cents_from_env("TEST_ABA_MAX_TOTAL") == 5000000
+    os.environ["TEST_ABA_MAX_TOTAL"] = "1e12"
+    assert max_total_cents_from_env("TEST_ABA_MAX_TOTAL") == 9999999999
+    for configured in ("50k", "0", "-100"):
+        os.environ["TEST_ABA_MAX_TOTAL"] = configured
+        try:
+            max_total_cents_from_env("TEST_ABA_MAX_TOTAL")
+            assert False, f"{configured!r} accepted"
+        except ValueError as e:
+            assert str(e).startswith("TEST_ABA_MAX_TOTAL must be"), e
+    del os.environ["TEST_ABA_MAX_TOTAL"]
+    print("✓ The per-file total limit is read from the environment, naming the variable when it is invalid")
+    
+    assert aba_shard_filename("ASIC_Batch.ABA", 1, 1) == "ASIC_Batch.ABA"
+    assert aba_shard_filename("ASIC_Batch.ABA", 2, 3) == "ASIC_Batch_part02of03.ABA"
+    assert aba_shard_filename("ASIC_Batch.ABA", 7, 120) == "ASIC_Batch_part007of120.ABA"
+    
+    shards = plan_aba_shards(payments, max_records=4)
+    bank_details = ("063245", "10758330", "TT Accountancy Pty Ltd", datetime(2025, 7, 28), "301500")
+    serial = write_aba_shards(shards, *bank_details, max_workers=1)
+    parallel = write_aba_shards(shards, *bank_details, max_workers=2)
+    assert [stats['content'] for stats in serial] == [stats['content'] for stats in parallel]
+    for shard, stats in zip(shards, parallel):
+        records = stats['content'].split(b"\r\n")[:-1]
+        assert records[0][:1] == b"0" and records[-1][:1] == b"7"
+        assert len(records) == len(shard) + 3 and stats['record_count'] == len(shard) + 1
+        debit, trailer = records[-2], records[-1]
+        assert debit[18:20] == b"13" and debit[20:30] == trailer[30:40] == trailer[40:50] == b"%010d" % stats['total_cents']
+        assert int(trailer[74:80]) == stats['record_count']
+    print(f"✓ {len(shards)} balanced ABA files written in parallel, identical to serial output")
+    
+    db_dir = tempfile.mkdtemp()
+    set_database_path(os.path.join(db_dir, "test_statements.db"))
+    init_database()
+    commit = commit_batch("batch_sharded", "ASIC_Batch_manifest.json", payments, shards=[
+        {
+            'aba_filename': aba_shard_filename("ASIC_Batch.ABA", number, len(shards)),
+            'statements': shard,
+            'record_count': stats['record_count'],
+            'sha256': stats['sha256']
+        }
+        for number, (shard, stats) in enumerate(zip(shards, parallel), 1)
+    ])
+    assert commit['committed'] and commit['saved_count'] == len(payments)
+    manifest = get_batch_manifest("batch_sharded")
+    assert manifest['aba_filename'] == "ASIC_Batch_manifest.json" and manifest['record_count'] == 14
+    assert [shard['aba_filename'] for shard in manifest['shards']] == [
+        "ASIC_Batch_part01of04.ABA", "ASIC_Batch_part02of04.ABA",
+        "ASIC_Batch_part03of04.ABA", "ASIC_Batch_part04of04.ABA"
+    ]
+    assert [shard['file_hashes'] for shard in manifest['shards']] == [
+        [asic_data['file_hash'] for asic_data in shard] for shard in shards
+    ]
+    assert manifest['shards'][0]['sha256'] == parallel[0]['sha256']
+    assert sum(shard['total_cents'] for shard in manifest['shards']) == manifest['total_cents'] == 100000
+    assert get_batch_manifest("batch_missing") is None
+    print("✓ Manifest ties every shard and its statements to the batch")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        inbox = os.path.join(temp_dir, "inbox")
+        os.makedirs(inbox)
+        for statement in generate_statements(5, seed=18):
+            with open(os.path.join(inbox, statement['filename']), "wb") as f:
+                f.write(statement['pdf'])
+        output_dir = os.path.join(temp_dir, "aba")
+        summary_path = os.path.join(temp_dir, "summary.json")
+        status = main([
+            "process", inbox, "--output-dir", output_dir, "--summary", summary_path,
+            "--db", os.path.join(temp_dir, "cli.db"), "--workers", "2", "--max-records", "3",
+            "--date", "2025-07-28"
+        ])
+        with open(summary_path) as f:
+            summary = json.load(f)
+        assert status == 0 and summary['aba_file'] is None and len(summary['aba_files']) == 3
+        assert sorted(os.listdir(output_dir)) == sorted(
+            [os.path.basename(path) for path in summary['aba_files']] + [os.path.basename(summary['manifest'])]
+        )
+        with open(summary['manifest']) as f:
+            manifest = json.load(f)
+        assert manifest['batch_id'] == summary['batch_id'] and manifest['statement_count'] == 5
+        assert [len(shard['file_hashes']) for shard in manifest['shards']] == [2, 2, 1]
+        assert manifest['total_amount'] == summary['total_amount']
+    print("✓ CLI writes each shard and a manifest when a batch is over the limits")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        inbox = os.path.join(temp_dir, "inbox")
+        os.makedirs(inbox)
+        for statement in generate_statements(5, seed=18):
+            with open(os.path.join(inbox, statement['filename']), "wb") as f:
+                f.write(statement['pdf'])
+        args = ["process", inbox, "--workers", "1", "--date", "2025-07-28"]
+        
+        # A malformed limit is a usage error, not a traceback
+        for max_total in ("12x", "0"):
+            try:
+                main(args + ["--max-total", max_total])
+                assert False, f"--max-total {max_total} accepted"
+            except SystemExit as e:
+                assert e.code == 2
+        
+        # The 1849.00 payment can't fit in a $1000 file; the other four are paid in two
+        summary_path = os.path.join(temp_dir, "summary.json")
+        status = main(args + [
+            "--db", os.path.join(temp_dir, "cli.db"), "--output-dir", os.path.join(temp_dir, "aba"),
+            "--summary", summary_path, "--max-total", "1000"
+        ])
+        with open(summary_path) as f:
+            summary = json.load(f)
+        assert status == 1
+        statuses = {row['amount']: (row['status'], row['detail']) for row in summary['statements']}
+        assert statuses["1849.00"] == ("over_limit", "amount 1849.00 is over the 1000.00 limit for one ABA file")
+        assert [status for status, _ in statuses.values()].count("processed") == 4
+        assert len(summary['aba_files']) == 2 and summary['total_amount'] == "1680.00"
+        
+        # Limits no payment fits in stop the batch before anything is written
+        summary_path = os.path.join(temp_dir, "no_room.json")
+        output_dir = os.path.join(temp_dir, "no_room")
+        status = main(args + [
+            "--db", os.path.join(temp_dir, "no_room.db"), "--output-dir", output_dir,
+            "--summary", summary_path, "--max-records", "1"
+        ])
+        with open(summary_path) as f:
+            summary = json.load(f)
+        assert status == 1 and summary['aba_errors'] == ["ABA file limits leave no room for a payment"]
+        assert summary['batch_id'] is None and not os.path.exists(output_dir)
+        assert [row['status'] for row in summary['statements']] == ["new"] * 5
+        
+        # An output directory that can't be created is reported, with no batch recorded
+        summary_path = os.path.join(temp_dir, "unwritable.json")
+        output_dir = os.path.join(temp_dir, "not_a_directory")
+        with open(output_dir, "w") as f:
+            f.write("in the way")
+        status = main(args + [
+            "--db", os.path.join(temp_dir, "unwritable.db"), "--output-dir", output_dir, "--summary", summary_path
+        ])
+        with open(summary_path) as f:
+            summary = json.load(f)
+        assert status == 1 and summary['batch_id'] is None and summary['statement_count'] == 0
+        assert len(summary['aba_errors']) == 1 and "not_a_directory" in summary['aba_errors'][0]
+        assert [row['status'] for row in summary['statements']] == ["new"] * 5
+    print("✓ CLI reports payments over the per-file total and rejects malformed limits")
+    print("✓ CLI reports ABA files it could not write instead of raising")
+    
+    print("-" * 60)
+    print("All ABA sharding tests passed!")
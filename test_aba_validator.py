@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from asic_batch.aba import generate_aba_file, write_aba_shards
+from asic_batch.aba_validator import (
+    ABAIssue,
+    ABAValidationError,
+    iter_aba_records,
+    parse_record,
+    validate_aba,
+    validate_aba_file,
+)
+from asic_batch.cli import main
+from benchmarks.synthetic import generate_statements
+
+# Worker pools start by spawn, which imports this script again in each worker
+# as __mp_main__ - run the tests only in the parent (a script or under pytest)
+if __name__ != "__mp_main__":
+    print("Testing ABA parsing and validation...")
+    print("-" * 60)
+    
+    def payment(index, amount):
+        return {
+            'company_name': f"COMPANY {index} PTY LTD",
+            'acn': f"{index:09d}",
+            'amount': amount,
+            'asic_reference': f"4X{index:011d}A",
+            'bpay_reference': f"{index:013d}"
+        }
+    
+    bank_details = ("063-245", "10758330", "TT Accountancy P", datetime(2025, 7, 28))
+    aba_content = generate_aba_file([payment(1, "321.00"), payment(2, "1096.85")], *bank_details)
+    records = aba_content.split("\r\n")[:-1]
+    
+    def validate(lines, **kwargs):
+        return validate_aba(io.BytesIO("".join(line + "\r\n" for line in lines).encode("latin-1")), **kwargs)
+    
+    def replace(record, column, text):
+        return record[:column - 1] + text + record[column - 1 + len(text):]
+    
+    report = validate(records, require_balanced=True)
+    assert report.valid and report.errors == [] and report.line_count == 5
+    assert (report.credit_count, report.credit_total_cents) == (2, 141785)
+    assert (report.debit_count, report.debit_total_cents) == (1, 141785)
+    assert report.descriptive['user_name'] == "TT Accountancy P" and report.descriptive['processing_date'] == "2025-07-28"
+    assert report.totals == {'net_total_cents': 0, 'credit_total_cents': 141785, 'debit_total_cents': 141785, 'record_count': 3}
+    assert validate_aba(io.BytesIO(aba_content.replace("\r\n", "\n").encode("ascii"))).valid
+    print("✓ Generated files validate, with totals read back from the records")
+    
+    assert parse_record(records[1]) == {
+        'record_type': "1", 'bsb': "093-003", 'account_number': "317118", 'indicator': "N",
+        'transaction_code': "53", 'amount_cents': 32100, 'account_title': "ASIC",
+        'lodgement_reference': "0000000000001", 'trace_bsb': "063-245", 'trace_account_number': "10758330",
+        'remitter_name': "TT Accountancy P", 'withholding_cents': 0
+    }
+    parsed = list(iter_aba_records(io.BytesIO(aba_content.encode("ascii"))))
+    assert [line_number for line_number, _ in parsed] == [1, 2, 3, 4, 5]
+    assert [fields['record_type'] for _, fields in parsed] == ["0", "1", "1", "1", "7"]
+    assert parsed[-1][1]['record_count'] == 3
+    print("✓ Records parse back into their fields")
+    
+    # Each broken file reports the first column of the bad field (or character)
+    # first; a record that cannot be counted also throws out the trailer totals
+    cases = [
+        ([records[0], replace(records[1], 2, "093003 ")] + records[2:], ABAIssue(2, 2, "BSB must be in the format 000-000, got '093003 '")),
+        ([records[0], replace(records[1], 19, "99")] + records[2:], ABAIssue(2, 19, "unknown transaction code '99' (expected 13 or 50-57)")),
+        ([records[0], replace(records[1], 25, "x")] + records[2:], ABAIssue(2, 25, "amount must be 10 digits, got '0000x32100'")),
+        ([replace(records[0], 75, "290224")] + records[1:], None),
+        ([replace(records[0], 75, "320725")] + records[1:], ABAIssue(1, 75, "processing date '320725' is not a valid DDMMYY date")),
+        ([records[0], records[1] + " "] + records[2:], ABAIssue(2, 121, "record is 121 characters long, expected 120")),
+        ([records[0], records[1][:100]] + records[2:], ABAIssue(2, 101, "record is 100 characters long, expected 120")),
+        ([records[0], replace(records[1], 1, "5")] + records[2:], ABAIssue(2, 1, "unknown record type '5' (expected 0, 1 or 7)")),
+        ([records[0], replace(records[1], 9, "317118   ")] + records[2:], ABAIssue(2, 9, "account number must be right-justified, got '317118   '")),
+        ([records[0], replace(records[1], 40, "\xe9")] + records[2:], ABAIssue(2, 40, "account title contains a character that is not printable ASCII")),
+        (records[:4], ABAIssue(5, 1, "file has no file total (type 7) record")),
+        (records + [records[1]], ABAIssue(6, 1, "detail record after the file total record")),
+        (records[1:], ABAIssue(1, 1, "detail record before the descriptive record")),
+        (records[:4] + [replace(records[4], 75, "000004")], ABAIssue(5, 75, "record count 4 does not match the 3 detail records")),
+        (records[:4] + [replace(records[4], 31, "0000141786")], ABAIssue(5, 31, "credit total 141786 does not match the detail records' 141785")),
+        (records[:4] + [replace(records[4], 21, "0000000001")], ABAIssue(5, 21, "net total 1 is not the difference between the credit and debit totals")),
+        ([], ABAIssue(1, 1, "file is empty")),
+    ]
+    for lines, expected in cases:
+        report = validate(lines)
+        assert report.errors[:1] == ([expected] if expected else []), (expected, report.errors)
+    
+    # A detail record with a wrong amount also throws the trailer out, at its own column
+    report = validate([records[0], replace(records[1], 21, "0000032101")] + records[2:])
+    assert report.errors == [ABAIssue(5, 31, "credit total 141785 does not match the detail records' 141786")]
+    unbalanced = records[:3] + [replace(replace(replace(records[4], 21, "0000141785"), 41, "0000000000"), 75, "000002")]
+    assert validate(unbalanced).valid and not validate(unbalanced, require_balanced=True).valid
+    print("✓ Errors are reported at their line and column")
+    
+    # 250 bad BSBs, then the trailer's credit total and record count
+    report = validate([records[0]] + [replace(records[1], 2, "bad-bsb")] * 250 + records[2:], max_errors=20)
+    assert not report.valid and len(report.errors) == 20 and report.error_count == 252
+    print("✓ Reported errors are capped, the rest counted")
+    
+    try:
+        generate_aba_file([payment(1, "321.00")], "06324", "10758330", "TT Accountancy P", datetime(2025, 7, 28))
+        assert False, "ABA file with a 5-digit BSB accepted"
+    except ABAValidationError as e:
+        assert e.report.errors[0] == ABAIssue(2, 120, "record is 119 characters long, expected 120")
+    try:
+        write_aba_shards([[payment(1, "1.00")], [payment(2, "2.00")]], "063245", "10758330", "TT", datetime(2025, 7, 28), "30150", max_workers=2)
+        assert False, "ABA files with a 5-digit APCA number accepted"
+    except ABAValidationError as e:
+        assert e.report.errors == [ABAIssue(1, 120, "record is 119 characters long, expected 120")]
+    print("✓ Generated files are rejected before release when the bank details break the layout")
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        good_path = os.path.join(temp_dir, "good.ABA")
+        bad_path = os.path.join(temp_dir, "bad.ABA")
+        with open(good_path, "w", newline="") as f:
+            f.write(aba_content)
+        with open(bad_path, "w", newline="") as f:
+            f.write("\r\n".join(records[:4]) + "\r\n")
+        assert validate_aba_file(good_path).valid
+        assert main(["validate", good_path]) == 0
+        assert main(["validate", good_path, bad_path]) == 1
+        assert main(["validate", "--balanced", "--json", good_path]) == 0
+    
+        inbox = os.path.join(temp_dir, "inbox")
+        os.makedirs(inbox)
+        for statement in generate_statements(2, seed=19):
+            with open(os.path.join(inbox, statement['filename']), "wb") as f:
+                f.write(statement['pdf'])
+        output_dir = os.path.join(temp_dir, "aba")
+        summary_path = os.path.join(temp_dir, "summary.json")
+        status = main([
+            "process", inbox, "--output-dir", output_dir, "--summary", summary_path,
+            "--db", os.path.join(temp_dir, "cli.db"), "--workers", "1", "--bsb", "06324"
+        ])
+        with open(summary_path) as f:
+            summary = json.load(f)
+        assert status == 1 and summary['batch_id'] is None and summary['aba_files'] == []
+        assert summary['aba_errors'] and os.listdir(output_dir) == []
+    print("✓ CLI validates existing files and publishes no ABA file that fails validation")
+    
+    print("-" * 60)
+    print("All ABA validation tests passed!")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import io
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+from asic_batch.aba import format_aba_amount, generate_aba_file, write_aba_file
+
+test_asic_data = {
+    'company_name': 'ZYH PTY LTD',
+    'acn': '612433502',
+    'amount': '321.00',
+    'asic_reference': '4X9702542480BA',
+    'bpay_reference': '2296124335029'
+}
+
+print("Testing streaming ABA writer...")
+print("-" * 60)
+
+# Same bytes as the string generator produced before streaming was added
+expected = (
+    "0                 01CBA       TT Accountancy P          301500ASIC        280725                                        \r\n"
+    "1093-003   317118N530000032100ASIC                            2296124335029     063-245 10758330TT Accountancy P00000000\r\n"
+    "1063-245 10758330 130000032100Business                        28July25          063-245 10758330TT Accountancy P00000000\r\n"
+    "7999-999            000000000000000321000000032100                        000002                                        \r\n"
+)
+aba_content = generate_aba_file(test_asic_data, "063-245", "10758330", "TT Accountancy P", datetime(2025, 7, 28))
+assert aba_content == expected
+print("✓ Output identical to the previous generator")
+
+output = io.BytesIO()
+summary = write_aba_file([test_asic_data], output, "063-245", "10758330", "TT Accountancy P", datetime(2025, 7, 28))
+assert output.getvalue() == expected.encode("ascii")
+assert summary == {'credit_count': 1, 'record_count': 2, 'total_cents': 32100}
+print(f"✓ write_aba_file wrote the same bytes, summary {summary}")
+
+# Integer cents - float arithmetic used to truncate these by a cent
+for amount, cents in [("1.13", "0000000113"), ("0.29", "0000000029"), ("1297.10", "0000129710")]:
+    assert format_aba_amount(amount) == cents, (amount, format_aba_amount(amount))
+amounts = ["0.29", "1.13", "1297.10", "1096.85"]
+payments = [dict(test_asic_data, amount=amount) for amount in amounts]
+output = io.BytesIO()
+summary = write_aba_file(payments, output, "063245", "10758330", "TT Accountancy Pty Ltd", datetime(2025, 7, 28))
+assert summary['total_cents'] == 29 + 113 + 129710 + 109685
+trailer = output.getvalue().split(b"\r\n")[-2]
+assert trailer[30:40] == trailer[40:50] == b"%010d" % summary['total_cents']
+print("✓ Amounts and totals exact in cents")
+
+# A large batch streamed from a generator straight to disk
+def many_payments(count):
+    for i in range(count):
+        yield dict(test_asic_data, amount=f"{i % 500}.{i % 100:02d}", bpay_reference=f"{i:013d}")
+
+path = os.path.join(tempfile.mkdtemp(), "large.ABA")
+tracemalloc.start()
+with open(path, "wb") as f:
+    summary = write_aba_file(many_payments(20000), f, "063245", "10758330", "TT Accountancy Pty Ltd", datetime(2025, 7, 28))
+peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+
+assert summary['record_count'] == 20001
+assert os.path.getsize(path) == (20000 + 3) * 122
+assert peak < 1024 * 1024, f"peak {peak} bytes"
+print(f"✓ 20,000 records streamed to disk, peak traced memory {peak / 1024:.0f} KiB")
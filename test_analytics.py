@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import csv
+import io
+import os
+import tempfile
+from datetime import date
+
+from asic_batch.analytics import export_statements, parquet_available, payment_summary, payment_totals
+from asic_batch.cli import main
+from asic_batch.storage import (
+    commit_batch,
+    db_connection,
+    init_database,
+    iter_statement_rows,
+    set_database_path,
+)
+
+print("Testing payment analytics...")
+print("-" * 60)
+
+db_dir = tempfile.mkdtemp()
+db_path = os.path.join(db_dir, "test_statements.db")
+set_database_path(db_path)
+init_database()
+
+def statement(index, amount, acn=None):
+    return {
+        'company_name': f"COMPANY {index} PTY LTD",
+        'acn': acn or f"{index:09d}",
+        'amount': amount,
+        'asic_reference': f"4X{index:011d}A",
+        'bpay_reference': f"22{index:011d}",
+        'file_hash': f"hash-{index}"
+    }
+
+def commit(batch_id, processed_date, *shards):
+    statements = [asic_data for shard in shards for asic_data in shard]
+    result = commit_batch(batch_id, f"{batch_id}.ABA", statements, shards=[
+        {'aba_filename': f"{batch_id}_part{number}.ABA", 'statements': shard, 'record_count': len(shard) + 1}
+        for number, shard in enumerate(shards, 1)
+    ])
+    assert result['committed']
+    with db_connection() as conn:
+        conn.execute("UPDATE processed_statements SET processed_date = ? WHERE batch_id = ?", (processed_date, batch_id))
+        conn.commit()
+
+# Two June batches (one split into two ABA files) and one in July; company 1 pays twice
+commit("batch_20250602", "2025-06-02 10:00:00", [statement(1, "0.10"), statement(2, "321.00")])
+commit("batch_20250616", "2025-06-16 10:00:00", [statement(3, "0.20")], [statement(4, "321.00"), statement(5, "65.00", acn="000000001")])
+commit("batch_20250701", "2025-07-01 09:00:00", [statement(6, "1096.85"), statement(7, "321.00")])
+
+assert payment_summary('month') == [
+    {'month': "2025-06", 'statement_count': 5, 'total_cents': 70730},
+    {'month': "2025-07", 'statement_count': 2, 'total_cents': 141785},
+]
+companies = payment_summary('company')
+assert companies[0] == {
+    'acn': "000000006", 'company_name': "COMPANY 6 PTY LTD", 'statement_count': 1,
+    'total_cents': 109685, 'last_processed': "2025-07-01 09:00:00"
+}
+assert [(row['acn'], row['statement_count'], row['total_cents']) for row in companies if row['acn'] == "000000001"] == [("000000001", 2, 6510)]
+assert payment_summary('batch') == [
+    {'batch_id': "batch_20250701", 'processed_date': "2025-07-01 09:00:00", 'statement_count': 2, 'total_cents': 141785, 'file_count': 1},
+    {'batch_id': "batch_20250616", 'processed_date': "2025-06-16 10:00:00", 'statement_count': 3, 'total_cents': 38620, 'file_count': 2},
+    {'batch_id': "batch_20250602", 'processed_date': "2025-06-02 10:00:00", 'statement_count': 2, 'total_cents': 32110, 'file_count': 1},
+]
+assert payment_summary('fee')[0] == {'amount_cents': 32100, 'statement_count': 3, 'total_cents': 96300}
+assert payment_summary('batch', limit=1)[0]['batch_id'] == "batch_20250701"
+assert payment_totals() == {
+    'statement_count': 7, 'total_cents': 212515, 'company_count': 6, 'batch_count': 3,
+    'first_processed': "2025-06-02 10:00:00", 'last_processed': "2025-07-01 09:00:00"
+}
+print("✓ Totals by month, company, batch and fee are exact to the cent")
+
+june = (date(2025, 6, 1), date(2025, 6, 30))
+assert [row['month'] for row in payment_summary('month', *june)] == ["2025-06"]
+assert [row['month'] for row in payment_summary('month', date(2025, 6, 16), date(2025, 7, 1))] == ["2025-06", "2025-07"]
+assert payment_summary('month', date(2025, 6, 16), date(2025, 7, 1))[0]['statement_count'] == 3
+assert payment_totals(*june)['batch_count'] == 2
+assert payment_totals(date(2025, 8, 1), date(2025, 8, 31))['statement_count'] == 0
+try:
+    payment_summary('weekday')
+    assert False, "unknown grouping accepted"
+except ValueError:
+    pass
+print("✓ Date ranges are inclusive and bound every summary")
+
+plans = {}
+with db_connection() as conn:
+    for grouping, query in [
+        ('month', "SELECT substr(processed_date, 1, 7), COUNT(*), SUM(amount) FROM processed_statements GROUP BY substr(processed_date, 1, 7)"),
+        ('company', "SELECT acn, MAX(company_name), COUNT(*), SUM(amount), MAX(processed_date) FROM processed_statements GROUP BY acn"),
+        ('fee', "SELECT amount, COUNT(*) FROM processed_statements GROUP BY amount"),
+    ]:
+        plans[grouping] = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query))
+assert "COVERING INDEX idx_processed_statements_month" in plans['month']
+assert "COVERING INDEX idx_processed_statements_company" in plans['company']
+assert "COVERING INDEX idx_processed_statements_fee" in plans['fee']
+assert all("TEMP B-TREE FOR GROUP BY" not in plan for plan in plans.values())
+print("✓ Summaries read covering indexes, never the table")
+
+# Cached until a batch is committed, by this process or any other
+before = payment_summary('month')
+assert payment_summary('month') is before
+commit("batch_20250702", "2025-07-02 09:00:00", [statement(8, "87.00")])
+after = payment_summary('month')
+assert after is not before and after[-1]['statement_count'] == 3
+assert payment_totals()['statement_count'] == 8
+print("✓ Cached summaries are dropped when a batch is committed")
+
+chunks = list(iter_statement_rows(chunk_size=3))
+assert [len(rows) for rows in chunks] == [3, 3, 2]
+assert [row[0] for rows in chunks for row in rows] == [1, 2, 3, 4, 5, 6, 7, 8]
+assert chunks[0][0][5] == "0.10"
+assert [len(rows) for rows in iter_statement_rows(*june, chunk_size=5)] == [5]
+
+output = io.BytesIO()
+assert export_statements(output, 'csv', chunk_size=3) == 8
+rows = list(csv.DictReader(io.StringIO(output.getvalue().decode("utf-8"))))
+assert [row['id'] for row in rows] == [str(index) for index in range(1, 9)]
+assert rows[5]['amount'] == "1096.85" and rows[5]['batch_id'] == "batch_20250701"
+assert not output.closed
+print("✓ CSV export streams every statement in chunks")
+
+if parquet_available():
+    import pyarrow.parquet as pq
+    
+    parquet_path = os.path.join(db_dir, "statements.parquet")
+    assert export_statements(parquet_path, 'parquet', chunk_size=3) == 8
+    parquet_file = pq.ParquetFile(parquet_path)
+    assert parquet_file.metadata.num_rows == 8 and parquet_file.metadata.num_row_groups == 3
+    table = parquet_file.read()
+    assert str(table.schema.field('amount').type) == "decimal128(12, 2)"
+    assert sum(table.column('amount').to_pylist()) * 100 == 212515 + 8700
+    print("✓ Parquet export writes one row group per chunk")
+else:
+    print("- pyarrow not installed, Parquet export not tested")
+
+export_path = os.path.join(db_dir, "exports", "june.csv")
+assert main(["export", export_path, "--from", "2025-06-01", "--to", "2025-06-30", "--db", db_path]) == 0
+with open(export_path, newline="") as f:
+    assert len(list(csv.DictReader(f))) == 5
+assert main(["export", os.path.join(db_dir, "june.txt"), "--db", db_path]) == 2
+print("✓ CLI exports a date range, with the format taken from the file name")
+
+print("-" * 60)
+print("All analytics tests passed!")
@@ -3,7 +3,8 @@
 import sys
 sys.path.append('.')
 
-from app import extract_asic_data, generate_aba_file
+from asic_batch.aba import generate_aba_file
+from asic_batch.extraction import extract_asic_data
 from datetime import datetime
 import io
 
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+from asic_batch.archive import iter_zip_pdfs
+from asic_batch.cli import main, read_statement_files
+from asic_batch.spool import UploadSpool
+from benchmarks.synthetic import generate_statements
+
+print("Testing ZIP archive ingestion...")
+print("-" * 60)
+
+statements = list(generate_statements(4, seed=21))
+buffer = io.BytesIO()
+with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+    archive.writestr("inbox/", "")
+    for index, statement in enumerate(statements):
+        folder = "inbox/sub/" if index % 2 else "inbox/"
+        archive.writestr(folder + statement['filename'], statement['pdf'])
+    archive.writestr("notes.txt", "not a statement")
+    archive.writestr("__MACOSX/inbox/._statement.pdf", "resource fork")
+    archive.writestr("broken.pdf", b"%PDF-1.4 " + b"x" * 5000, compress_type=zipfile.ZIP_STORED)
+zip_bytes = bytearray(buffer.getvalue())
+# Flip a byte inside broken.pdf so its CRC check fails when read
+zip_bytes[zip_bytes.find(b"%PDF-1.4 xxxx") + 100] ^= 0xFF
+zip_bytes = bytes(zip_bytes)
+
+skipped = []
+spool = UploadSpool()
+members = list(iter_zip_pdfs(io.BytesIO(zip_bytes), spool, skipped))
+assert len(members) == len(statements)
+assert {name.rsplit("/", 1)[-1] for name, _, _ in members} == {s['filename'] for s in statements}
+assert any(name.startswith("inbox/sub/") for name, _, _ in members)
+for name, content, file_hash in members:
+    with content.open() as f:
+        assert file_hash == hashlib.sha256(f.read()).hexdigest()
+spool.close()
+print("✓ PDFs in nested folders extracted and hashed while streaming")
+
+reasons = dict(skipped)
+assert reasons["notes.txt"] == "not a PDF"
+assert reasons["__MACOSX/inbox/._statement.pdf"] == "hidden or metadata file"
+assert reasons["broken.pdf"].startswith("unreadable")
+assert "inbox/" not in reasons
+print("✓ Non-PDF, metadata and corrupt members reported as skipped")
+
+with tempfile.TemporaryDirectory() as temp_dir:
+    zip_path = os.path.join(temp_dir, "statements.zip")
+    with open(zip_path, "wb") as f:
+        f.write(zip_bytes)
+    bad_path = os.path.join(temp_dir, "bad.zip")
+    with open(bad_path, "wb") as f:
+        f.write(b"not a zip")
+    
+    uploads, upload_paths, read_seconds, skipped = read_statement_files([zip_path, bad_path], UploadSpool())
+    assert len(uploads) == len(upload_paths) == len(read_seconds) == len(statements)
+    assert all(name.startswith("statements.zip/") for name, _, _ in uploads)
+    statuses = {name: status for _, name, status, _ in skipped}
+    assert statuses["statements.zip/notes.txt"] == "skipped"
+    assert statuses["statements.zip/broken.pdf"] == "failed"
+    assert statuses["bad.zip"] == "failed"
+    print("✓ CLI reads ZIP members in place and fails corrupt archives")
+    
+    os.remove(bad_path)
+    with zipfile.ZipFile(os.path.join(temp_dir, "clean.zip"), "w") as archive:
+        archive.writestr("readme.txt", "cover note")
+        archive.writestr(statements[0]['filename'], statements[0]['pdf'])
+    summary_path = os.path.join(temp_dir, "summary.json")
+    status = main([
+        "process", os.path.join(temp_dir, "clean.zip"),
+        "--db", os.path.join(temp_dir, "test.db"),
+        "--summary", summary_path,
+        "--workers", "1",
+        "--dry-run"
+    ])
+    with open(summary_path) as f:
+        rows = {row['filename']: row for row in json.load(f)['statements']}
+    assert status == 0, status
+    assert rows["clean.zip/readme.txt"]['status'] == "skipped"
+    assert rows[f"clean.zip/{statements[0]['filename']}"]['amount'] == statements[0]['expected']['amount']
+    print("✓ Skipped non-PDF members do not affect the exit status")
+
+print("-" * 60)
+print("All ZIP archive tests passed!")
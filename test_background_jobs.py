@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import threading
+import time
+
+from asic_batch.extraction import iter_extract_batch
+from asic_batch.jobs import BackgroundJob
+from benchmarks.synthetic import generate_statements
+
+print("Testing background extraction jobs...")
+print("-" * 60)
+
+statements = list(generate_statements(6, seed=12))
+uploads = [(statement['filename'], statement['pdf']) for statement in statements]
+
+def produce(cancel_event):
+    return iter_extract_batch(uploads, max_workers=1, use_cache=False, cancel_event=cancel_event)
+
+job = BackgroundJob([filename for filename, _ in uploads], produce).start()
+assert job.wait(60) and job.error is None
+results = job.results()
+assert sorted(results) == list(range(len(uploads)))
+for index, statement in enumerate(statements):
+    assert results[index]['asic_data'] == statement['expected']
+print(f"✓ Job extracted {job.completed}/{job.total} files in the background")
+
+# Cancelling stops the job before the remaining files are started
+release = threading.Event()
+
+def slow_produce(cancel_event):
+    for index, result in produce(cancel_event):
+        yield index, result
+        release.wait(5)
+
+job = BackgroundJob([filename for filename, _ in uploads], slow_produce).start()
+while job.completed == 0 and not job.done:
+    time.sleep(0.01)
+job.cancel()
+release.set()
+assert job.wait(60) and job.cancelled
+assert 1 <= job.completed < len(uploads), job.completed
+print(f"✓ Cancelled job stopped after {job.completed} of {job.total} files")
+
+def failing_produce(cancel_event):
+    yield 0, {}
+    raise RuntimeError("worker pool broke")
+
+job = BackgroundJob(["a", "b"], failing_produce).start()
+assert job.wait(5) and job.error == "worker pool broke" and job.completed == 1
+print("✓ Producer errors are reported with the results finished so far")
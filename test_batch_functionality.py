@@ -3,7 +3,7 @@
 import sys
 sys.path.append('.')
 
-from app import generate_aba_file
+from asic_batch.aba import generate_aba_file
 from datetime import datetime
 
 # Test multiple ASIC payments (simulated data)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import os
+import tempfile
+
+from asic_batch.storage import (
+    check_duplicate_statement,
+    check_duplicate_statements,
+    init_database,
+    save_processed_statement,
+    set_database_path,
+)
+
+# Use a throwaway database so the real statement history is never touched
+db_dir = tempfile.mkdtemp()
+set_database_path(os.path.join(db_dir, "test_statements.db"))
+init_database()
+
+processed = {
+    'company_name': 'ZYH PTY LTD',
+    'acn': '612433502',
+    'amount': '321.00',
+    'asic_reference': '4X9702542480BA',
+    'bpay_reference': '2296124335029'
+}
+save_processed_statement(processed, "hash-zyh", "ASIC_Batch_1companies_20250728.ABA", "batch_20250728_090000")
+
+print("Testing batch duplicate detection...")
+print("-" * 60)
+
+upload = [
+    ("hash-zyh", "9Z9999999999ZZ", "9999999999999"),        # same file as history
+    ("hash-rescan", "4X9702542480BA", "2296124335029"),     # same payment, different file
+    ("hash-abc", "5A8703653491CB", "3307135446140"),        # new
+    ("hash-abc", "5A8703653491CB", "3307135446140"),        # same file twice in upload
+    ("hash-abc-rescan", "5A8703653491CB", "3307135446140"), # same payment twice in upload
+    ("hash-xyz", "6B9814764502DC", "4418246557251"),        # new
+]
+
+results = check_duplicate_statements(upload)
+for (file_hash, _, _), result in zip(upload, results):
+    print(f"  {file_hash:<16} file={result['file_duplicate'] is not None!s:<5} "
+          f"payment={result['payment_duplicate'] is not None!s:<5} upload={result['upload_duplicate']}")
+
+assert results[0]['file_duplicate'][2] == "ASIC_Batch_1companies_20250728.ABA"
+assert results[1]['payment_duplicate'] is not None and results[1]['file_duplicate'] is None
+assert results[2] == {'file_duplicate': None, 'payment_duplicate': None, 'upload_duplicate': None}
+assert results[3]['upload_duplicate'] == 2
+assert results[4]['upload_duplicate'] == 2
+assert results[5] == {'file_duplicate': None, 'payment_duplicate': None, 'upload_duplicate': None}
+
+# The batch check must agree with the per-file check against history
+for file_hash, asic_reference, bpay_reference in upload:
+    single = check_duplicate_statement(file_hash, asic_reference, bpay_reference)
+    batch = check_duplicate_statements([(file_hash, asic_reference, bpay_reference)])[0]
+    assert single['file_duplicate'] == batch['file_duplicate']
+    assert single['payment_duplicate'] == batch['payment_duplicate']
+
+print("✓ Batch duplicate check matches per-file check and flags in-upload duplicates")
+
+print("\nTesting transactional batch commit...")
+print("-" * 60)
+
+from asic_batch.storage import commit_batch, db_connection, new_batch_id
+
+def count_rows(table):
+    with db_connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+batch = [
+    dict(processed, company_name='ABC CORP PTY LTD', amount='450.00', asic_reference='5A8703653491CB',
+         bpay_reference='3307135446140', file_hash='hash-abc'),
+    dict(processed, company_name='XYZ ENTERPRISES PTY LTD', amount='275.50', asic_reference='6B9814764502DC',
+         bpay_reference='4418246557251', file_hash='hash-xyz'),
+]
+
+result = commit_batch("batch_20250801_100000", "ASIC_Batch_2companies_20250801.ABA", batch)
+assert result == {'committed': True, 'saved_count': 2, 'conflicts': [], 'error': None}
+with db_connection() as conn:
+    header = conn.execute(
+        "SELECT aba_filename, statement_count, total_cents, record_count FROM batches WHERE batch_id = ?",
+        ("batch_20250801_100000",)
+    ).fetchone()
+assert header == ("ASIC_Batch_2companies_20250801.ABA", 2, 72550, 3), header
+print(f"✓ Batch committed with header {header}")
+
+# A batch containing an already-processed file, or a re-scan of an
+# already-processed payment, must not write anything
+statements_before = count_rows("processed_statements")
+batches_before = count_rows("batches")
+retry = [
+    dict(batch[0], file_hash='hash-new'),
+    batch[1],
+]
+result = commit_batch("batch_20250801_110000", "ASIC_Batch_2companies_20250801.ABA", retry)
+assert not result['committed']
+assert [asic_data['file_hash'] for asic_data in result['conflicts']] == ['hash-new', 'hash-xyz']
+assert count_rows("processed_statements") == statements_before
+assert count_rows("batches") == batches_before
+print("✓ Conflicting batch rolled back and reported the re-scan hash-new and hash-xyz")
+
+# Two batches generated in the same second get different ids, and a
+# batch id that is already taken is reported rather than raised
+assert new_batch_id() != new_batch_id()
+assert new_batch_id().startswith("batch_")
+result = commit_batch("batch_20250801_100000", "ASIC_Batch_1companies_20250801.ABA", [
+    dict(batch[0], asic_reference='7C0925875613ED', bpay_reference='5529357668362', file_hash='hash-same-second')
+])
+assert not result['committed'] and result['conflicts'] == []
+assert "batch_20250801_100000" in result['error']
+assert count_rows("processed_statements") == statements_before
+assert count_rows("batches") == batches_before
+print("✓ Taken batch id rolled back and reported as an error")
+
+print("\nTesting paged statement history...")
+print("-" * 60)
+
+from datetime import date
+
+from asic_batch.storage import get_statement_history
+
+# Walk the whole history two rows at a time - every row once, newest first
+pages = []
+cursor = None
+while True:
+    rows, cursor = get_statement_history(limit=2, cursor=cursor)
+    pages.append(rows)
+    if cursor is None:
+        break
+history = [row for page in pages for row in page]
+assert len(history) == count_rows("processed_statements")
+assert len({row['id'] for row in history}) == len(history)
+assert [(row['processed_date'], row['id']) for row in history] == sorted(
+    ((row['processed_date'], row['id']) for row in history), reverse=True
+)
+print(f"✓ Paged through {len(history)} statements in {len(pages)} pages")
+
+rows, cursor = get_statement_history(batch_id="batch_20250801_100000")
+assert {row['asic_reference'] for row in rows} == {
+    '5A8703653491CB', '6B9814764502DC'
+} and cursor is None
+rows, _ = get_statement_history(company_name="xyz enterprises")
+assert [row['company_name'] for row in rows] == ['XYZ ENTERPRISES PTY LTD']
+rows, _ = get_statement_history(asic_reference="5a87 0365 3491 cb")
+assert [row['company_name'] for row in rows] == ['ABC CORP PTY LTD']
+processed_on = date.fromisoformat(history[-1]['processed_date'][:10])
+assert len(get_statement_history(date_from=processed_on)[0]) == len(history)
+assert get_statement_history(date_to=date(2000, 1, 1)) == ([], None)
+print("✓ History filters by batch, company, ASIC reference and date")
+
+# acn and batch_id lookups use the leading column of the analytics indexes;
+# the single-column indexes older databases carry are dropped
+with db_connection() as conn:
+    conn.execute("CREATE INDEX idx_processed_statements_acn ON processed_statements (acn)")
+    conn.execute("CREATE INDEX idx_processed_statements_batch ON processed_statements (batch_id)")
+    conn.commit()
+init_database()
+with db_connection() as conn:
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    plans = [
+        " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN SELECT * FROM processed_statements WHERE {column} = ? ORDER BY id", ("x",)))
+        for column in ("acn", "batch_id")
+    ]
+assert not indexes & {"idx_processed_statements_acn", "idx_processed_statements_batch"}
+assert "USING INDEX idx_processed_statements_company (acn=?)" in plans[0], plans[0]
+assert "USING INDEX idx_processed_statements_batch_totals (batch_id=?)" in plans[1], plans[1]
+print("✓ ACN and batch lookups search an index, with no redundant indexes left")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import json
+import os
+import tempfile
+
+from asic_batch import dedup
+from asic_batch.cli import main
+from asic_batch.dedup import BloomFilter, DuplicateIndex, get_duplicate_index
+from asic_batch.storage import (
+    check_duplicate_statements,
+    commit_batch,
+    db_connection,
+    get_db_round_trips,
+    init_database,
+    set_database_path,
+)
+from benchmarks.synthetic import generate_statements
+
+print("Testing the in-memory duplicate index...")
+print("-" * 60)
+
+temp_dir = tempfile.mkdtemp()
+set_database_path(os.path.join(temp_dir, "test_statements.db"))
+init_database()
+
+def statement(index):
+    return {
+        'company_name': f"COMPANY {index} PTY LTD",
+        'acn': f"{index:09d}",
+        'amount': "321.00",
+        'asic_reference': f"4X{index:011d}A",
+        'bpay_reference': f"22{index:011d}",
+        'file_hash': f"hash-{index}"
+    }
+
+def claim(asic_data):
+    return (asic_data['file_hash'], asic_data['asic_reference'], asic_data['bpay_reference'])
+
+def commit(batch_id, indexes):
+    assert commit_batch(batch_id, f"{batch_id}.ABA", [statement(index) for index in indexes])['committed']
+
+commit("batch_1", range(1, 51))
+
+# Paid file, paid payment rescanned, new, new twice in the upload, paid again in the upload
+upload = [
+    claim(statement(3)),
+    ("rescan-of-7",) + claim(statement(7))[1:],
+    claim(statement(100)),
+    claim(statement(101)),
+    ("hash-101-copy",) + claim(statement(101))[1:],
+    claim(statement(3)),
+]
+expected = check_duplicate_statements(upload)
+assert [check['file_duplicate'] is not None for check in expected] == [True, False, False, False, False, True]
+assert [check['payment_duplicate'] is not None for check in expected] == [True, True, False, False, False, True]
+assert [check['upload_duplicate'] for check in expected] == [None, None, None, None, 3, 0]
+
+memory_index = DuplicateIndex()
+bloom_index = DuplicateIndex(bloom=True)
+for index in (memory_index, bloom_index):
+    assert index.check_duplicate_statements(upload) == expected
+    assert index.watermark == 50 and index.row_count == 50
+print("✓ Hash sets and Bloom filters give exactly the SQL check's results")
+
+# A new upload the index has never seen is answered without querying the statements
+new_upload = [claim(statement(index)) for index in range(1000, 1100)]
+for index in (memory_index, bloom_index):
+    before = get_db_round_trips()
+    results = index.check_duplicate_statements(new_upload)
+    assert all(check['file_duplicate'] is None and check['payment_duplicate'] is None for check in results)
+    assert get_db_round_trips() - before <= 2, get_db_round_trips() - before
+assert not any(any(memory_index.might_be_duplicate(*key)) for key in new_upload)
+print("✓ Only statements the index may have seen go to SQLite")
+
+assert memory_index.refresh() == 0
+commit("batch_2", range(1000, 1010))
+assert memory_index.refresh() == 10 and memory_index.watermark == 60 and memory_index.row_count == 60
+assert memory_index.refresh() == 0
+assert memory_index.check_duplicate_statements(new_upload[:12]) == check_duplicate_statements(new_upload[:12])
+assert bloom_index.check_duplicate_statements(new_upload[:12])[9]['file_duplicate'] is not None
+assert bloom_index.watermark == 60
+print("✓ Statements committed after loading are picked up by id watermark")
+
+# Statements removed from the history leave stale keys, which SQLite overrules
+with db_connection() as conn:
+    conn.execute("DELETE FROM processed_statements WHERE batch_id = 'batch_2' AND file_hash = 'hash-1000'")
+    conn.commit()
+assert memory_index.might_be_duplicate(*new_upload[0]) == (True, True)
+assert memory_index.check_duplicate_statements(new_upload[:1])[0]['file_duplicate'] is None
+with db_connection() as conn:
+    conn.execute("DELETE FROM processed_statements WHERE batch_id = 'batch_2'")
+    conn.commit()
+assert memory_index.refresh() == 50 and memory_index.row_count == 50
+assert memory_index.might_be_duplicate(*new_upload[5]) == (False, False)
+print("✓ Deleted statements are confirmed away, and a shrunken history is reloaded")
+
+bloom = BloomFilter(20000)
+bloom.update(hash(f"member-{index}") for index in range(20000))
+assert all(hash(f"member-{index}") in bloom for index in range(20000))
+false_positives = sum(hash(f"other-{index}") in bloom for index in range(20000))
+assert false_positives < 20000 * 0.02, false_positives
+assert bloom.nbytes < 20000 * 10 / 8 * 1.1
+print(f"✓ Bloom filter has no false negatives and {false_positives / 200:.2f}% false positives at capacity")
+
+# A Bloom filter the history outgrows is rebuilt larger
+min_capacity = dedup.BLOOM_MIN_CAPACITY
+dedup.BLOOM_MIN_CAPACITY = 40
+try:
+    small_index = DuplicateIndex(bloom=True)
+    assert small_index.refresh() == 50 and small_index._file_hashes.capacity == 100
+    commit("batch_3", range(2000, 2080))
+    assert small_index.refresh() == 130 and small_index._file_hashes.capacity == 2 * small_index.watermark
+    assert small_index.check_duplicate_statements([claim(statement(2079))])[0]['file_duplicate'] is not None
+finally:
+    dedup.BLOOM_MIN_CAPACITY = min_capacity
+print("✓ Bloom filters are rebuilt once the history outgrows them")
+
+assert get_duplicate_index('sqlite') is None
+assert get_duplicate_index('memory') is get_duplicate_index('memory')
+assert get_duplicate_index('bloom').bloom
+assert dedup.check_duplicate_statements(upload, 'memory') == dedup.check_duplicate_statements(upload, 'sqlite')
+try:
+    get_duplicate_index('redis')
+    assert False, "unknown index accepted"
+except ValueError:
+    pass
+print("✓ Shared indexes per database, or SQL checks with 'sqlite'")
+
+with tempfile.TemporaryDirectory() as cli_dir:
+    inbox = os.path.join(cli_dir, "inbox")
+    os.makedirs(inbox)
+    for generated in generate_statements(3, seed=25):
+        with open(os.path.join(inbox, generated['filename']), "wb") as f:
+            f.write(generated['pdf'])
+    args = ["process", inbox, "--db", os.path.join(cli_dir, "cli.db"), "--workers", "1", "--duplicate-index", "memory"]
+    for run, expected_status in (("first", 0), ("second", 1)):
+        summary_path = os.path.join(cli_dir, f"{run}.json")
+        status = main(args + ["--output-dir", os.path.join(cli_dir, run), "--summary", summary_path])
+        with open(summary_path) as f:
+            statuses = [row['status'] for row in json.load(f)['statements']]
+        assert status == expected_status
+        assert statuses == (["processed"] * 3 if run == "first" else ["duplicate"] * 3), statuses
+print("✓ CLI checks duplicates through the index with --duplicate-index")
+
+print("-" * 60)
+print("All duplicate index tests passed!")
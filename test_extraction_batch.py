@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import os
+import tempfile
+
+from asic_batch.extraction import EXTRACTOR_VERSION, extract_batch, iter_extract_batch
+from asic_batch.storage import get_cached_extractions, init_database, set_database_path
+from benchmarks.synthetic import generate_statements
+
+# Worker pools start by spawn, which imports this script again in each worker
+# as __mp_main__ - run the tests only in the parent (a script or under pytest)
+if __name__ != "__mp_main__":
+    print("Testing batch extraction order and failures...")
+    print("-" * 60)
+    
+    temp_dir = tempfile.mkdtemp()
+    set_database_path(os.path.join(temp_dir, "test_statements.db"))
+    init_database()
+    
+    statements = list(generate_statements(6, seed=1))
+    uploads = [(statement['filename'], statement['pdf']) for statement in statements]
+    # Not a PDF at all, in the middle of the batch
+    uploads.insert(3, ("corrupt.pdf", b"%PDF-1.4 this file was cut short"))
+    expected = [statement['expected'] for statement in statements]
+    expected.insert(3, None)
+    
+    for max_workers in (1, 3):
+        results = extract_batch(uploads, max_workers=max_workers, use_cache=False)
+        assert [result['filename'] for result in results] == [filename for filename, _ in uploads]
+        assert [result['asic_data'] for result in results] == expected
+        assert results[3]['error'] and results[3]['backend'] is None
+        assert all(result['error'] is None for position, result in enumerate(results) if position != 3)
+    print("✓ A file that fails to parse is reported for that file, and the rest of the batch is extracted")
+    
+    # Cache some of the files so they are yielded ahead of the ones still being
+    # parsed - iter_extract_batch finishes out of upload order, extract_batch doesn't
+    extract_batch([uploads[index] for index in (1, 4, 6)], max_workers=1)
+    yielded = list(iter_extract_batch(uploads, max_workers=3))
+    order = [index for index, _ in yielded]
+    assert order[:3] == [1, 4, 6] and sorted(order) == list(range(len(uploads))), order
+    assert all(result['filename'] == uploads[index][0] for index, result in yielded)
+    assert [result['cached'] for _, result in sorted(yielded, key=lambda pair: pair[0])] == [
+        False, True, False, False, True, False, True
+    ]
+    
+    results = extract_batch(uploads, max_workers=3)
+    assert [result['filename'] for result in results] == [filename for filename, _ in uploads]
+    assert [result['asic_data'] for result in results] == expected
+    print("✓ Results come back in upload order however the files finish")
+    
+    # The failed file was never cached, so it is parsed (and reported) again
+    cached = get_cached_extractions([result['file_hash'] for result in results], EXTRACTOR_VERSION)
+    assert results[3]['file_hash'] not in cached and len(cached) == 6
+    assert not results[3]['cached'] and results[3]['error']
+    print("✓ Failed files are not cached")
+    
+    print("-" * 60)
+    print("All batch extraction tests passed!")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import os
+import tempfile
+
+from asic_batch import extraction
+from asic_batch.extraction import EXTRACTOR_VERSION, extract_batch
+from asic_batch.storage import (
+    db_connection,
+    evict_extraction_cache,
+    get_cached_extractions,
+    init_database,
+    save_cached_extractions,
+    set_database_path,
+)
+from benchmarks.synthetic import generate_statements
+
+print("Testing the extraction cache...")
+print("-" * 60)
+
+temp_dir = tempfile.mkdtemp()
+set_database_path(os.path.join(temp_dir, "test_statements.db"))
+init_database()
+
+def cache_rows():
+    with db_connection() as conn:
+        return dict(conn.execute("SELECT file_hash, extractor_version FROM extraction_cache").fetchall())
+
+statements = list(generate_statements(4, seed=2))
+uploads = [(statement['filename'], statement['pdf']) for statement in statements]
+
+first = extract_batch(uploads, max_workers=1)
+assert not any(result['cached'] for result in first)
+assert cache_rows() == {result['file_hash']: EXTRACTOR_VERSION for result in first}
+
+# Same content under another name is still a hit, with the backend that read it
+renamed = [(f"copy_{filename}", content) for filename, content in uploads]
+again = extract_batch(renamed, max_workers=1)
+assert all(result['cached'] for result in again)
+assert [result['asic_data'] for result in again] == [statement['expected'] for statement in statements]
+assert [result['backend'] for result in again] == [result['backend'] for result in first] == ["pypdf2"] * 4
+print("✓ Files seen before are answered from the cache by content hash, with their backend")
+
+hashes = [result['file_hash'] for result in first]
+assert set(get_cached_extractions(hashes, EXTRACTOR_VERSION)) == set(hashes)
+assert get_cached_extractions(hashes, EXTRACTOR_VERSION + 1) == {}
+assert get_cached_extractions(["0" * 64], EXTRACTOR_VERSION) == {}
+
+# A new extractor version misses every entry, re-extracts and evicts the old ones
+extraction.EXTRACTOR_VERSION = EXTRACTOR_VERSION + 1
+try:
+    bumped = extract_batch(uploads[:2], max_workers=1)
+finally:
+    extraction.EXTRACTOR_VERSION = EXTRACTOR_VERSION
+assert not any(result['cached'] for result in bumped)
+assert [result['asic_data'] for result in bumped] == [statement['expected'] for statement in statements[:2]]
+assert cache_rows() == {hashes[0]: EXTRACTOR_VERSION + 1, hashes[1]: EXTRACTOR_VERSION + 1}
+print("✓ Bumping EXTRACTOR_VERSION misses the old entries and evicts them")
+
+# Fill the cache past its cap, with the oldest entries used longest ago
+fields = statements[0]['expected']
+save_cached_extractions({f"hash-{index}": (fields, "pypdf2") for index in range(10)}, EXTRACTOR_VERSION)
+with db_connection() as conn:
+    conn.execute("DELETE FROM extraction_cache WHERE extractor_version != ?", (EXTRACTOR_VERSION,))
+    conn.executemany(
+        "UPDATE extraction_cache SET last_used_date = datetime('now', ?) WHERE file_hash = ?",
+        [(f"-{10 - index} hours", f"hash-{index}") for index in range(10)]
+    )
+    conn.commit()
+
+# A hit refreshes an entry, so it outlives newer ones nobody asked for
+get_cached_extractions(["hash-0"], EXTRACTOR_VERSION)
+evict_extraction_cache(EXTRACTOR_VERSION, max_entries=4)
+assert sorted(cache_rows()) == ["hash-0", "hash-7", "hash-8", "hash-9"]
+
+with db_connection() as conn:
+    conn.execute("UPDATE extraction_cache SET last_used_date = datetime('now', '-40 days') WHERE file_hash = 'hash-7'")
+    conn.commit()
+evict_extraction_cache(EXTRACTOR_VERSION, max_entries=4, max_age_days=30)
+assert sorted(cache_rows()) == ["hash-0", "hash-8", "hash-9"]
+print("✓ Eviction keeps the most recently used entries up to the cap and drops expired ones")
+
+print("-" * 60)
+print("All extraction cache tests passed!")
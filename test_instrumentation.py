@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import os
+import tempfile
+
+from asic_batch.extraction import extract_batch
+from asic_batch.instrumentation import Metrics, batch_totals
+from asic_batch.storage import check_duplicate_statements, init_database, set_database_path
+from benchmarks.synthetic import generate_statements
+
+print("Testing stage metrics...")
+print("-" * 60)
+
+metrics = Metrics()
+with metrics.stage('hash'):
+    pass
+metrics.count('pages_parsed', 3)
+other = Metrics.from_dict(metrics.as_dict())
+assert other.counters == {'pages_parsed': 3} and set(other.timings) == {'hash'}
+assert batch_totals([metrics, other]).counters['pages_parsed'] == 6
+print("✓ Metrics round-trip through a plain dict and add up")
+
+db_dir = tempfile.mkdtemp()
+set_database_path(os.path.join(db_dir, "test_statements.db"))
+init_database()
+
+statements = list(generate_statements(3, seed=7, max_attachment_pages=2))
+uploads = [(statement['filename'], statement['pdf']) for statement in statements]
+uploads.append(("broken.pdf", b"%PDF-1.4 not really"))
+
+batch_metrics = Metrics()
+results = extract_batch(uploads, max_workers=1, metrics=batch_metrics)
+for statement, result in zip(statements, results):
+    assert result['asic_data'] == statement['expected'], result['asic_data']
+    # Reading stops on the first page because every field is there
+    assert result['metrics'].counters['pages_parsed'] == 1
+    assert result['metrics'].counters['bytes_hashed'] == len(statement['pdf'])
+    assert result['metrics'].timings['pypdf2'] > 0 and result['backend'] == "pypdf2"
+assert results[-1]['error'] and results[-1]['metrics'].counters['backend_fallbacks'] == 1
+assert batch_metrics.counters['db_round_trips'] > 0
+assert set(batch_metrics.timings) >= {'cache_lookup', 'extract_wall', 'cache_save'}
+print(f"✓ Per-file metrics recorded: {results[0]['metrics'].as_dict()}")
+
+with batch_metrics.stage('duplicate_check'):
+    check_duplicate_statements([(result['file_hash'], '', '') for result in results])
+round_trips = batch_metrics.counters['db_round_trips']
+
+cached_metrics = Metrics()
+cached = extract_batch(uploads[:3], max_workers=1, metrics=cached_metrics)
+assert all(result['cached'] and result['metrics'].counters['cache_hits'] == 1 for result in cached)
+assert 'extract_wall' not in cached_metrics.timings
+print(f"✓ Cache hits skip extraction; {round_trips} SQL round-trips counted for the first batch")
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+from asic_batch.memo import BoundedMemo
+
+print("Testing bounded session memo...")
+print("-" * 60)
+
+memo = BoundedMemo(3)
+for key in ("a", "b", "c"):
+    memo.set(key, key.upper())
+assert memo.get("a") == "A"  # "a" is now the most recently used
+
+memo.set("d", "D")
+assert "b" not in memo and len(memo) == 3
+assert [memo.get(key) for key in ("a", "c", "d")] == ["A", "C", "D"]
+assert memo.get("missing", "default") == "default"
+print("✓ Least recently used entry evicted once the memo is full")
+
+memo.set(("extraction", "hash-abc", 3), ({'amount': '321.00'}, None))
+assert memo.get(("extraction", "hash-abc", 3)) == ({'amount': '321.00'}, None)
+assert memo.get(("extraction", "hash-abc", 4)) is None
+print("✓ Results are keyed by file hash and extractor version")
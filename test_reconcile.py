@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import io
+import json
+import os
+import tempfile
+from datetime import date
+
+from asic_batch.cli import main
+from asic_batch.reconcile import match_transactions, read_bank_csv, reconcile_bank_csv
+from asic_batch.storage import commit_batch, db_connection, init_database, set_database_path
+
+print("Testing bank reconciliation...")
+print("-" * 60)
+
+db_dir = tempfile.mkdtemp()
+db_path = os.path.join(db_dir, "test_statements.db")
+set_database_path(db_path)
+init_database()
+
+def statement(index, amount, bpay_reference=None):
+    return {
+        'company_name': f"COMPANY {index} PTY LTD",
+        'acn': f"{index:09d}",
+        'amount': amount,
+        'asic_reference': f"4X{index:011d}A",
+        'bpay_reference': bpay_reference or f"22{index:011d}",
+        'file_hash': f"hash-{index}"
+    }
+
+def commit(batch_id, processed_date, *shards):
+    statements = [asic_data for shard in shards for asic_data in shard]
+    result = commit_batch(batch_id, f"{batch_id}.ABA", statements, shards=[
+        {'aba_filename': f"{batch_id}_part{number}.ABA", 'statements': shard, 'record_count': len(shard) + 1}
+        for number, shard in enumerate(shards, 1)
+    ])
+    assert result['committed']
+    with db_connection() as conn:
+        conn.execute("UPDATE processed_statements SET processed_date = ? WHERE batch_id = ?", (processed_date, batch_id))
+        conn.commit()
+
+# One ABA file, a batch split into two files, an itemised payment, an unpaid
+# statement, and an old statement with the same amount as an unrelated debit
+commit("batch_20250701_100000", "2025-07-01 10:00:00", [statement(1, "321.00"), statement(2, "100.00"), statement(3, "50.00")])
+commit("batch_20250710_090000", "2025-07-10 09:00:00", [statement(4, "10.00"), statement(5, "20.00")], [statement(6, "30.00"), statement(7, "40.00")])
+commit("batch_20250720_120000", "2025-07-20 12:00:00", [statement(8, "321.00", "2296124335029")])
+commit("batch_20250722_120000", "2025-07-22 12:00:00", [statement(9, "1096.85")])
+commit("batch_20230101_120000", "2023-01-01 12:00:00", [statement(10, "99.99")])
+
+bank_csv = "\n".join([
+    '02/07/2025,"-471.00","Direct Entry TT Accountancy 02July25","+10,000.00"',
+    '11/07/2025,"-30.00","Direct Entry TT Accountancy 11July25","+9,970.00"',
+    '11/07/2025,"-70.00","Direct Entry TT Accountancy 11July25","+9,900.00"',
+    '21/07/2025,"-321.00","BPAY ASIC 2296124335029","+9,579.00"',
+    '15/07/2025,"-99.99","Office supplies","+9,479.01"',
+    '15/07/2025,"+500.00","Transfer from savings","+9,979.01"',
+    '25/07/2025,"-5.00","Bank fee","+9,974.01"',
+    'not a date,"-1.00","Bad row",""',
+])
+
+transactions, skipped = read_bank_csv(io.BytesIO(bank_csv.encode("utf-8")))
+assert [transaction['amount_cents'] for transaction in transactions] == [-47100, -3000, -7000, -32100, -9999, 50000, -500]
+assert transactions[0]['date'] == date(2025, 7, 2) and transactions[3]['description'] == "BPAY ASIC 2296124335029"
+assert skipped == [(8, "Unrecognised date 'not a date'")]
+assert len({transaction['row_hash'] for transaction in transactions}) == len(transactions)
+
+headed = "Date,Narrative,Debit Amount,Credit Amount\n2025-07-02,Direct Entry,471.00,\n2025-07-03,Deposit,,25.00\n"
+transactions, skipped = read_bank_csv(io.StringIO(headed))
+assert [(transaction['date'], transaction['amount_cents']) for transaction in transactions] == [
+    (date(2025, 7, 2), -47100), (date(2025, 7, 3), 2500)
+]
+try:
+    read_bank_csv(io.StringIO("When,What\nyesterday,lunch\n"))
+    assert False, "CSV without date and amount columns accepted"
+except ValueError:
+    pass
+print("✓ Headerless CommBank and headed debit/credit CSV exports are read")
+
+summary = reconcile_bank_csv(io.BytesIO(bank_csv.encode("utf-8")), window_days=7)
+assert (summary['transactions'], summary['debits'], summary['already_matched']) == (7, 6, 0)
+assert summary['matched'] == {'batch_id': 0, 'reference': 1, 'batch_total': 3, 'amount': 0}, summary['matched']
+assert summary['matched_statements'] == 8
+assert [debit['description'] for debit in summary['unmatched_debits']] == ["Office supplies", "Bank fee"]
+assert [statement['company_name'] for statement in summary['unmatched_statements']] == ["COMPANY 9 PTY LTD"]
+print("✓ Debits match whole ABA files and itemised payments; unmatched items are listed both ways")
+
+with db_connection() as conn:
+    reconciled = dict(conn.execute('''
+        SELECT p.company_name, b.match_type
+        FROM statement_reconciliation r
+        JOIN processed_statements p ON p.id = r.statement_id
+        JOIN bank_transactions b ON b.id = r.transaction_id
+    ''').fetchall())
+    stored_debits = conn.execute("SELECT COUNT(*) FROM bank_transactions").fetchone()[0]
+assert reconciled["COMPANY 8 PTY LTD"] == "reference" and reconciled["COMPANY 6 PTY LTD"] == "batch_total"
+assert "COMPANY 10 PTY LTD" not in reconciled and stored_debits == 6
+
+# Importing the same export again adds nothing and matches nothing twice
+summary = reconcile_bank_csv(io.BytesIO(bank_csv.encode("utf-8")), window_days=7)
+assert summary['already_matched'] == 4 and sum(summary['matched'].values()) == 0
+assert [debit['description'] for debit in summary['unmatched_debits']] == ["Office supplies", "Bank fee"]
+with db_connection() as conn:
+    assert conn.execute("SELECT COUNT(*) FROM bank_transactions").fetchone()[0] == 6
+print("✓ Matches are recorded, and re-imported exports are not matched twice")
+
+# A batch ID in the description pins the batch; a late debit is outside the window
+later_csv = '23/07/2025,"-1096.85","ASIC batch_20250722_120000"\n05/09/2025,"-99.99","Late"\n'
+summary = reconcile_bank_csv(io.BytesIO(later_csv.encode("utf-8")), window_days=7)
+assert summary['matched']['batch_id'] == 1 and summary['unmatched_statements'] == []
+assert [debit['description'] for debit in summary['unmatched_debits']] == ["Late"]
+
+# Earliest outstanding statement within the window wins, each statement once
+statements = [
+    {'id': 1, 'amount': 321.0, 'bpay_reference': "1", 'processed_date': "2025-07-01 09:00:00", 'batch_id': "b1", 'aba_filename': "a"},
+    {'id': 2, 'amount': 321.0, 'bpay_reference': "2", 'processed_date': "2025-07-03 09:00:00", 'batch_id': "b2", 'aba_filename': "b"},
+]
+debits = [
+    {'row': 1, 'date': date(2025, 7, 4), 'amount_cents': -32100, 'description': ""},
+    {'row': 2, 'date': date(2025, 7, 4), 'amount_cents': -32100, 'description': ""},
+    {'row': 3, 'date': date(2025, 7, 4), 'amount_cents': -32100, 'description': ""},
+]
+matches = match_transactions(debits, statements, window_days=7)
+assert [(debit['row'], [s['id'] for s in matched]) for debit, _, matched in matches] == [(1, [1]), (2, [2])]
+print("✓ Batch IDs and the date window decide between candidates")
+
+with tempfile.TemporaryDirectory() as temp_dir:
+    csv_path = os.path.join(temp_dir, "bank.csv")
+    with open(csv_path, "w") as f:
+        f.write('30/07/2025,"-5.00","Bank fee"\n')
+    summary_path = os.path.join(temp_dir, "reconciliation.json")
+    assert main(["reconcile", csv_path, "--db", db_path, "--summary", summary_path]) == 0
+    with open(summary_path) as f:
+        saved = json.load(f)
+    assert [debit['description'] for debit in saved['unmatched_debits']] == ["Bank fee"]
+    assert main(["reconcile", os.path.join(temp_dir, "missing.csv"), "--db", db_path]) == 1
+print("✓ CLI reconciles an export and writes a JSON summary")
+
+print("-" * 60)
+print("All reconciliation tests passed!")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import json
+import os
+import tempfile
+import threading
+
+import asic_batch.cli
+from asic_batch.cli import main
+from asic_batch.storage import (
+    commit_batch,
+    db_connection,
+    init_database,
+    release_reservations,
+    reserve_statements,
+    set_database_path,
+)
+from benchmarks.synthetic import generate_statements
+
+print("Testing statement reservations...")
+print("-" * 60)
+
+db_dir = tempfile.mkdtemp()
+db_path = os.path.join(db_dir, "test_statements.db")
+set_database_path(db_path)
+init_database()
+
+def statement(index, file_hash=None):
+    return {
+        'company_name': f"COMPANY {index} PTY LTD",
+        'acn': f"{index:09d}",
+        'amount': "321.00",
+        'asic_reference': f"4X{index:011d}A",
+        'bpay_reference': f"22{index:011d}",
+        'file_hash': file_hash or f"hash-{index}"
+    }
+
+def claim(asic_data):
+    return (asic_data['file_hash'], asic_data['asic_reference'], asic_data['bpay_reference'])
+
+def held_by(session_id):
+    with db_connection() as conn:
+        return sorted(row[0] for row in conn.execute(
+            "SELECT claim_key FROM statement_reservations WHERE session_id = ?", (session_id,)
+        ))
+
+NOW = 1_750_000_000
+
+# Session A stages statements 1 and 2; B uploads statement 2, a re-scan of
+# statement 1 with a different hash, and statement 3
+assert reserve_statements("A", [claim(statement(1)), claim(statement(2))], lease_seconds=600, now=NOW) == [None, None]
+holders = reserve_statements("B", [claim(statement(2)), claim(statement(1, "hash-rescan")), claim(statement(3))], lease_seconds=600, now=NOW)
+assert holders[0] == {'session_id': "A", 'expires_at': NOW + 600}
+assert holders[1] == {'session_id': "A", 'expires_at': NOW + 600}
+assert holders[2] is None
+# The re-scan's own file hash was free, but a statement is claimed whole or not at all
+assert held_by("B") == ["file:hash-3", "payment:4X00000000003A|2200000000003"]
+print("✓ A statement staged in one session is reported as held in another, re-scans included")
+
+# Calling again renews; dropping a statement from the staged set releases it
+assert reserve_statements("A", [claim(statement(1))], lease_seconds=600, now=NOW + 300) == [None]
+assert held_by("A") == ["file:hash-1", "payment:4X00000000001A|2200000000001"]
+assert reserve_statements("B", [claim(statement(2))], lease_seconds=600, now=NOW + 300) == [None]
+
+# A lease that is not renewed expires and the statement can be taken
+assert reserve_statements("B", [claim(statement(1, "hash-rescan"))], lease_seconds=600, now=NOW + 899)[0]['session_id'] == "A"
+assert reserve_statements("B", [claim(statement(1, "hash-rescan"))], lease_seconds=600, now=NOW + 900) == [None]
+assert held_by("A") == []
+assert release_reservations("B") == 2 and held_by("B") == []
+print("✓ Leases are renewed, released and expire")
+
+# Commits respect live leases held by other sessions and clear their own
+reserve_statements("A", [claim(statement(4)), claim(statement(5))])
+result = commit_batch("batch_b", "B.ABA", [statement(4)], session_id="B")
+assert not result['committed'] and [asic_data['file_hash'] for asic_data in result['conflicts']] == ["hash-4"]
+assert not commit_batch("batch_none", "N.ABA", [statement(5)])['committed']
+result = commit_batch("batch_a", "A.ABA", [statement(4), statement(5)], session_id="A")
+assert result['committed'] and held_by("A") == []
+
+# A later scan of a committed payment conflicts even though its hash is new
+result = commit_batch("batch_c", "C.ABA", [statement(4, "hash-4-rescan")], session_id="C")
+assert not result['committed'] and result['conflicts'][0]['file_hash'] == "hash-4-rescan"
+print("✓ Batches only commit statements no other session holds, and release their leases")
+
+# Sessions racing for overlapping statements: every statement goes to one of them
+claims = [claim(statement(index)) for index in range(100, 160)]
+outcomes = {}
+
+def stage(session_id, offset):
+    staged = claims[offset:] + claims[:offset]
+    outcomes[session_id] = dict(zip(staged, reserve_statements(session_id, staged)))
+
+threads = [threading.Thread(target=stage, args=(f"S{number}", number * 7)) for number in range(8)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+for statement_claim in claims:
+    winners = [session_id for session_id, holders in outcomes.items() if holders[statement_claim] is None]
+    assert len(winners) == 1, (statement_claim, winners)
+    losers = {holders[statement_claim]['session_id'] for holders in outcomes.values() if holders[statement_claim]}
+    assert losers == set(winners)
+for number in range(8):
+    release_reservations(f"S{number}")
+print("✓ Concurrent sessions never both get the same statement")
+
+with tempfile.TemporaryDirectory() as temp_dir:
+    inbox = os.path.join(temp_dir, "inbox")
+    os.makedirs(inbox)
+    statements = list(generate_statements(2, seed=21))
+    for generated in statements:
+        with open(os.path.join(inbox, generated['filename']), "wb") as f:
+            f.write(generated['pdf'])
+    
+    # An app session has staged another scan of the first statement
+    expected = statements[0]['expected']
+    reserve_statements("app-colleague", [("hash-other-scan", expected['asic_reference'], expected['bpay_reference'])])
+    
+    summary_path = os.path.join(temp_dir, "summary.json")
+    status = main([
+        "process", inbox, "--output-dir", os.path.join(temp_dir, "aba"), "--summary", summary_path,
+        "--db", db_path, "--workers", "1"
+    ])
+    with open(summary_path) as f:
+        summary = json.load(f)
+    rows = {row['filename']: row for row in summary['statements']}
+    assert status == 1
+    assert rows[statements[0]['filename']]['status'] == "reserved"
+    assert "app-colleague" in rows[statements[0]['filename']]['detail']
+    assert rows[statements[1]['filename']]['status'] == "processed"
+    with db_connection() as conn:
+        sessions = {row[0] for row in conn.execute("SELECT session_id FROM statement_reservations")}
+    assert sessions == {"app-colleague"}
+print("✓ CLI skips statements staged elsewhere and releases its own leases when done")
+
+# Another run, or an app session, committed under the same batch id first
+assert commit_batch("batch_taken", "taken.ABA", [statement(90)])['committed']
+with tempfile.TemporaryDirectory() as temp_dir:
+    inbox = os.path.join(temp_dir, "inbox")
+    os.makedirs(inbox)
+    for generated in generate_statements(2, seed=22):
+        with open(os.path.join(inbox, generated['filename']), "wb") as f:
+            f.write(generated['pdf'])
+    output_dir = os.path.join(temp_dir, "aba")
+    summary_path = os.path.join(temp_dir, "summary.json")
+    new_batch_id = asic_batch.cli.new_batch_id
+    asic_batch.cli.new_batch_id = lambda: "batch_taken"
+    try:
+        status = main([
+            "process", inbox, "--output-dir", output_dir, "--summary", summary_path,
+            "--db", db_path, "--workers", "1"
+        ])
+    finally:
+        asic_batch.cli.new_batch_id = new_batch_id
+    with open(summary_path) as f:
+        summary = json.load(f)
+    assert status == 1
+    assert "batch_taken" in summary['commit_error'] and summary['batch_id'] is None
+    assert [row['status'] for row in summary['statements']] == ["new", "new"]
+    assert os.listdir(output_dir) == []
+print("✓ CLI reports a taken batch id and leaves no partial ABA files")
+
+print("-" * 60)
+print("All reservation tests passed!")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+
+from asic_batch.extraction import extract_batch
+from asic_batch.spool import UploadSpool, hash_path, hash_stream
+from benchmarks.synthetic import generate_statements
+
+# Worker pools start by spawn, which imports this script again in each worker
+# as __mp_main__ - run the tests only in the parent (a script or under pytest)
+if __name__ != "__mp_main__":
+    print("Testing bounded-memory upload spooling...")
+    print("-" * 60)
+    
+    content = os.urandom(300_000)
+    stream = io.BytesIO(content)
+    stream.seek(123)
+    assert hash_stream(stream, chunk_size=4096) == (hashlib.sha256(content).hexdigest(), len(content))
+    assert stream.tell() == 123
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        f.write(content)
+    assert hash_path(f.name, chunk_size=4096)[0] == hashlib.sha256(content).hexdigest()
+    os.remove(f.name)
+    print("✓ Chunked hashing matches hashing the whole file")
+    
+    spool = UploadSpool(max_memory_bytes=250_000, chunk_size=64 * 1024)
+    small, small_hash = spool.add_stream(io.BytesIO(content[:200_000]))
+    large, large_hash = spool.add_stream(io.BytesIO(content))
+    assert small.data is not None and spool.memory_bytes == 200_000
+    assert large.data is None and os.path.exists(large.path) and spool.spooled_to_disk == 1
+    assert small_hash == hashlib.sha256(content[:200_000]).hexdigest()
+    assert large_hash == hashlib.sha256(content).hexdigest()
+    with large.open() as f:
+        assert f.read() == content
+    print("✓ Uploads past the memory budget are spooled to temp files")
+    
+    # Worker processes get only the path for spooled content
+    assert len(pickle.dumps(large)) < 1000 and pickle.loads(pickle.dumps(large)).open().read() == content
+    
+    spool.release(small)
+    assert spool.memory_bytes == 0 and small.data is None
+    try:
+        spool.add_stream(io.BytesIO(content), max_size=100_000)
+        assert False, "oversized stream accepted"
+    except ValueError:
+        pass
+    assert spool.spooled_to_disk == 1
+    spool.close()
+    assert not os.path.exists(large.path)
+    print("✓ Released and closed spools free memory and remove temp files")
+    
+    statements = list(generate_statements(3, seed=17))
+    with UploadSpool(max_memory_bytes=0) as spool:
+        uploads = []
+        for statement in statements:
+            spooled, file_hash = spool.add_stream(io.BytesIO(statement['pdf']))
+            uploads.append((statement['filename'], spooled, file_hash))
+        results = extract_batch(uploads, max_workers=2, use_cache=False)
+    for statement, result in zip(statements, results):
+        assert result['asic_data'] == statement['expected'], result
+        assert result['file_hash'] == hashlib.sha256(statement['pdf']).hexdigest()
+    assert not any(os.path.exists(spooled.path) for _, spooled, _ in uploads)
+    print("✓ Workers extract statements straight from spooled files")
+    
+    print("-" * 60)
+    print("All spool tests passed!")
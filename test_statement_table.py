@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('.')
+
+from app import STATUS_LABELS, aba_preview, filter_statements_frame, statement_flags, statements_frame
+
+print("Testing the uploaded statements table...")
+print("-" * 60)
+
+NO_DUPLICATE = {'file_duplicate': None, 'payment_duplicate': None, 'upload_duplicate': None}
+
+def uploaded(index, company_name, amount, **overrides):
+    asic_data = {
+        'company_name': company_name,
+        'acn': f"{index:09d}",
+        'amount': amount,
+        'asic_reference': f"4X{index:011d}A",
+        'bpay_reference': f"22{index:011d}",
+        'filename': f"statement_{index}.pdf",
+        'is_duplicate': False,
+        'duplicate_info': NO_DUPLICATE,
+        'reserved_by': None
+    }
+    asic_data.update(overrides)
+    return asic_data
+
+asic_data_list = [
+    uploaded(1, "ALPHA PTY LTD", "321.00"),
+    uploaded(2, "BRAVO PTY LTD", "65.00", is_duplicate=True, duplicate_info=dict(
+        NO_DUPLICATE, payment_duplicate=("BRAVO PTY LTD", "2025-07-01 10:00:00", "ASIC_Batch_1companies_20250701.ABA")
+    )),
+    uploaded(3, "Unknown Company", "1096.85", acn=""),
+    uploaded(4, "ALPHA PTY LTD", "321.00", is_duplicate=True, duplicate_info=dict(NO_DUPLICATE, upload_duplicate=0)),
+    uploaded(5, "CHARLIE PTY LTD", "87.00", reserved_by={'session_id': "app-other", 'expires_at': 1_750_000_000}),
+]
+
+frame = statements_frame(asic_data_list)
+assert list(frame["#"]) == [1, 2, 3, 4, 5]
+assert list(frame["Status"]) == [
+    STATUS_LABELS['new'], STATUS_LABELS['duplicate'], STATUS_LABELS['incomplete'],
+    STATUS_LABELS['duplicate'], STATUS_LABELS['reserved']
+]
+assert list(frame["Amount"]) == [321.0, 65.0, 1096.85, 321.0, 87.0]
+assert frame["Flags"][0] == ""
+assert frame["Flags"][1] == "same payment processed 2025-07-01"
+assert frame["Flags"][2] == "missing Company, ACN"
+assert frame["Flags"][3] == "same as statement_1.pdf"
+assert frame["Flags"][4].startswith("staged in another session until ")
+assert statement_flags(asic_data_list[0], asic_data_list) == ""
+print("✓ One row per statement with duplicates, other sessions and incomplete statements flagged inline")
+
+assert list(filter_statements_frame(frame)["#"]) == [1, 2, 3, 4, 5]
+assert list(filter_statements_frame(frame, statuses=[STATUS_LABELS['new']])["#"]) == [1]
+assert list(filter_statements_frame(frame, statuses=[STATUS_LABELS['incomplete']])["#"]) == [3]
+assert list(filter_statements_frame(frame, flagged_only=True)["#"]) == [2, 3, 4, 5]
+assert list(filter_statements_frame(frame, search="alpha")["#"]) == [1, 4]
+assert list(filter_statements_frame(frame, search="statement_5")["#"]) == [5]
+assert list(filter_statements_frame(frame, sort_by="Amount", descending=True)["#"]) == [3, 1, 4, 5, 2]
+assert list(filter_statements_frame(frame, sort_by="Company")["#"]) == [1, 4, 2, 5, 3]
+assert filter_statements_frame(frame, search="nothing like this").empty
+print("✓ Rows filter by status, flags and search, and sort with ties in upload order")
+
+aba_content = "\r\n".join(f"record {number}" for number in range(1, 51)) + "\r\n"
+assert aba_preview(aba_content, 20) == ("\n".join(f"record {number}" for number in range(1, 21)), 30)
+assert aba_preview(aba_content, 100)[1] == 0
+print("✓ ABA preview is cut to the requested records")
+
+print("-" * 60)
+print("All statement table tests passed!")